@@ -1,89 +1,46 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
-from smart_invest_logic import run_investment_analysis
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-import pandas as pd
+from price_store import PERIOD_OFFSETS
+from news_feeds import fetch_news
+from market_data import market_refresher
+from symbols import retry_as_nse, symbol_resolver
+import encoding
+import metrics
+from downsample import lttb_indices
+import history
+from streaming import stream_hub, format_event, KEEPALIVE_INTERVAL
+from jobs import job_queue
+from backtest import run_backtest, validate_params as validate_backtest
+from screener import run_screen, UNIVERSES, MAX_SCREEN_TICKERS, validate_params as validate_screen
+from smart_invest_logic import run_investment_analysis, run_batch_analysis, MAX_BATCH_TICKERS
+from warmup import start_warm_up
+import logging
+import os
 import numpy as np
 
+# DEBUG, INFO (default), WARNING, ERROR, or OFF to silence application logging
+LOG_LEVEL = os.environ.get('SMART_INVEST_LOG_LEVEL', 'INFO').upper()
+if LOG_LEVEL == 'OFF':
+    logging.disable(logging.CRITICAL)
+else:
+    # getLevelName maps a known name to its number; anything else comes back as a string
+    valid_level = isinstance(logging.getLevelName(LOG_LEVEL), int)
+    logging.basicConfig(level=LOG_LEVEL if valid_level else logging.INFO,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if not valid_level:
+        logging.getLogger(__name__).warning("Unknown SMART_INVEST_LOG_LEVEL %r, using INFO", LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 
 CORS(app)
+metrics.init_app(app)
+encoding.init_app(app)
 
-# News RSS feed URLs
-NEWS_FEEDS = {
-    'indian': [
-        'https://news.google.com/rss/search?q=indian+stock+market&hl=en-IN&gl=IN&ceid=IN:en',
-        'https://news.google.com/rss/search?q=nse+bse+sensex+nifty&hl=en-IN&gl=IN&ceid=IN:en',
-    ],
-    'world': [
-        'https://news.google.com/rss/search?q=stock+market+news&hl=en-US&gl=US&ceid=US:en',
-        'https://news.google.com/rss/search?q=wall+street+nasdaq+dow+jones&hl=en-US&gl=US&ceid=US:en',
-    ]
-}
-
-import re
-
-def clean_html(text):
-    """Remove HTML tags and entities from text"""
-    if not text:
-        return ''
-    # Remove HTML tags
-    clean = re.sub(r'<[^>]+>', '', text)
-    # Remove HTML entities
-    clean = re.sub(r'&[a-zA-Z]+;', ' ', clean)
-    clean = re.sub(r'&#\d+;', ' ', clean)
-    # Remove URLs
-    clean = re.sub(r'https?://\S+', '', clean)
-    # Clean up whitespace
-    clean = re.sub(r'\s+', ' ', clean).strip()
-    return clean
-
-def fetch_news(category='indian', limit=10):
-    """Fetch news articles from Google RSS feeds"""
-    articles = []
-    feeds = NEWS_FEEDS.get(category, NEWS_FEEDS['indian'])
-    
-    for feed_url in feeds:
-        try:
-            response = requests.get(feed_url, timeout=10)
-            soup = BeautifulSoup(response.content, 'xml')
-            items = soup.find_all('item')
-            
-            for item in items:
-                title = item.find('title')
-                link = item.find('link')
-                pub_date = item.find('pubDate')
-                source = item.find('source')
-                description = item.find('description')
-                
-                # Clean up title and description
-                clean_title = clean_html(title.text) if title else ''
-                clean_desc = clean_html(description.text) if description else ''
-                
-                if clean_title and link:
-                    articles.append({
-                        'title': clean_title,
-                        'url': link.text.strip() if link else '',
-                        'publishedAt': pub_date.text.strip() if pub_date else '',
-                        'source': source.text.strip() if source else 'Google News',
-                        'description': clean_desc[:200] if clean_desc else '',
-                    })
-        except Exception as e:
-            print(f"Error fetching news from {feed_url}: {e}")
-            continue
-    
-    # Remove duplicates based on title
-    seen_titles = set()
-    unique_articles = []
-    for article in articles:
-        if article['title'] not in seen_titles:
-            seen_titles.add(article['title'])
-            unique_articles.append(article)
-
-    
-    return unique_articles[:limit]
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text-format metrics: stage and route latencies, upstream calls, cache hit ratios"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/news', methods=['GET'])
 def get_news():
@@ -102,194 +59,109 @@ def get_news():
         return jsonify({'error': str(e)}), 500
 
 
-# In-memory cache for market data
-MARKET_CACHE = {
-    'data': [],
-    'last_updated': None
-}
-CACHE_DURATION = 900  # 15 minutes
-
 @app.route('/market', methods=['GET'])
 def get_market_data():
-    """Get live market data for indices (Cached)"""
-    global MARKET_CACHE
-    
-    # Check cache first
-    now = datetime.now()
-    if MARKET_CACHE['data'] and MARKET_CACHE['last_updated']:
-        elapsed = (now - MARKET_CACHE['last_updated']).total_seconds()
-        if elapsed < CACHE_DURATION:
-            print(f"DEBUG: Returning cached market data ({int(elapsed)}s old)")
-            return jsonify({
-                'success': True,
-                'data': MARKET_CACHE['data'],
-                'timestamp': str(now)
-            })
+    """Get live market data for indices (served from memory, refreshed in the background)"""
+    market_refresher.ensure_started()
+    market_data, updated_at, error = market_refresher.snapshot()
 
-    try:
-        from yahooquery import Ticker
-        
-        # Indian market indices
-        indices = {
-            '^BSESN': 'SENSEX',
-            '^NSEI': 'NIFTY 50',
-            '^NSEBANK': 'BANK NIFTY',
-        }
-        
-        # US market indices
-        us_indices = {
-            '^DJI': 'DOW JONES',
-            '^GSPC': 'S&P 500',
-            '^IXIC': 'NASDAQ',
-        }
-        
-        market_data = []
-        
-        # Combine all symbols for a single batch request
-        all_symbols = list(indices.keys()) + list(us_indices.keys())
-        ticker = Ticker(all_symbols)
-        quotes = ticker.price
-        
-        if not isinstance(quotes, dict):
-            quotes = {}
-        
-        # Fetch Indian indices
-        for symbol, name in indices.items():
-            try:
-                if symbol not in quotes or not isinstance(quotes[symbol], dict):
-                    continue
-                    
-                data = quotes[symbol]
-                current = data.get('regularMarketPrice', 0)
-                prev_close = data.get('regularMarketPreviousClose', 0)
-                change = current - prev_close if prev_close else 0
-                change_pct = (change / prev_close * 100) if prev_close else 0
-                
-                market_data.append({
-                    'symbol': symbol,
-                    'name': name,
-                    'price': round(current, 2),
-                    'change': round(change, 2),
-                    'changePercent': round(change_pct, 2),
-                    'region': 'IN'
-                })
-            except Exception as e:
-                print(f"Error fetching {symbol}: {e}")
-                continue
-        
-        # Fetch US indices
-        for symbol, name in us_indices.items():
-            try:
-                if symbol not in quotes or not isinstance(quotes[symbol], dict):
-                    continue
-                    
-                data = quotes[symbol]
-                current = data.get('regularMarketPrice', 0)
-                prev_close = data.get('regularMarketPreviousClose', 0)
-                change = current - prev_close if prev_close else 0
-                change_pct = (change / prev_close * 100) if prev_close else 0
-                
-                market_data.append({
-                    'symbol': symbol,
-                    'name': name,
-                    'price': round(current, 2),
-                    'change': round(change, 2),
-                    'changePercent': round(change_pct, 2),
-                    'region': 'US'
-                })
-            except Exception as e:
-                print(f"Error fetching {symbol}: {e}")
-                continue
-        
-        # Update Cache
-        if market_data:
-            MARKET_CACHE['data'] = market_data
-            MARKET_CACHE['last_updated'] = now
-            
-        return jsonify({
-            'success': True,
-            'data': market_data,
-            'timestamp': str(now)
-        })
-    except Exception as e:
-        print(f"Error fetching market data: {e}")
-        # Fallback: Return stale cache if available, even if expired
-        if MARKET_CACHE['data']:
-            print("DEBUG: Returning STALE market data due to fetch error")
-            return jsonify({
-                'success': True,
-                'data': MARKET_CACHE['data'],
-                'timestamp': str(MARKET_CACHE['last_updated']),
-                'warning': "Data is stale due to connection error"
-            })
-            
-        return jsonify({'error': str(e)}), 500
+    if not market_data:
+        return jsonify({'error': error or 'Market data unavailable'}), 500
+
+    response = {
+        'success': True,
+        'data': market_data,
+        'timestamp': str(updated_at)
+    }
+    if error:
+        response['warning'] = "Data is stale due to connection error"
+    return jsonify(response)
+
+def _nullable(values: np.ndarray) -> list:
+    """Floats as a list, NaN as None"""
+    return [None if v != v else v for v in values.tolist()]
+
+def history_columns(series: dict, max_points: int = None) -> dict:
+    """Chart columns (date, close, volume, sma50, sma200; open/high/low for weekly and monthly bars) as arrays, LTTB-downsampled to max_points if given"""
+    keep = slice(None)
+    if max_points:
+        # SMAs come from the full series, so downsampling never changes their values
+        keep = lttb_indices(np.arange(len(series['close'])), series['close'], max_points)
+
+    # The JSON encoder writes these arrays directly; NaN goes out as null
+    columns = {
+        'date': np.datetime_as_string(series['date'][keep], unit='D').tolist(),
+        'close': np.round(series['close'][keep], 2),
+        'volume': np.nan_to_num(series['volume'][keep]).astype(np.int64),
+        'sma50': np.round(series['sma50'][keep], 2),
+        'sma200': np.round(series['sma200'][keep], 2),
+    }
+    for field in ('open', 'high', 'low'):
+        if field in series:
+            columns[field] = np.round(series[field][keep], 2)
+    return columns
 
 @app.route('/history', methods=['GET'])
 def get_price_history():
     """Get historical price data with technical indicators for charting"""
-    ticker = request.args.get('ticker', '').upper()
+    requested = request.args.get('ticker', '').upper()
     period = request.args.get('period', '1y')
+    interval = request.args.get('interval', '1d')
 
-    if not ticker:
+    if not requested:
         return jsonify({'error': 'ticker parameter is required'}), 400
+    if period != 'max' and period != 'ytd' and period not in PERIOD_OFFSETS:
+        return jsonify({'error': f"Unsupported period '{period}'"}), 400
+    if interval != 'auto' and interval not in history.INTERVALS:
+        return jsonify({'error': f"interval must be one of {', '.join(history.INTERVALS)} or auto"}), 400
 
+    ticker = symbol_resolver.resolve(requested)
     try:
-        from yahooquery import Ticker as YTicker
-        import numpy as np
-
-        tk = YTicker(ticker)
-        data = tk.history(period=period)
-
-        if data is None or data.empty:
-            # Try with .NS suffix for Indian stocks
-            if '.' not in ticker:
-                alt_ticker = f"{ticker}.NS"
-                tk = YTicker(alt_ticker)
-                data = tk.history(period=period)
-                if data is not None and not data.empty:
-                    ticker = alt_ticker
-
-            if data is None or data.empty:
-                return jsonify({'error': f'No data found for {ticker}'}), 404
-
-        df = data.reset_index()
-
-        # Normalize column names
-        col_map = {c: c.lower() for c in df.columns}
-        df = df.rename(columns=col_map)
-
-        if 'date' not in df.columns:
-            return jsonify({'error': 'No date column in data'}), 500
-
-        df['date'] = pd.to_datetime(df['date'], utc=True).dt.tz_localize(None)
-
-        # Compute SMAs
-        df['sma50'] = df['close'].rolling(window=50, min_periods=10).mean()
-        df['sma200'] = df['close'].rolling(window=200, min_periods=50).mean()
-
-        # Build response
-        history = []
-        for _, row in df.iterrows():
-            # Handle NaN for 'close'
-            close_price = round(float(row['close']), 2) if not np.isnan(row.get('close', float('nan'))) else None
-            
-            history.append({
-                'date': row['date'].strftime('%Y-%m-%d'),
-                'close': close_price,
-                'volume': int(row.get('volume', 0)),
-                'sma50': round(float(row['sma50']), 2) if not np.isnan(row.get('sma50', float('nan'))) else None,
-                'sma200': round(float(row['sma200']), 2) if not np.isnan(row.get('sma200', float('nan'))) else None,
-            })
+        # One cached long series per symbol; every period is a slice of it
+        base_period = history.base_period_for(period)
+        series = history.load_series(ticker, base_period)
 
-        return jsonify({
+        # Unknown bare ticker: try with .NS suffix for Indian stocks
+        resolved = {ticker: ticker}
+        alt_series = retry_as_nse(resolved, {ticker: series},
+                                  lambda alt: {s: history.load_series(s, base_period) for s in alt},
+                                  lambda loaded, s: loaded.get(s) is not None)
+        if resolved[ticker] != ticker:
+            ticker = resolved[ticker]
+            series = alt_series[ticker]
+        if series is None:
+            return jsonify({'error': f'No data found for {ticker}'}), 404
+        symbol_resolver.learn(requested, ticker)
+
+        series = history.period_slice(series, period)
+        if interval == 'auto':
+            interval = history.pick_interval(series)
+        series = history.resample(series, interval)
+
+        columns = history_columns(series, request.args.get('maxPoints', type=int))
+        response = {
             'ticker': ticker,
             'period': period,
-            'count': len(history),
-            'history': history
-        })
+            'interval': interval,
+            'count': len(columns['date']),
+        }
+        if request.args.get('format') == 'columns':
+            # Parallel arrays: one list per field instead of one dict per row
+            response['columns'] = columns
+        else:
+            rows = {
+                'date': columns['date'],
+                'close': _nullable(columns['close']),
+                'volume': columns['volume'].tolist(),
+                'sma50': _nullable(columns['sma50']),
+                'sma200': _nullable(columns['sma200']),
+            }
+            rows.update({field: _nullable(columns[field]) for field in ('open', 'high', 'low') if field in columns})
+            keys = list(rows)
+            response['history'] = [dict(zip(keys, row)) for row in zip(*rows.values())]
+        return jsonify(response)
     except Exception as e:
-        print(f"Error fetching history for {ticker}: {e}")
+        logger.warning("Error fetching history for %s: %s", ticker, e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/analyze', methods=['POST'])
@@ -300,6 +172,9 @@ def analyze():
     if not data:
         return jsonify({"error": "Invalid input. Please provide stock and amount."}), 400
 
+    if data.get('async'):
+        return submit_job('analyze', data)
+
     # Call your analysis function with the received data
     analysis_result = run_investment_analysis(data)
 
@@ -309,6 +184,128 @@ def analyze():
     # Return the result to the frontend as JSON
     return jsonify(analysis_result)
 
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Score a list of tickers (e.g. the whole watchlist) in one request"""
+    data = request.get_json(silent=True)
+
+    if not data or not isinstance(data.get('tickers'), list) or not data['tickers']:
+        return jsonify({"error": "Invalid input. Please provide a 'tickers' list."}), 400
+
+    if len(data['tickers']) > MAX_BATCH_TICKERS:
+        return jsonify({"error": f"At most {MAX_BATCH_TICKERS} tickers can be analysed per request."}), 400
+
+    if data.get('async'):
+        return submit_job('batch', data)
+
+    batch_result = run_batch_analysis(data)
+
+    if "error" in batch_result:
+        return jsonify(batch_result), 500
+
+    return jsonify(batch_result)
+
+@app.route('/screen', methods=['POST'])
+def screen():
+    """Rank a universe (named or a 'tickers' list) by composite score, with optional filters"""
+    data = request.get_json(silent=True) or {}
+
+    tickers = data.get('tickers')
+    if tickers is not None and (not isinstance(tickers, list) or not tickers):
+        return jsonify({"error": "'tickers' must be a non-empty list."}), 400
+    if tickers is None and str(data.get('universe', 'known')).lower() not in UNIVERSES:
+        return jsonify({"error": f"Unknown universe. Choose one of: {', '.join(UNIVERSES)}."}), 400
+    if tickers is not None and len(tickers) > MAX_SCREEN_TICKERS:
+        return jsonify({"error": f"At most {MAX_SCREEN_TICKERS} tickers can be screened per request."}), 400
+    error = validate_screen(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    screen_result = run_screen(data)
+
+    if "error" in screen_result:
+        return jsonify(screen_result), 500
+
+    return jsonify(screen_result)
+
+@app.route('/backtest', methods=['POST'])
+def backtest():
+    """Backtest the composite-score strategy for fixed 'weights' or a weight grid (best Sharpe first)"""
+    data = request.get_json(silent=True)
+
+    if not data or not isinstance(data.get('tickers'), list) or not data['tickers']:
+        return jsonify({"error": "Invalid input. Please provide a 'tickers' list."}), 400
+    error = validate_backtest(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    if data.get('async'):
+        return submit_job('backtest', data)
+
+    backtest_result = run_backtest(data)
+
+    if "error" in backtest_result:
+        return jsonify(backtest_result), 500
+
+    return jsonify(backtest_result)
+
+def submit_job(kind, data):
+    """Queue an analysis and answer 202 with its job id"""
+    job, coalesced = job_queue.submit(kind, data)
+    response = jsonify({**job.to_dict(include_result=False), 'coalesced': coalesced})
+    response.headers['Location'] = f"/jobs/{job.id}"
+    return response, 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of an analysis job, with its result once finished (?wait=N long-polls up to N seconds)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    wait = min(request.args.get('wait', 0, type=float), 30)
+    if wait > 0:
+        job.done.wait(wait)
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events: the job's status, then its result"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+
+    def events():
+        yield format_event('status', job.to_dict(include_result=False))
+        while not job.done.wait(KEEPALIVE_INTERVAL):
+            yield ': keep-alive\n\n'
+        yield format_event('result', job.to_dict())
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    """Server-sent events: index quote deltas plus score deltas for ?symbols=TCS,INFY"""
+    symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+    if len(symbols) > MAX_BATCH_TICKERS:
+        return jsonify({"error": f"At most {MAX_BATCH_TICKERS} symbols can be streamed."}), 400
+
+    market_refresher.ensure_started()
+    stream_hub.ensure_started()
+    subscription = stream_hub.subscribe(symbols)
+    return Response(
+        stream_with_context(stream_hub.events(subscription)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 if __name__ == '__main__':
+    # The debug reloader runs this file twice; only the child (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up(5000)
+
     # Run the Flask app on port 5000
     app.run(debug=True, port=5000)
@@ -0,0 +1,120 @@
+"""
+Article text normalisation shared by /analyze and /news.
+
+Titles, summaries and content are cleaned column-wise with precompiled
+regular expressions instead of building a BeautifulSoup tree per field:
+tags are stripped (optionally with the text of <a> elements, which in
+Google News descriptions is just the headline repeated), entities are
+decoded, raw URLs are dropped and whitespace is collapsed. The first
+href of each description is extracted in the same pass over the column.
+"""
+import html
+import re
+from typing import Dict, List
+
+import pandas as pd
+
+from sentiment import VADER_FIELDS
+
+_ANCHOR_OR_TAG_RE = re.compile(r'<a\b[^>]*>.*?</a\s*>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_TAG_OR_URL_RE = re.compile(r'<[^>]+>|https?://\S+')
+_ANCHOR_TAG_OR_URL_RE = re.compile(r'<a\b[^>]*>.*?</a\s*>|<[^>]+>|https?://\S+', re.IGNORECASE | re.DOTALL)
+_URL_RE = re.compile(r'https?://\S+')
+_HREF_RE = re.compile(r'<a\b[^>]*?\bhref\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+_WS_RE = re.compile(r'\s+')
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    return series.where(series.notna(), '').astype(str)
+
+
+def clean_column(series: pd.Series, drop_anchors: bool = False, strip_urls: bool = False) -> pd.Series:
+    """Strip tags (and optionally anchors and raw URLs), decode entities and collapse whitespace."""
+    if drop_anchors:
+        pattern = _ANCHOR_TAG_OR_URL_RE if strip_urls else _ANCHOR_OR_TAG_RE
+    else:
+        pattern = _TAG_OR_URL_RE if strip_urls else _TAG_RE
+    # Removed, not replaced by a space: like get_text(), '<i>up</i>.' reads 'up.'
+    text = _as_text(series).str.replace(pattern, '', regex=True)
+    # Decoding can reveal URLs that were entity-escaped, so drop those after unescaping too
+    text = text.map(lambda t: html.unescape(t) if '&' in t else t)
+    if strip_urls:
+        text = text.str.replace(_URL_RE, '', regex=True)
+    return text.str.replace(_WS_RE, ' ', regex=True).str.strip()
+
+
+def clean_text(text, drop_anchors: bool = False, strip_urls: bool = True) -> str:
+    """Scalar convenience wrapper around clean_column."""
+    if not text:
+        return ''
+    return clean_column(pd.Series([text]), drop_anchors=drop_anchors, strip_urls=strip_urls).iloc[0]
+
+
+def first_href(series: pd.Series) -> pd.Series:
+    """First <a href> in each value (entity-decoded), or NaN."""
+    hrefs = _as_text(series).str.extract(_HREF_RE, expand=False)
+    return hrefs.map(lambda h: html.unescape(h) if isinstance(h, str) and '&' in h else h)
+
+
+def _column(df: pd.DataFrame, *names) -> pd.Series:
+    """First non-blank value across the given columns, row by row."""
+    out = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for name in reversed(names):
+        if name in df.columns:
+            values = df[name].astype(object)
+            out = values.where(values.notna() & (values.astype(str) != ''), out)
+    return out
+
+
+def _blank_to_none(values: List) -> List:
+    return [v if isinstance(v, str) and v else None for v in values]
+
+
+def _source_name(source) -> str:
+    if isinstance(source, dict):
+        return source.get('name') or source.get('id') or ''
+    if source is None or (isinstance(source, float) and source != source):
+        return ''
+    return str(source)
+
+
+def serialize_articles(news_df: pd.DataFrame) -> List[Dict]:
+    """Turn a scored news frame into the JSON-ready article list returned by /analyze."""
+    if news_df is None or news_df.empty:
+        return []
+    df = news_df.reset_index(drop=True)
+
+    summary_raw = _column(df, 'description', 'summary')
+    title = clean_column(_column(df, 'title', 'headline'))
+    # Anchors in RSS descriptions wrap the headline; keep their target as the article URL
+    summary = clean_column(summary_raw, drop_anchors=True, strip_urls=True)
+    content = clean_column(_column(df, 'content'))
+    url = _column(df.assign(_href=first_href(summary_raw)), 'url', '_href', 'link')
+
+    published_raw = _column(df, 'publishedAt')
+    try:
+        published = pd.to_datetime(published_raw, errors='coerce')
+    except (TypeError, ValueError):
+        # Mixed timezones can't share one datetime column; convert value by value instead
+        published = [pd.to_datetime(v, errors='coerce') for v in published_raw]
+    published = [ts.isoformat() if pd.notnull(ts) else None for ts in published]
+
+    sources = [_source_name(s) for s in _column(df, 'source').tolist()]
+    scores = {
+        field: (pd.to_numeric(df[field], errors='coerce').fillna(0.0) if field in df.columns
+                else pd.Series(0.0, index=df.index)).astype(float).tolist()
+        for field in VADER_FIELDS
+    }
+
+    columns = {
+        'title': _blank_to_none(title.tolist()),
+        'summary': _blank_to_none(summary.tolist()),
+        'content': _blank_to_none(content.tolist()),
+        'publishedAt': published,
+        'source': sources,
+        'url': _blank_to_none(url.tolist()),
+        **scores,
+    }
+    keys = list(columns)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
@@ -0,0 +1,238 @@
+"""
+ASGI entry point: async routes for the I/O-bound endpoints, Flask for the rest.
+
+    uvicorn asgi:app --port 5000
+
+/analyze, /news, /market, /stream and the /jobs routes are served
+natively on the event loop: news and RSS requests are awaited with the
+async HTTP client, CPU work (VADER, pandas) and yahooquery calls run in
+executor threads, and each open stream or job long-poll waits on the loop
+rather than in a parked thread. Every other route (including /history,
+whose only I/O is yahooquery) is the unchanged Flask app, run on a pool of
+WSGI_THREADS threads like the threaded development server.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import encoding
+import metrics
+from api import app as flask_app
+from http_client import async_http
+from jobs import job_queue
+from market_data import market_refresher
+from news_feeds import fetch_news_async
+from smart_invest_logic import MAX_BATCH_TICKERS, run_investment_analysis_async
+from streaming import KEEPALIVE_INTERVAL, format_event, stream_hub
+from warmup import start_warm_up
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+# Threads running Flask requests concurrently
+WSGI_THREADS = int(os.environ.get('SMART_INVEST_WSGI_THREADS', 32))
+MAX_JOB_WAIT = 30  # seconds, as in the Flask route
+
+
+def json_response(request: Request, payload, status: int = 200, headers: dict = None) -> Response:
+    """JSON encoded and compressed like the Flask routes, with an ETag / 304 on GETs."""
+    body = encoding.dumps_bytes(payload)
+    headers = dict(headers or {})
+    headers['Vary'] = 'Accept-Encoding'
+    if request.method == 'GET' and status == 200:
+        etag = f'W/"{encoding.etag_for(body)}"'
+        headers['ETag'] = etag
+        if etag in request.headers.get('if-none-match', ''):
+            return Response(status_code=304, headers=headers)
+    body, coding = encoding.compress_body(body, request.headers.get('accept-encoding', ''))
+    if coding:
+        headers['Content-Encoding'] = coding
+    return Response(body, status_code=status, headers=headers, media_type='application/json')
+
+
+def timed_route(route: str):
+    """Record an async endpoint in the request latency histogram, like metrics.init_app does for Flask."""
+    def decorator(endpoint):
+        @wraps(endpoint)
+        async def wrapper(request: Request):
+            start = time.perf_counter()
+            response = await endpoint(request)
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method,
+                                            status=response.status_code)
+            return response
+        return wrapper
+    return decorator
+
+
+@timed_route('/news')
+async def get_news(request: Request):
+    """Get market news - category can be 'indian' or 'world'"""
+    category = request.query_params.get('category', 'indian')
+    try:
+        limit = int(request.query_params.get('limit', 10))
+        articles = await fetch_news_async(category, limit)
+        return json_response(request, {
+            'category': category,
+            'count': len(articles),
+            'articles': articles
+        })
+    except Exception as e:
+        return json_response(request, {'error': str(e)}, 500)
+
+
+@timed_route('/market')
+async def get_market_data(request: Request):
+    """Get live market data for indices (served from memory, refreshed in the background)"""
+    market_refresher.ensure_started()
+    # Only the very first snapshot fetches; it does so off the loop
+    market_data, updated_at, error = await asyncio.get_running_loop().run_in_executor(
+        None, market_refresher.snapshot)
+
+    if not market_data:
+        return json_response(request, {'error': error or 'Market data unavailable'}, 500)
+
+    response = {
+        'success': True,
+        'data': market_data,
+        'timestamp': str(updated_at)
+    }
+    if error:
+        response['warning'] = "Data is stale due to connection error"
+    return json_response(request, response)
+
+
+@timed_route('/analyze')
+async def analyze(request: Request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    if not data:
+        return json_response(request, {"error": "Invalid input. Please provide stock and amount."}, 400)
+
+    if data.get('async'):
+        job, coalesced = job_queue.submit('analyze', data)
+        return json_response(request, {**job.to_dict(include_result=False), 'coalesced': coalesced}, 202,
+                             headers={'Location': f"/jobs/{job.id}"})
+
+    analysis_result = await run_investment_analysis_async(data)
+
+    if "error" in analysis_result:
+        return json_response(request, analysis_result, 500)
+    return json_response(request, analysis_result)
+
+
+def job_finished(job) -> asyncio.Future:
+    """A future on the running loop that resolves when the job finishes (set from the job's thread)."""
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+
+    def on_done(_job):
+        try:
+            loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(True))
+        except RuntimeError:
+            pass  # the loop has shut down
+
+    job.add_done_callback(on_done)
+    return finished
+
+
+@timed_route('/jobs/<job_id>')
+async def get_job(request: Request):
+    """Status of an analysis job, with its result once finished (?wait=N long-polls up to N seconds)"""
+    job = job_queue.get(request.path_params['job_id'])
+    if job is None:
+        return json_response(request, {"error": "Unknown or expired job id"}, 404)
+    try:
+        wait = min(float(request.query_params.get('wait', 0)), MAX_JOB_WAIT)
+    except ValueError:
+        wait = 0
+    if wait > 0:
+        try:
+            await asyncio.wait_for(job_finished(job), wait)
+        except asyncio.TimeoutError:
+            pass
+    return json_response(request, job.to_dict())
+
+
+async def job_events(request: Request):
+    """Server-sent events: the job's status, then its result"""
+    job = job_queue.get(request.path_params['job_id'])
+    if job is None:
+        return json_response(request, {"error": "Unknown or expired job id"}, 404)
+
+    async def events():
+        yield format_event('status', job.to_dict(include_result=False))
+        finished = job_finished(job)
+        while True:
+            try:
+                await asyncio.wait_for(asyncio.shield(finished), KEEPALIVE_INTERVAL)
+                break
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+        yield format_event('result', job.to_dict())
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def stream(request: Request):
+    """Server-sent events: index quote deltas plus score deltas for ?symbols=TCS,INFY"""
+    symbols = [s.strip().upper() for s in request.query_params.get('symbols', '').split(',') if s.strip()]
+    if len(symbols) > MAX_BATCH_TICKERS:
+        return json_response(request, {"error": f"At most {MAX_BATCH_TICKERS} symbols can be streamed."}, 400)
+
+    market_refresher.ensure_started()
+    stream_hub.ensure_started()
+    subscription = stream_hub.subscribe(symbols, loop=asyncio.get_running_loop())
+    return StreamingResponse(stream_hub.aevents(subscription), media_type='text/event-stream',
+                             headers=SSE_HEADERS)
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    # Startup runs before the port is bound, so there is no port to wait for
+    start_warm_up()
+    yield
+    await async_http.aclose()
+
+
+native = Starlette(
+    routes=[
+        Route('/analyze', analyze, methods=['POST']),
+        Route('/news', get_news, methods=['GET']),
+        Route('/market', get_market_data, methods=['GET']),
+        Route('/stream', stream, methods=['GET']),
+        Route('/jobs/{job_id}', get_job, methods=['GET']),
+        Route('/jobs/{job_id}/events', job_events, methods=['GET']),
+    ],
+    # flask_cors covers the Flask routes; this answers preflights for the native ones
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
+NATIVE_PATHS = [route.path_regex for route in native.routes]
+# A real thread pool: asgiref's WsgiToAsgi would run every Flask request on one thread
+wsgi = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+
+def is_native(path: str) -> bool:
+    return any(pattern.match(path) for pattern in NATIVE_PATHS)
+
+
+async def app(scope, receive, send):
+    """Native routes and lifespan events go to Starlette, everything else to Flask."""
+    if scope['type'] == 'lifespan' or is_native(scope.get('path', '')):
+        await native(scope, receive, send)
+    else:
+        await wsgi(scope, receive, send)
@@ -0,0 +1,244 @@
+"""
+Backtests of the composite-score strategy on stored price history.
+
+Indicators, technical scores and smart thresholds are computed for every
+date and symbol at once (the same rolling-sum code as technical_snapshot,
+evaluated on every row instead of only the last). Each day the strategy
+holds, equally weighted, every symbol whose composite score is at or above
+its threshold, and earns the next day's return.
+
+There is no point-in-time news or fundamentals history: sentiment is held
+neutral (0.5) and each symbol's current fundamental score is used for the
+whole period, so that component carries look-ahead bias. A weight grid is
+evaluated in parallel across CPU cores, each worker receiving the score
+matrices with its chunk. A symbol with no bar on a date (e.g. an exchange
+holiday in a mixed NSE/US universe) keeps its last close, score and
+position that day.
+"""
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import technicals
+from fundamentals import fundamentals_universe
+from price_store import PERIOD_OFFSETS, price_store
+from symbols import symbol_resolver
+
+TRADING_DAYS = 252
+NEUTRAL_SENTIMENT = 0.5
+DEFAULT_COST_BPS = 10           # per unit of turnover
+PROCESS_GRID_THRESHOLD = 16     # smaller grids run in-process
+MAX_GRID_SIZE = 2000
+MIN_GRID_STEP = 0.01
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def score_history(prices: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Close, technicalScore and suggestedThreshold matrices (date x symbol).
+    Each symbol's windows skip its own missing days, like compute_technicals
+    on the dropna()'d series; values stay on the original date rows.
+    """
+    values = prices.to_numpy(dtype=float)
+    order = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    compact = np.take_along_axis(values, order, axis=0)
+    ind = technicals.compute_indicators(compact)
+    tech = technicals.technical_score(ind['Close'], ind['SMA50'], ind['SMA200'], ind['Momentum30'], ind['Volatility30'])
+    threshold = technicals.smart_threshold(ind['Close'], ind['Volatility30'])
+
+    def restore(compacted):
+        out = np.empty_like(compacted)
+        np.put_along_axis(out, order, compacted, axis=0)
+        return out
+
+    missing = np.isnan(values)
+    return {
+        'close': values,
+        'technicalScore': np.where(missing, np.nan, restore(tech)),
+        'suggestedThreshold': np.where(missing, np.nan, restore(threshold)),
+    }
+
+
+def _max_drawdown(equity: np.ndarray) -> float:
+    peaks = np.maximum.accumulate(equity)
+    return float(np.max(1 - equity / peaks)) if len(equity) else 0.0
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """Carry each column's last value over its NaN rows; leading NaNs stay."""
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+def simulate(data: Dict[str, np.ndarray], weights: Dict[str, float], threshold_offset: float = 0.0,
+             cost_bps: float = DEFAULT_COST_BPS) -> Dict[str, float]:
+    """Run the threshold strategy for one weight set; returns summary statistics."""
+    # Missing days: flat price, unchanged signal, so a held symbol is neither sold nor bought back
+    close, tech, threshold = (_ffill(data[k]) for k in ('close', 'technicalScore', 'suggestedThreshold'))
+    final = np.clip(weights['sentiment'] * NEUTRAL_SENTIMENT + weights['technical'] * tech
+                    + weights['fundamental'] * data['fundamentalScore'][np.newaxis, :], 0.0, 1.0)
+    with np.errstate(invalid='ignore'):
+        signal = final >= threshold + threshold_offset
+
+    # Positions decided at today's close earn tomorrow's return
+    held = signal[:-1]
+    counts = held.sum(axis=1)
+    position = np.where(counts[:, None] > 0, held / np.maximum(counts, 1)[:, None], 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.nan_to_num(close[1:] / close[:-1] - 1)
+    turnover = np.abs(np.diff(position, axis=0, prepend=np.zeros((1, position.shape[1])))).sum(axis=1)
+    daily = (position * returns).sum(axis=1) - turnover * cost_bps / 10000
+
+    equity = np.cumprod(1 + daily)
+    years = len(daily) / TRADING_DAYS
+    total = float(equity[-1] - 1) if len(equity) else 0.0
+    vol = float(np.std(daily) * np.sqrt(TRADING_DAYS)) if len(daily) else 0.0
+    return {
+        'totalReturn': total,
+        'cagr': float((1 + total) ** (1 / years) - 1) if years > 0 and total > -1 else 0.0,
+        'volatility': vol,
+        'sharpe': float(np.mean(daily) * TRADING_DAYS / vol) if vol > 0 else 0.0,
+        'maxDrawdown': _max_drawdown(equity),
+        'exposure': float((counts > 0).mean()) if len(counts) else 0.0,
+        'turnover': float(turnover.sum()),
+    }
+
+
+def grid_size(step: float, offsets: int = 1) -> int:
+    """Number of weight_grid() entries, without building it."""
+    n = int(round(1 / step))
+    return (n + 1) * (n + 2) // 2 * offsets
+
+
+def weight_grid(step: float = 0.1, threshold_offsets: List[float] = (0.0,)) -> List[Dict]:
+    """Every (sentiment, technical, fundamental) weight split on `step` that sums to 1, per threshold offset."""
+    n = int(round(1 / step))
+    grid = []
+    for i, j in itertools.product(range(n + 1), repeat=2):
+        if i + j <= n:
+            weights = {'sentiment': i / n, 'technical': j / n, 'fundamental': (n - i - j) / n}
+            grid.extend({'weights': weights, 'thresholdOffset': off} for off in threshold_offsets)
+    return grid
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: a fork of the threaded server could inherit locks other threads hold
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _simulate_chunk(args):
+    data, combos, cost_bps = args
+    return [simulate(data, c['weights'], c.get('thresholdOffset', 0.0), cost_bps) for c in combos]
+
+
+def sweep(data: Dict[str, np.ndarray], grid: List[Dict], cost_bps: float = DEFAULT_COST_BPS) -> List[Dict]:
+    """simulate() for every grid entry, fanned out over processes for larger grids."""
+    if len(grid) < PROCESS_GRID_THRESHOLD:
+        stats = [simulate(data, c['weights'], c.get('thresholdOffset', 0.0), cost_bps) for c in grid]
+    else:
+        # One chunk per core, so the matrices are pickled once per worker
+        size = -(-len(grid) // (os.cpu_count() or 2))
+        chunks = [(data, grid[i:i + size], cost_bps) for i in range(0, len(grid), size)]
+        stats = [s for chunk in _get_pool().map(_simulate_chunk, chunks) for s in chunk]
+    return [{**combo, **s} for combo, s in zip(grid, stats)]
+
+
+def _number(params: Dict, key: str, default, minimum: float = None) -> float:
+    value = params.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"'{key}' must be a number.")
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"'{key}' must be a number.") from None
+    if not np.isfinite(value) or (minimum is not None and value < minimum):
+        raise ValueError(f"'{key}' must be a finite number" + (f" of at least {minimum}." if minimum is not None else "."))
+    return value
+
+
+def _parse_options(params: Dict) -> Dict:
+    """Validated period, costs, weight grid and topN of a backtest request; ValueError with a message otherwise."""
+    period = params.get('period', '5y')
+    if not isinstance(period, str) or (period not in PERIOD_OFFSETS and period not in ('max', 'ytd')):
+        raise ValueError(f"Unsupported period '{period}'.")
+    cost_bps = _number(params, 'costBps', DEFAULT_COST_BPS, minimum=0)
+    top_n = int(_number(params, 'topN', 20, minimum=1))
+
+    if 'weights' in params:
+        w = params['weights']
+        if not isinstance(w, dict):
+            raise ValueError("'weights' must be an object with sentimentWeight, technicalWeight and fundamentalWeight.")
+        grid = [{'weights': {'sentiment': _number(w, 'sentimentWeight', 0.3),
+                             'technical': _number(w, 'technicalWeight', 0.3),
+                             'fundamental': _number(w, 'fundamentalWeight', 0.4)},
+                 'thresholdOffset': _number(params, 'thresholdOffset', 0.0)}]
+    else:
+        step = _number(params, 'gridStep', 0.1)
+        if not MIN_GRID_STEP <= step <= 1:
+            raise ValueError(f"'gridStep' must be between {MIN_GRID_STEP} and 1.")
+        offsets = params.get('thresholdOffsets', [0.0])
+        if not isinstance(offsets, list) or not offsets:
+            raise ValueError("'thresholdOffsets' must be a non-empty list of numbers.")
+        offsets = [_number({'thresholdOffsets': o}, 'thresholdOffsets', 0.0) for o in offsets]
+        # Checked before enumerating: a tiny step would otherwise build millions of entries
+        size = grid_size(step, len(offsets))
+        if size > MAX_GRID_SIZE:
+            raise ValueError(f"The grid has {size} combinations; at most {MAX_GRID_SIZE} are allowed.")
+        grid = weight_grid(step, offsets)
+    return {'period': period, 'costBps': cost_bps, 'topN': top_n, 'grid': grid}
+
+
+def validate_params(params: Dict) -> Optional[str]:
+    """Error message for an invalid backtest request (answered with 400), or None."""
+    try:
+        _parse_options(params)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def run_backtest(params: Dict) -> Dict:
+    symbols = list(dict.fromkeys(symbol_resolver.resolve(str(t)) for t in params.get('tickers') or [] if str(t).strip()))
+    if not symbols:
+        return {"error": "Please provide a non-empty 'tickers' list."}
+    try:
+        options = _parse_options(params)
+    except ValueError as e:
+        return {"error": str(e)}
+    period, cost_bps, grid = options['period'], options['costBps'], options['grid']
+
+    try:
+        prices = price_store.get_closes(symbols, period=period)
+        if prices.empty:
+            return {"error": f"No price data found for {symbols}"}
+        symbols = list(prices.columns)
+        data = score_history(prices)
+        fundamentals_universe.lookup(symbols)
+        data['fundamentalScore'] = fundamentals_universe.table().reindex(symbols)['fundamentalScore'] \
+            .fillna(0.5).to_numpy(dtype='f8')
+
+        results = sorted(sweep(data, grid, cost_bps), key=lambda r: r['sharpe'], reverse=True)
+        return {
+            "symbols": symbols,
+            "start": prices.index[0].strftime('%Y-%m-%d'),
+            "end": prices.index[-1].strftime('%Y-%m-%d'),
+            "days": len(prices),
+            "count": len(results),
+            "results": results[:options['topN']],
+        }
+    except Exception as e:
+        return {"error": str(e)}
@@ -0,0 +1,179 @@
+"""
+Offline benchmarks for the analysis hot paths.
+
+    python benchmarks.py                      # every case
+    python benchmarks.py -k technicals        # cases whose name contains 'technicals'
+    python benchmarks.py --json after.json    # also save the timings
+    python benchmarks.py --compare before.json
+
+Upstream data comes from replay.install() (synthetic or recorded Yahoo data,
+canned RSS/NewsAPI over a local HTTP stub), and every run uses a fresh data
+directory, so numbers don't depend on the network or on earlier runs. Each
+case is run once to warm up and then `repeat` times; the table reports the
+minimum and median wall time.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+# The data directory is read at import time, so it has to be set before any app module is imported
+os.environ['SMART_INVEST_DATA_DIR'] = tempfile.mkdtemp(prefix='smart_invest_bench_')
+os.environ.setdefault('SMART_INVEST_LOG_LEVEL', 'WARNING')
+
+import replay  # noqa: E402
+
+CASES = []
+
+
+def case(name, repeat=20):
+    def register(fn):
+        CASES.append((name, fn, repeat))
+        return fn
+    return register
+
+
+def _nse(n):
+    return [f"BENCH{i:03d}.NS" for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', dest='pattern', default='', help='only run cases whose name contains this')
+    parser.add_argument('--json', dest='json_out', help='write results to this file')
+    parser.add_argument('--compare', help='baseline results file written by --json')
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+
+    replay.install()
+    import pandas as pd
+
+    import api
+    import articles
+    import sentiment
+    import smart_invest_logic as logic
+    import technicals
+    from cache import cache
+    from price_store import price_store, split_history
+
+    client = api.app.test_client()
+
+    def clear_caches():
+        cache.backend.clear()
+        sentiment._score_cache.clear()
+
+    # Shared inputs, built once
+    history_100 = replay.ReplayTicker(_nse(100)).history(period='1y')
+    price_store.sync(_nse(500), period='10y')
+    closes_500 = price_store.get_closes(_nse(500), period='1y')
+    series_1y = closes_500.iloc[:, 0].dropna()
+    series_10y = price_store.get_closes(_nse(1), period='10y').iloc[:, 0].dropna()
+    news_raw = pd.concat([logic.fetch_news_for_ticker.uncached(s, max_articles=20) for s in _nse(5)], ignore_index=True)
+    news_scored = logic.preprocess_and_score_news(news_raw)
+
+    @case('prices.split_history[100 symbols]')
+    def _():
+        split_history(history_100, _nse(100))
+
+    @case('prices.get_closes[100 symbols, warm store]')
+    def _():
+        logic.fetch_price_data.uncached(_nse(100), period='1y')
+
+    @case('technicals.compute_technicals[1y]', repeat=100)
+    def _():
+        logic.technical_score_for_latest(logic.compute_technicals(series_1y))
+
+    @case('technicals.compute_technicals[10y]', repeat=100)
+    def _():
+        logic.technical_score_for_latest(logic.compute_technicals(series_10y))
+
+    @case('technicals.technical_snapshot[500 symbols]')
+    def _():
+        technicals.technical_snapshot(closes_500)
+
+    @case('news.preprocess_and_score[100 articles, cold]')
+    def _():
+        sentiment._score_cache.clear()
+        logic.preprocess_and_score_news(news_raw)
+
+    @case('news.preprocess_and_score[100 articles, warm]')
+    def _():
+        logic.preprocess_and_score_news(news_raw)
+
+    @case('news.serialize_articles[100 articles]')
+    def _():
+        articles.serialize_articles(news_scored)
+
+    @case('history.rows[10y]')
+    def _():
+        cache.backend.clear()
+        client.get('/history?ticker=BENCH000.NS&period=10y')
+
+    @case('history.columns[10y, maxPoints=400]')
+    def _():
+        cache.backend.clear()
+        client.get('/history?ticker=BENCH000.NS&period=10y&format=columns&maxPoints=400')
+
+    @case('history.period_switch[1mo..5y, warm]')
+    def _():
+        for period in ('1mo', '6mo', '1y', '5y'):
+            client.get(f'/history?ticker=BENCH000.NS&period={period}&interval=auto&format=columns&maxPoints=400')
+
+    @case('analyze.single[1 ticker, cold caches]', repeat=10)
+    def _():
+        clear_caches()
+        client.post('/analyze', json={'ticker': 'BENCH000.NS'})
+
+    @case('analyze.single[1 ticker, warm caches]', repeat=50)
+    def _():
+        client.post('/analyze', json={'ticker': 'BENCH000.NS'})
+
+    @case('analyze.batch[10 tickers, cold caches]', repeat=10)
+    def _():
+        clear_caches()
+        client.post('/analyze/batch', json={'tickers': _nse(10)})
+
+    @case('analyze.batch[100 tickers, cold caches]', repeat=5)
+    def _():
+        clear_caches()
+        client.post('/analyze/batch', json={'tickers': _nse(100)})
+
+    @case('analyze.batch[100 tickers, warm caches]', repeat=10)
+    def _():
+        client.post('/analyze/batch', json={'tickers': _nse(100)})
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    print(f"{'case':<52}{'min ms':>10}{'median ms':>12}{'vs base':>10}")
+    for name, fn, repeat in CASES:
+        if args.pattern not in name:
+            continue
+        fn()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {'min_ms': min(timings), 'median_ms': statistics.median(timings), 'repeat': repeat}
+        ratio = ''
+        if name in baseline:
+            ratio = f"{results[name]['median_ms'] / baseline[name]['median_ms']:.2f}x"
+        print(f"{name:<52}{results[name]['min_ms']:>10.2f}{results[name]['median_ms']:>12.2f}{ratio:>10}")
+        sys.stdout.flush()
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
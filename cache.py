@@ -0,0 +1,557 @@
+"""
+Shared cache for upstream data (Yahoo Finance, Google News, NewsAPI).
+
+Entries are stored per data source with their own TTL. Once an entry is
+older than its TTL it is still served for a grace period while a single
+background refresh replaces it (stale-while-revalidate). Two backends are
+available: a bounded in-process LRU (default) and an on-disk SQLite store,
+selected with the SMART_INVEST_CACHE_BACKEND environment variable.
+
+The SQLite store is shared by every worker process pointed at the same
+file. Besides the entries it holds leases, so a miss is fetched by one
+process while the others wait for its result instead of calling upstream
+themselves; a lease expires on its own if its holder dies. The same
+leases (in their own file, whatever the cache backend) keep the price
+store and fundamentals table from being downloaded by every worker.
+
+Coroutine fetches (the ASGI server's news path) go through aget_or_fetch,
+which applies the same rules without blocking the event loop.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.environ.get(
+    'SMART_INVEST_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.smart_invest')
+)
+
+# Seconds an entry is considered fresh, per data source
+SOURCE_TTLS = {
+    'prices': 300,              # intraday prices move, keep it to minutes
+    'history': 300,
+    'news': 600,
+    'feeds': 300,               # market news RSS feeds
+}
+DEFAULT_TTL = 300
+
+# A stale entry is served (and refreshed in the background) for up to
+# STALE_GRACE_FACTOR * ttl seconds after it expires
+STALE_GRACE_FACTOR = 1.0
+
+# Cross-process single-flight (SQLite backend only)
+LEASE_TTL = 30              # seconds; longer than any upstream stage timeout
+LEASE_POLL_INTERVAL = 0.05  # how often waiting processes look for the leader's result
+
+
+def _is_empty(value) -> bool:
+    """Empty results usually mean an upstream failure, so they are never cached."""
+    if value is None:
+        return True
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.empty
+    if isinstance(value, (dict, list, tuple)):
+        return len(value) == 0
+    return False
+
+
+def atomic_write(path: str, write: Callable, mode: str = 'wb'):
+    """
+    Call write(file) on a unique temp file next to `path`, then rename it into
+    place. Concurrent writers, in any process, never share a temp file.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class LeaseTable:
+    """Named leases in a SQLite file shared by every process pointed at it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so `import cache` creates no file
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL)')
+            self._local.conn = conn
+        return conn
+
+    def acquire_many(self, keys: List[str], owner: str, ttl: float = LEASE_TTL) -> List[str]:
+        """Take every lease in `keys` that no other owner holds unexpired; returns the keys taken."""
+        now = time.time()
+        taken = []
+        conn = self._conn()
+        with conn:
+            for key in keys:
+                cursor = conn.execute(
+                    'INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+                    'WHERE leases.expires_at < ?',
+                    (key, owner, now + ttl, now)
+                )
+                if cursor.rowcount == 1:
+                    taken.append(key)
+        return taken
+
+    def acquire(self, key: str, owner: str, ttl: float = LEASE_TTL) -> bool:
+        """Take the lease on `key` unless another owner holds an unexpired one."""
+        return bool(self.acquire_many([key], owner, ttl))
+
+    def release_many(self, keys: List[str], owner: str):
+        conn = self._conn()
+        with conn:
+            conn.executemany('DELETE FROM leases WHERE key = ? AND owner = ?', [(key, owner) for key in keys])
+
+    def release(self, key: str, owner: str):
+        self.release_many([key], owner)
+
+    @contextmanager
+    def hold(self, key: str, ttl: float = LEASE_TTL):
+        """Run the block holding `key`, waiting for another holder first (at most `ttl` seconds)."""
+        owner = uuid.uuid4().hex
+        deadline = time.time() + ttl
+        while not self.acquire(key, owner, ttl):
+            if time.time() > deadline:
+                logger.warning("Gave up waiting for lease %s", key)
+                break
+            time.sleep(LEASE_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            self.release(key, owner)
+
+    def run_once(self, prefix: str, items: List[str], todo: Callable[[List[str]], List[str]],
+                 work: Callable[[List[str]], Any], ttl: float = LEASE_TTL):
+        """
+        work(batch) for the items that todo() says still need it, each item
+        handled by one process at a time. Items another process holds are
+        waited for and checked again with todo() once it lets go.
+        """
+        deadline = time.time() + ttl
+        pending = list(items)
+        while True:
+            pending = todo(pending)
+            if not pending:
+                return
+            if time.time() > deadline:
+                logger.warning("Gave up waiting for leases on %d %s items", len(pending), prefix)
+                work(pending)
+                return
+            owner = uuid.uuid4().hex
+            keys = {f"{prefix}:{item}": item for item in pending}
+            taken = self.acquire_many(list(keys), owner, ttl)
+            if taken:
+                try:
+                    work([keys[key] for key in taken])
+                finally:
+                    self.release_many(taken, owner)
+            done = {keys[key] for key in taken}
+            pending = [item for item in pending if item not in done]
+            if pending:
+                time.sleep(LEASE_POLL_INTERVAL)
+
+
+class MemoryBackend:
+    """Bounded in-process LRU store of (value, stored_at) pairs."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value, stored_at: float):
+        with self._lock:
+            self._data[key] = (value, stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """On-disk store that survives restarts; values are pickled, eviction is least-recently-used."""
+
+    def __init__(self, path: str, maxsize: int = 20000):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB, stored_at REAL, accessed_at REAL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)')
+        self._leases = LeaseTable(path)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        conn = self._conn()
+        row = conn.execute('SELECT value, stored_at FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        try:
+            return pickle.loads(row[0]), row[1]
+        except Exception:
+            self.delete(key)
+            return None
+
+    def set(self, key: str, value, stored_at: float):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, blob, stored_at, time.time())
+            )
+            conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                (self.maxsize,)
+            )
+
+    def delete(self, key: str):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def acquire_lease(self, key: str, owner: str, ttl: float = LEASE_TTL) -> bool:
+        """Take the lease on `key` unless another owner holds an unexpired one."""
+        return self._leases.acquire(key, owner, ttl)
+
+    def release_lease(self, key: str, owner: str):
+        self._leases.release(key, owner)
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key: str, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'value': None, 'error': None}
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['value']
+
+        try:
+            call['value'] = fn()
+            return call['value']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+
+class Cache:
+    def __init__(self, backend, ttls: Dict[str, int] = None):
+        self.backend = backend
+        self.ttls = dict(SOURCE_TTLS if ttls is None else ttls)
+        self._flight = SingleFlight()
+        # full key -> task, for coroutine fetches on the event loop
+        self._async_flight = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    def _count(self, source: str, outcome: str):
+        with self._stats_lock:
+            counts = self._stats.setdefault(source, {'hit': 0, 'stale': 0, 'miss': 0})
+            counts[outcome] += 1
+
+    def ttl_for(self, source: str) -> int:
+        return self.ttls.get(source, DEFAULT_TTL)
+
+    def get_or_fetch(self, source: str, key: str, fetch: Callable, ttl: int = None, serve_stale: bool = True):
+        """
+        Return the cached value for (source, key), calling fetch() on a miss.
+        With serve_stale=False an expired entry counts as a miss.
+        """
+        ttl = self.ttl_for(source) if ttl is None else ttl
+        full_key = f"{source}:{key}"
+        entry = self.backend.get(full_key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self._count(source, 'hit')
+                return value
+            if serve_stale and age < ttl * (1 + STALE_GRACE_FACTOR):
+                self._count(source, 'stale')
+                self._refresh_in_background(full_key, fetch)
+                return value
+
+        self._count(source, 'miss')
+        return self._flight.do(full_key, lambda: self._fetch_and_store(full_key, fetch))
+
+    def _store(self, full_key: str, value):
+        if not _is_empty(value):
+            self.backend.set(full_key, value, time.time())
+        return value
+
+    def _fetch_and_store(self, full_key: str, fetch: Callable):
+        """
+        fetch() and store the result. On a backend with leases only the lease
+        holder fetches; other processes wait for the value it stores.
+        """
+        if not hasattr(self.backend, 'acquire_lease'):
+            return self._store(full_key, fetch())
+
+        owner = uuid.uuid4().hex
+        started = time.time()
+        deadline = started + LEASE_TTL
+        while True:
+            if self.backend.acquire_lease(full_key, owner):
+                try:
+                    # The previous holder may have stored a value just before releasing
+                    entry = self.backend.get(full_key)
+                    if entry is not None and entry[1] >= started:
+                        return entry[0]
+                    return self._store(full_key, fetch())
+                finally:
+                    self.backend.release_lease(full_key, owner)
+            entry = self.backend.get(full_key)
+            if entry is not None and entry[1] >= started:
+                return entry[0]
+            if time.time() > deadline:
+                # The lease should have expired by now; don't wait on a stuck holder forever
+                logger.warning("Gave up waiting for another process to fetch %s", full_key)
+                return self._store(full_key, fetch())
+            time.sleep(LEASE_POLL_INTERVAL)
+
+    def _refresh_in_background(self, full_key: str, fetch: Callable):
+        if self._flight.in_flight(full_key):
+            return
+
+        def refresh():
+            try:
+                self._flight.do(full_key, lambda: self._fetch_and_store(full_key, fetch))
+            except Exception as e:
+                logger.warning("Background cache refresh failed for %s: %s", full_key, e)
+
+        threading.Thread(target=refresh, name=f"cache-refresh:{full_key}", daemon=True).start()
+
+    async def aget_or_fetch(self, source: str, key: str, fetch: Callable[[], Awaitable], ttl: int = None):
+        """get_or_fetch for a coroutine function: callers on the event loop share one fetch per key."""
+        ttl = self.ttl_for(source) if ttl is None else ttl
+        full_key = f"{source}:{key}"
+        entry = self.backend.get(full_key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self._count(source, 'hit')
+                return value
+            if age < ttl * (1 + STALE_GRACE_FACTOR):
+                self._count(source, 'stale')
+                if full_key not in self._async_flight:
+                    self._async_task(full_key, fetch).add_done_callback(_log_refresh_failure)
+                return value
+
+        self._count(source, 'miss')
+        task = self._async_flight.get(full_key) or self._async_task(full_key, fetch)
+        # A cancelled caller must not cancel the fetch other callers are waiting on
+        return await asyncio.shield(task)
+
+    def _async_task(self, full_key: str, fetch: Callable[[], Awaitable]) -> asyncio.Task:
+        task = asyncio.ensure_future(self._afetch_and_store(full_key, fetch))
+        self._async_flight[full_key] = task
+        task.add_done_callback(lambda _: self._async_flight.pop(full_key, None))
+        return task
+
+    async def _afetch_and_store(self, full_key: str, fetch: Callable[[], Awaitable]):
+        """_fetch_and_store for coroutines; waiting on another process's lease sleeps on the loop."""
+        if not hasattr(self.backend, 'acquire_lease'):
+            return self._store(full_key, await fetch())
+
+        owner = uuid.uuid4().hex
+        started = time.time()
+        deadline = started + LEASE_TTL
+        while True:
+            if self.backend.acquire_lease(full_key, owner):
+                try:
+                    entry = self.backend.get(full_key)
+                    if entry is not None and entry[1] >= started:
+                        return entry[0]
+                    return self._store(full_key, await fetch())
+                finally:
+                    self.backend.release_lease(full_key, owner)
+            entry = self.backend.get(full_key)
+            if entry is not None and entry[1] >= started:
+                return entry[0]
+            if time.time() > deadline:
+                logger.warning("Gave up waiting for another process to fetch %s", full_key)
+                return self._store(full_key, await fetch())
+            await asyncio.sleep(LEASE_POLL_INTERVAL)
+
+    def get(self, source: str, key: str, ttl: int = None, count: bool = True):
+        """
+        Return the value for (source, key) if it is still fresh, otherwise None. Never fetches.
+        count=False leaves the hit/miss stats alone, for opportunistic peeks that fall back
+        to something other than a fetch.
+        """
+        ttl = self.ttl_for(source) if ttl is None else ttl
+        entry = self.backend.get(f"{source}:{key}")
+        fresh = entry is not None and time.time() - entry[1] < ttl
+        if count:
+            self._count(source, 'hit' if fresh else 'miss')
+        return entry[0] if fresh else None
+
+    def peek(self, source: str, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, stored_at) regardless of age, or None. Never fetches."""
+        return self.backend.get(f"{source}:{key}")
+
+    def set(self, source: str, key: str, value):
+        if not _is_empty(value):
+            self.backend.set(f"{source}:{key}", value, time.time())
+
+    def invalidate(self, source: str, key: str):
+        self.backend.delete(f"{source}:{key}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._stats_lock:
+            return {source: dict(counts) for source, counts in self._stats.items()}
+
+
+def _log_refresh_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Background cache refresh failed: %s", task.exception())
+
+
+def _backend_from_env():
+    backend = os.environ.get('SMART_INVEST_CACHE_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        path = os.environ.get('SMART_INVEST_CACHE_PATH', os.path.join(DATA_DIR, 'cache.sqlite'))
+        return SQLiteBackend(path, maxsize=int(os.environ.get('SMART_INVEST_CACHE_SIZE', 20000)))
+    return MemoryBackend(maxsize=int(os.environ.get('SMART_INVEST_CACHE_SIZE', 2048)))
+
+
+cache = Cache(_backend_from_env())
+# Leases for shared on-disk stores; used whatever the cache backend is
+leases = LeaseTable(os.environ.get('SMART_INVEST_LEASE_PATH', os.path.join(DATA_DIR, 'leases.sqlite')))
+
+
+@metrics.register_collector
+def _cache_metrics():
+    stats = cache.stats()
+    ratios = []
+    for source, counts in stats.items():
+        total = sum(counts.values())
+        if total:
+            ratios.append(({'source': source}, (counts['hit'] + counts['stale']) / total))
+    return [
+        ('smart_invest_cache_lookups_total', 'counter', 'Shared cache lookups by source and outcome.',
+         [({'source': source, 'outcome': outcome}, n) for source, counts in stats.items() for outcome, n in counts.items()]),
+        ('smart_invest_cache_hit_ratio', 'gauge', 'Share of lookups answered from the cache (fresh or stale).', ratios),
+        ('smart_invest_cache_entries', 'gauge', 'Entries in the shared cache backend.', [({}, len(cache.backend))]),
+    ]
+
+
+def cached(source: str, key: Callable[..., str] = None):
+    """
+    Decorator that routes a fetch function through the shared cache.
+    `key` builds the cache key from the call arguments, which lets other code
+    address the same entries through `cache.get`/`cache.set`; by default the
+    function name and bound arguments (with defaults applied) are used. The undecorated function stays
+    available as `.uncached`.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if key is not None:
+                cache_key = key(*args, **kwargs)
+            else:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                cache_key = f"{fn.__name__}|{tuple(bound.arguments.values())!r}"
+            return cache.get_or_fetch(source, cache_key, lambda: fn(*args, **kwargs))
+
+        wrapper.uncached = fn
+        return wrapper
+    return decorator
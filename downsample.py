@@ -0,0 +1,41 @@
+"""
+Series downsampling for charts.
+
+Largest-Triangle-Three-Buckets (LTTB) keeps the first and last point and,
+from each of the buckets in between, the point that forms the largest
+triangle with the previously kept point and the average of the next
+bucket. Peaks and troughs survive, so a few hundred points draw the same
+shape as the full series.
+"""
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the points LTTB keeps when reducing (x, y) to n_out points."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='f8')
+    y = np.asarray(y, dtype='f8')
+    # NaN closes can't win a triangle; treat them as sitting on the previous value
+    missing = np.isnan(y)
+    if missing.any():
+        y = np.nan_to_num(y[np.maximum.accumulate(np.where(missing, 0, np.arange(n)))])
+
+    # Bucket edges over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    prev = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Average of the following bucket (the last point for the final bucket)
+        nxt_start, nxt_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_stop].mean()
+        avg_y = y[nxt_start:nxt_stop].mean()
+        bx, by = x[start:stop], y[start:stop]
+        area = np.abs((x[prev] - avg_x) * (by - y[prev]) - (x[prev] - bx) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        keep[i + 1] = prev
+    return keep
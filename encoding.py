@@ -0,0 +1,127 @@
+"""
+Response encoding for the Flask API.
+
+JSON is written with orjson when it is installed, which serialises NumPy
+arrays and scalars natively (NaN becomes null), so routes can hand over
+arrays instead of building lists of Python floats. Pandas objects are
+passed through as their underlying arrays. Large responses are compressed
+(brotli if available, otherwise gzip), and GET responses carry an ETag so
+a client holding the same payload gets 304 Not Modified.
+
+dumps_bytes, compress_body and etag_for carry no Flask state, so the ASGI
+routes encode their responses the same way.
+"""
+import gzip
+import hashlib
+import json
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard json module
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip is always available
+    brotli = None
+
+MIN_COMPRESS_SIZE = 1024  # bytes; smaller bodies aren't worth the CPU
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def _to_builtin(value):
+    """JSON form of the NumPy / pandas values the encoder can't handle itself."""
+    if isinstance(value, pd.DataFrame):
+        return {col: value[col].to_numpy() for col in value.columns}
+    if isinstance(value, (pd.Series, pd.Index)):
+        return value.to_numpy()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat() if pd.notnull(value) else None
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _default(value):
+    # Only used without orjson: arrays become lists with NaN as null, like orjson writes them
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f':
+            return [None if v != v else v for v in value.tolist()]
+        return value.tolist()
+    try:
+        return _to_builtin(value)
+    except TypeError:
+        return DefaultJSONProvider.default(value)
+
+
+def dumps_bytes(obj) -> bytes:
+    """UTF-8 JSON for obj, NumPy arrays and pandas objects included."""
+    if orjson is None:
+        return json.dumps(obj, default=_default).encode()
+    return orjson.dumps(obj, default=_to_builtin,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def compress_body(body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """(body, Content-Encoding) in the best coding the client accepts; unchanged when small or none fits."""
+    if len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    if 'br' in accept_encoding and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if 'gzip' in accept_encoding:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+    return body, None
+
+
+def etag_for(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None:
+            kwargs.setdefault('default', _default)
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_to_builtin,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if orjson is None:
+            return super().response(obj)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def finalize_response(response):
+    """after_request hook: ETag / 304 for GETs, then compression of large bodies."""
+    if response.direct_passthrough or response.is_streamed or response.status_code != 200:
+        return response
+    if response.mimetype != 'application/json':
+        return response
+
+    if request.method == 'GET':
+        # Weak, because the compressed representation differs from the one hashed
+        response.set_etag(etag_for(response.get_data()), weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    response.vary.add('Accept-Encoding')
+    if 'Content-Encoding' not in response.headers:
+        body, coding = compress_body(response.get_data(), request.headers.get('Accept-Encoding', ''))
+        if coding:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = coding
+    return response
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+    app.after_request(finalize_response)
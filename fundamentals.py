@@ -0,0 +1,224 @@
+"""
+Fundamentals for a whole universe of symbols, kept as one table.
+
+Metrics (revenue, net income, P/E, EPS, growth, margin, shares) live in a
+DataFrame indexed by symbol. Rows are filled with multi-symbol yahooquery
+calls, UNIVERSE_CHUNK symbols at a time, and the whole table is refreshed
+in the background once a day and persisted to DATA_DIR, so a restart does
+not refetch it. Scores are computed for every row at once with NumPy masks.
+
+Worker processes share the persisted table: each picks up the others'
+writes when the file changes, symbols are fetched under a lease so only
+one worker downloads them, and the daily refresh skips rows another worker
+has already refreshed.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from cache import DATA_DIR, SingleFlight, atomic_write, leases
+from lazy import lazy_import
+from ratelimit import upstream_call
+
+yahooquery = lazy_import('yahooquery')
+logger = logging.getLogger(__name__)
+
+FUNDAMENTAL_COLUMNS = ['revenue', 'net_income', 'trailingPE', 'eps', 'marketPrice',
+                       'revenueYoY', 'netMargin', 'sharesOutstanding']
+# Metrics yahooquery left unset are NaN in these; a row with all of them NaN holds no data
+RAW_COLUMNS = ['revenue', 'net_income', 'trailingPE', 'eps', 'marketPrice']
+UNIVERSE_CHUNK = 100              # symbols per yahooquery request
+REFRESH_INTERVAL = 24 * 3600      # the table is refreshed daily
+MAX_ROW_AGE = 2 * REFRESH_INTERVAL  # older rows are refetched on lookup
+
+
+def _numeric(module: Dict, symbols: List[str], field: str) -> np.ndarray:
+    """One field of a yahooquery module for every symbol; NaN where missing or not a number."""
+    out = np.full(len(symbols), np.nan)
+    for i, s in enumerate(symbols):
+        data = module.get(s)
+        if isinstance(data, dict):
+            value = data.get(field)
+            if isinstance(value, (int, float)):
+                out[i] = value
+    return out
+
+
+def _first_nonzero(primary: np.ndarray, fallback: np.ndarray) -> np.ndarray:
+    # Same as `primary or fallback` on the scalar values
+    return np.where(np.isnan(primary) | (primary == 0), fallback, primary)
+
+
+def frame_from_modules(symbols: List[str], summary_detail: Dict, financial_data: Dict,
+                       key_stats: Dict) -> pd.DataFrame:
+    """
+    Fundamentals table from multi-symbol summary_detail/financial_data/key_stats
+    results. Symbols none of the modules returned data for get no row.
+    """
+    # A failed request for the whole batch comes back as a string instead of a dict
+    summary_detail = summary_detail if isinstance(summary_detail, dict) else {}
+    financial_data = financial_data if isinstance(financial_data, dict) else {}
+    key_stats = key_stats if isinstance(key_stats, dict) else {}
+    # ...and a failed symbol as a string (e.g. "Quote not found") in place of its dict
+    symbols = [s for s in symbols
+               if any(isinstance(module.get(s), dict) for module in (summary_detail, financial_data, key_stats))]
+
+    growth = _numeric(financial_data, symbols, 'revenueGrowth')
+    margin = _numeric(financial_data, symbols, 'profitMargins')
+    shares = _numeric(key_stats, symbols, 'sharesOutstanding')
+    return pd.DataFrame({
+        'revenue': _numeric(financial_data, symbols, 'totalRevenue'),
+        'net_income': _first_nonzero(_numeric(financial_data, symbols, 'netIncomeToCommon'),
+                                     _numeric(key_stats, symbols, 'netIncomeToCommon')),
+        'trailingPE': _numeric(summary_detail, symbols, 'trailingPE'),
+        'eps': _numeric(key_stats, symbols, 'trailingEps'),
+        'marketPrice': _first_nonzero(_numeric(financial_data, symbols, 'currentPrice'),
+                                      _numeric(summary_detail, symbols, 'navPrice')),
+        'revenueYoY': np.nan_to_num(growth * 100),
+        'netMargin': np.nan_to_num(margin * 100),
+        'sharesOutstanding': np.nan_to_num(shares).astype(np.int64),
+    }, index=pd.Index(symbols, name='symbol'))
+
+
+def score_fundamentals(table: pd.DataFrame) -> np.ndarray:
+    """Fundamental score (0..1) of every row: profitable, reasonably priced, positive EPS."""
+    net_income = table['net_income'].to_numpy(dtype='f8')
+    pe = table['trailingPE'].to_numpy(dtype='f8')
+    eps = table['eps'].to_numpy(dtype='f8')
+    with np.errstate(invalid='ignore'):
+        pe_adjust = np.select([np.isnan(pe), pe <= 25, pe <= 50], [0.0, 0.1, 0.02], -0.15)
+        score = 0.5 + 0.15 * (net_income > 0) + pe_adjust + 0.05 * (eps > 0)
+    return np.clip(score, 0.0, 1.0)
+
+
+def fetch_fundamentals_frame(symbols: List[str]) -> pd.DataFrame:
+    """Fundamentals for `symbols`, one multi-symbol request per module and chunk."""
+    frames = []
+    for i in range(0, len(symbols), UNIVERSE_CHUNK):
+        chunk = symbols[i:i + UNIVERSE_CHUNK]
+        try:
+            with upstream_call(metrics.YAHOO_HOST):
+                tk = yahooquery.Ticker(chunk)
+                modules = tk.summary_detail, tk.financial_data, tk.key_stats
+            frames.append(frame_from_modules(chunk, *modules))
+        except Exception as e:
+            logger.warning("YahooQuery batch fundamentals failed for %s: %s", chunk, e)
+    if not frames:
+        return pd.DataFrame(columns=FUNDAMENTAL_COLUMNS)
+    return pd.concat(frames)
+
+
+class FundamentalsUniverse:
+    def __init__(self, path: str, fetch=fetch_fundamentals_frame):
+        self.path = path
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._thread = None
+        self._mtime = None
+        self._table = self._load()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self) -> pd.DataFrame:
+        self._mtime = self._file_mtime()
+        try:
+            return pd.read_pickle(self.path)
+        except Exception:
+            return pd.DataFrame(columns=FUNDAMENTAL_COLUMNS + ['fundamentalScore', 'fetchedAt'])
+
+    def _reload(self):
+        """Pick up the table another worker process saved since we last read it."""
+        if self._file_mtime() != self._mtime:
+            with self._lock:
+                if self._file_mtime() != self._mtime:
+                    self._table = self._load()
+
+    def _save(self, table: pd.DataFrame):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write(self.path, table.to_pickle)
+        self._mtime = self._file_mtime()
+
+    def table(self) -> pd.DataFrame:
+        """The current table (symbol index, metrics, fundamentalScore, fetchedAt); treat as read-only."""
+        return self._table
+
+    def _merge(self, rows: pd.DataFrame):
+        # Empty rows are upstream failures; stored, they would hide the symbol until MAX_ROW_AGE
+        rows = rows[rows[RAW_COLUMNS].notna().any(axis=1)]
+        if rows.empty:
+            return
+        rows = rows.assign(fundamentalScore=score_fundamentals(rows), fetchedAt=time.time())
+        # Read-modify-write of the shared file, so rows other workers just saved are kept
+        with leases.hold('fundamentals-table'):
+            self._reload()
+            with self._lock:
+                # Copy-on-write: readers keep whatever table they already hold
+                kept = self._table.drop(rows.index, errors='ignore')
+                table = pd.concat([kept, rows]) if len(kept) else rows
+                self._table = table
+                self._save(table)
+
+    def _older_than(self, symbols: List[str], max_age: float) -> List[str]:
+        self._reload()
+        table = self._table
+        fresh = set(table.index[table['fetchedAt'] > time.time() - max_age]) if len(table) else set()
+        return [s for s in symbols if s not in fresh]
+
+    def _fetch_once(self, symbols: List[str], max_age: float):
+        """Fetch and merge the symbols older than max_age, each by one worker process only."""
+        leases.run_once('fundamentals', symbols,
+                        todo=lambda pending: self._older_than(pending, max_age),
+                        work=lambda batch: self._merge(self._fetch(batch)))
+
+    def lookup(self, symbols: List[str]) -> Dict[str, Dict[str, float]]:
+        """Fundamentals dict per symbol, fetching (in bulk) only rows that are missing or too old."""
+        self.ensure_started()
+        missing = self._older_than(list(dict.fromkeys(symbols)), MAX_ROW_AGE)
+        if missing:
+            # Concurrent lookups of the same symbols share one upstream fetch
+            self._flight.do(','.join(missing), lambda: self._fetch_once(missing, MAX_ROW_AGE))
+        table = self._table
+        found = [s for s in symbols if s in table.index]
+        return table.loc[found, FUNDAMENTAL_COLUMNS].to_dict('index')
+
+    def refresh(self):
+        """Refetch every symbol in the universe that no worker has refreshed in the last REFRESH_INTERVAL."""
+        with self._refresh_lock:
+            self._reload()
+            symbols = list(self._table.index)
+            if symbols:
+                self._fetch_once(symbols, REFRESH_INTERVAL)
+
+    def _run(self):
+        while True:
+            self._reload()
+            table = self._table
+            age = time.time() - table['fetchedAt'].min() if len(table) else 0
+            if age >= REFRESH_INTERVAL:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning("Error refreshing fundamentals universe: %s", e)
+                age = 0
+            time.sleep(max(60, REFRESH_INTERVAL - age))
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='fundamentals-refresh', daemon=True)
+                self._thread.start()
+
+
+fundamentals_universe = FundamentalsUniverse(os.path.join(DATA_DIR, 'fundamentals.pkl'))
@@ -0,0 +1,91 @@
+"""
+Chart series behind /history.
+
+Each symbol has one long daily series (HISTORY_PERIOD, kept current by the
+price store) with SMA 50/200 computed once over all of it and cached as
+plain arrays. A requested period is a slice of those arrays (a view, not a
+copy), so switching periods costs no upstream call and every period shows
+long-window indicators that were warmed up on the data before it. Long
+ranges can be resampled to weekly or monthly bars.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+import technicals
+from cache import cached
+from price_store import period_start, price_store
+
+HISTORY_PERIOD = '10y'
+INTERVALS = ('1d', '1wk', '1mo')
+# interval='auto': the coarsest interval whose bar count still fits the chart comfortably
+AUTO_INTERVAL_MAX_BARS = 800
+
+
+@cached('history', key=lambda symbol, base_period=HISTORY_PERIOD: f"{symbol}|{base_period}")
+def load_series(symbol: str, base_period: str = HISTORY_PERIOD) -> Optional[Dict[str, np.ndarray]]:
+    """Daily date/close/volume arrays for `base_period` plus SMAs over the whole series, or None."""
+    data = price_store.get_frame(symbol, base_period)
+    if data.empty:
+        return None
+    close = data['close'].to_numpy(dtype='f8')
+    return {
+        'date': data['date'].to_numpy(dtype='datetime64[D]'),
+        'close': close,
+        'volume': data['volume'].to_numpy(dtype='f8'),
+        'sma50': technicals.rolling_mean(close, *technicals.SMA_FAST),
+        'sma200': technicals.rolling_mean(close, *technicals.SMA_SLOW),
+    }
+
+
+def base_period_for(period: str) -> str:
+    # Only 'max' reaches further back than the shared series
+    return 'max' if period == 'max' else HISTORY_PERIOD
+
+
+def period_slice(series: Dict[str, np.ndarray], period: str) -> Dict[str, np.ndarray]:
+    """The bars of `period` (ending today) as views into the series arrays."""
+    start = period_start(period)
+    if start is None:
+        return series
+    i = int(np.searchsorted(series['date'], np.datetime64(start.date(), 'D')))
+    return {name: values[i:] for name, values in series.items()}
+
+
+def _bucket_keys(dates: np.ndarray, interval: str) -> np.ndarray:
+    if interval == '1mo':
+        return dates.astype('datetime64[M]').astype('int64')
+    # datetime64[W] weeks start on Thursday (the epoch's weekday); shift to Monday-based weeks
+    return (dates.astype('int64') + 3) // 7
+
+
+def resample(series: Dict[str, np.ndarray], interval: str) -> Dict[str, np.ndarray]:
+    """
+    Weekly or monthly bars: the last trading day's date, close and SMAs in
+    each bucket, with volume summed over the bucket. The store keeps daily
+    closes only, so open/high/low are the bucket's first, highest and
+    lowest daily close.
+    """
+    if interval == '1d' or len(series['date']) == 0:
+        return series
+    keys = _bucket_keys(series['date'], interval)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+    out = {name: values[ends] for name, values in series.items() if name != 'volume'}
+    close = series['close']
+    out['open'] = close[starts]
+    # fmax/fmin skip NaN closes
+    out['high'] = np.fmax.reduceat(close, starts)
+    out['low'] = np.fmin.reduceat(close, starts)
+    out['volume'] = np.add.reduceat(np.nan_to_num(series['volume']), starts)
+    return out
+
+
+def pick_interval(series: Dict[str, np.ndarray]) -> str:
+    """interval='auto': daily bars unless there are too many, then weekly, then monthly."""
+    n = len(series['date'])
+    if n <= AUTO_INTERVAL_MAX_BARS:
+        return '1d'
+    if n / 5 <= AUTO_INTERVAL_MAX_BARS:
+        return '1wk'
+    return '1mo'
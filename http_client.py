@@ -0,0 +1,227 @@
+"""
+Shared HTTP client for news and RSS requests.
+
+One requests.Session with a sized connection pool keeps TLS connections to
+news.google.com / newsapi.org alive between calls. Requests are retried a
+bounded number of times with full-jitter exponential backoff, each host has
+a global concurrency limit, and RSS feeds can be fetched with conditional
+GETs (ETag / Last-Modified) so unchanged feeds are not downloaded again.
+
+AsyncHttpClient applies the same policies on an httpx AsyncClient for the
+ASGI server (asgi.py), where fetches are awaited on the event loop instead
+of holding a thread each.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from cache import MemoryBackend
+from lazy import lazy_import
+from ratelimit import rate_limiter
+
+# Only needed by the async client
+httpx = lazy_import('httpx')
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 20
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5   # seconds
+BACKOFF_CAP = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_CONCURRENCY_PER_HOST = 4
+# Responses kept for answering 304 Not Modified
+VALIDATOR_CACHE_SIZE = 256
+USER_AGENT = 'SmartInvest/1.0 (+https://github.com/Rishit-Ranjan/Smart_Invest)'
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, at least Retry-After (capped) when the server sent one."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, min(BACKOFF_CAP, float(retry_after)))
+    return delay
+
+
+def _validator_headers(previous) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since for a response kept in the validator cache."""
+    headers = {}
+    if previous is not None:
+        etag, last_modified, _ = previous[0]
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+class HttpClient:
+    def __init__(self, pool_size: int = POOL_SIZE, max_retries: int = MAX_RETRIES,
+                 max_per_host: int = MAX_CONCURRENCY_PER_HOST):
+        self.max_retries = max_retries
+        self.max_per_host = max_per_host
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        # Retries are handled here (with jitter), not by urllib3
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+        self._validators = MemoryBackend(maxsize=VALIDATOR_CACHE_SIZE)
+
+    def _slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._host_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return slot
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[str] = None):
+        time.sleep(_backoff_delay(attempt, retry_after))
+
+    def get(self, url: str, params: Dict = None, timeout: float = 10,
+            conditional: bool = False) -> requests.Response:
+        """
+        GET with pooling, retries and a per-host concurrency limit.
+        With conditional=True the last response for the same URL is revalidated
+        and returned as-is when the server answers 304 Not Modified.
+        """
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        host = urlsplit(full_url).netloc
+
+        previous = self._validators.get(full_url) if conditional else None
+        headers = _validator_headers(previous)
+
+        for attempt in range(self.max_retries + 1):
+            # Shared with the other worker processes; raises RateLimitExceeded rather than queueing too long
+            rate_limiter.acquire(host)
+            start = time.perf_counter()
+            try:
+                with self._slot(host):
+                    response = self.session.get(full_url, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.UPSTREAM_REQUESTS.inc(host=host, outcome='error')
+                metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+                if attempt == self.max_retries:
+                    raise
+                logger.info("GET %s failed (%s), retry %d/%d", host, e, attempt + 1, self.max_retries)
+                self._backoff(attempt)
+                continue
+            # Each attempt counts, so retries and 429s are visible per host
+            metrics.UPSTREAM_REQUESTS.inc(host=host, outcome=response.status_code)
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                logger.info("GET %s returned %s, retry %d/%d", host, response.status_code, attempt + 1, self.max_retries)
+                self._backoff(attempt, response.headers.get('Retry-After'))
+                continue
+            break
+
+        if conditional:
+            if response.status_code == 304 and previous is not None:
+                return previous[0][2]
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if response.ok and (etag or last_modified):
+                self._validators.set(full_url, (etag, last_modified, response), time.time())
+        return response
+
+
+http = HttpClient()
+
+
+class AsyncHttpClient:
+    """HttpClient for asyncio: the same rate limits, per-host limits, retries and conditional GETs."""
+
+    def __init__(self, pool_size: int = POOL_SIZE, max_retries: int = MAX_RETRIES,
+                 max_per_host: int = MAX_CONCURRENCY_PER_HOST):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.max_per_host = max_per_host
+        self._client = None
+        self._host_slots = {}
+        self._mounts = {}
+        self._validators = MemoryBackend(maxsize=VALIDATOR_CACHE_SIZE)
+
+    def mount(self, prefix: str, transport):
+        """Send requests for URLs starting with `prefix` through an httpx transport (like Session.mount)."""
+        self._mounts[prefix] = transport
+        self._client = None
+
+    def _session(self):
+        # Created on first use so it belongs to the server's event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={'User-Agent': USER_AGENT},
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                follow_redirects=True,
+                mounts=self._mounts or None,
+            )
+        return self._client
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        # Only touched from the event loop thread, so no lock is needed
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return slot
+
+    async def get(self, url: str, params: Dict = None, timeout: float = 10, conditional: bool = False):
+        """Awaitable HttpClient.get; returns an httpx.Response."""
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        host = urlsplit(full_url).netloc
+
+        previous = self._validators.get(full_url) if conditional else None
+        headers = _validator_headers(previous)
+
+        for attempt in range(self.max_retries + 1):
+            # Same shared buckets as the sync client. Taking the token is a short SQLite
+            # transaction that can block on other workers, so it runs off the loop;
+            # the wait itself is slept on the loop
+            wait = await asyncio.get_running_loop().run_in_executor(None, rate_limiter.reserve, host)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            start = time.perf_counter()
+            try:
+                async with self._slot(host):
+                    response = await self._session().get(full_url, headers=headers, timeout=timeout)
+            except httpx.TransportError as e:
+                metrics.UPSTREAM_REQUESTS.inc(host=host, outcome='error')
+                metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+                if attempt == self.max_retries:
+                    raise
+                logger.info("GET %s failed (%s), retry %d/%d", host, e, attempt + 1, self.max_retries)
+                await asyncio.sleep(_backoff_delay(attempt))
+                continue
+            metrics.UPSTREAM_REQUESTS.inc(host=host, outcome=response.status_code)
+            metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                logger.info("GET %s returned %s, retry %d/%d", host, response.status_code, attempt + 1, self.max_retries)
+                await asyncio.sleep(_backoff_delay(attempt, response.headers.get('Retry-After')))
+                continue
+            break
+
+        if conditional:
+            if response.status_code == 304 and previous is not None:
+                return previous[0][2]
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if response.is_success and (etag or last_modified):
+                self._validators.set(full_url, (etag, last_modified, response), time.time())
+        return response
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async_http = AsyncHttpClient()
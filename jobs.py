@@ -0,0 +1,135 @@
+"""
+Background jobs for long-running analyses.
+
+POST /analyze, /analyze/batch and /backtest with "async": true return a
+job id right away instead of holding a Flask worker for the whole run. A
+small worker pool runs the analysis; results are fetched with GET
+/jobs/<id> or pushed with GET /jobs/<id>/events. Identical requests that are still queued or
+running are coalesced into one job.
+"""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from backtest import run_backtest
+from smart_invest_logic import run_batch_analysis, run_investment_analysis
+
+JOB_WORKERS = 4
+# Finished jobs stay readable for this long
+JOB_RETENTION = 600  # seconds
+MAX_FINISHED_JOBS = 1000
+
+JOB_KINDS: Dict[str, Callable[[Dict], Dict]] = {
+    'analyze': run_investment_analysis,
+    'batch': run_batch_analysis,
+    'backtest': run_backtest,
+}
+
+
+def job_key(kind: str, params: Dict) -> str:
+    """Canonical form of a request, so equivalent submissions coalesce."""
+    normalized = {k: v for k, v in params.items() if k != 'async'}
+    if isinstance(normalized.get('ticker'), str):
+        normalized['ticker'] = normalized['ticker'].strip().upper()
+    if isinstance(normalized.get('tickers'), list):
+        normalized['tickers'] = [str(t).strip().upper() for t in normalized['tickers']]
+    return kind + '|' + json.dumps(normalized, sort_keys=True, default=str)
+
+
+class Job:
+    def __init__(self, kind: str, key: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = 'queued'
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.done = threading.Event()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def add_done_callback(self, fn: Callable[['Job'], None]):
+        """Call fn(job) once the job finishes (right away if it already has), from the finishing thread."""
+        with self._callbacks_lock:
+            if not self.done.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _finish(self):
+        with self._callbacks_lock:
+            self.done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        out = {
+            'jobId': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'createdAt': self.created_at,
+            'finishedAt': self.finished_at,
+        }
+        if include_result and self.done.is_set():
+            out['result'] = self.result
+        return out
+
+
+class JobQueue:
+    def __init__(self, workers: int = JOB_WORKERS, kinds: Dict[str, Callable] = None):
+        self._kinds = kinds or JOB_KINDS
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis-job')
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, params: Dict):
+        """(job, coalesced) — an identical queued or running job is reused."""
+        key = job_key(kind, params)
+        with self._lock:
+            self._purge()
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                return self._jobs[job_id], True
+            job = Job(kind, key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+        self._pool.submit(self._run, job, dict(params))
+        return job, False
+
+    def _run(self, job: Job, params: Dict):
+        job.status = 'running'
+        try:
+            result = self._kinds[job.kind](params)
+        except Exception as e:
+            result = {'error': str(e)}
+        with self._lock:
+            job.result = result
+            job.status = 'failed' if 'error' in result else 'done'
+            job.finished_at = time.time()
+            self._in_flight.pop(job.key, None)
+        job._finish()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            # Expired jobs are gone even if nothing has been submitted since
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def _purge(self):
+        now = time.time()
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        expired = {j.id for j in finished if now - j.finished_at > JOB_RETENTION}
+        if len(finished) - len(expired) > MAX_FINISHED_JOBS:
+            remaining = sorted((j for j in finished if j.id not in expired), key=lambda j: j.finished_at)
+            expired.update(j.id for j in remaining[:len(remaining) - MAX_FINISHED_JOBS])
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_queue = JobQueue()
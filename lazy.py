@@ -0,0 +1,37 @@
+"""
+Deferred imports for dependencies that are slow to import.
+
+yahooquery and bs4 together add about half a second to startup and are
+only needed once a request actually reaches Yahoo or parses a feed.
+lazy_import() returns a stand-in that imports the real module on first
+attribute access, so `yahooquery.Ticker(...)` works unchanged and patching
+`yahooquery.Ticker` (as replay.py does) is still seen by every caller.
+"""
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """A module proxy for `name` that imports it on first use."""
+    return LazyModule(name)
@@ -0,0 +1,205 @@
+"""
+Incremental technical indicators for live re-scoring.
+
+IncrementalIndicators is seeded once from a symbol's close history and then
+updated in O(1) per new bar (push) or per tick on the forming bar
+(update_last), using running sums over a ring buffer for the SMAs and a
+sliding-window Welford variance for Volatility30. Its latest() row has the
+same fields as compute_technicals, and technical_score_for_latest and
+calculate_smart_threshold accept either the state or that row in place of
+a compute_technicals frame.
+
+live_book holds one state per symbol on the /stream watchlist. Between
+full re-scores the stream folds each new quote into it and re-scores the
+technical side without recomputing any window.
+"""
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import technicals
+from price_store import price_store
+
+# Recompute the running sums from the buffer every so often to cancel float drift
+RESYNC_EVERY = 1000
+
+
+class IncrementalIndicators:
+    def __init__(self):
+        self._fast, self._fast_min = technicals.SMA_FAST
+        self._slow, self._slow_min = technicals.SMA_SLOW
+        self._vol, self._vol_min = technicals.VOLATILITY
+        self._lag = technicals.MOMENTUM_LAG
+        # Ring buffer holding as many closes as the longest window needs
+        self._closes = deque(maxlen=max(self._slow, self._lag + 1))
+        self._sum_fast = 0.0
+        self._sum_slow = 0.0
+        # Welford state over the last `_vol` closes
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._updates = 0
+        self.last_date = None
+
+    @classmethod
+    def from_history(cls, closes: pd.Series) -> 'IncrementalIndicators':
+        state = cls()
+        closes = closes.dropna()
+        for value in closes.to_numpy(dtype=float)[-state._closes.maxlen:]:
+            state.push(value)
+        if len(closes) and isinstance(closes.index, pd.DatetimeIndex):
+            state.last_date = closes.index[-1].normalize()
+        return state
+
+    def _welford_add(self, x: float):
+        self._n += 1
+        delta = x - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (x - self._mean)
+
+    def _welford_remove(self, x: float):
+        if self._n <= 1:
+            self._n, self._mean, self._m2 = 0, 0.0, 0.0
+            return
+        self._n -= 1
+        delta = x - self._mean
+        self._mean -= delta / self._n
+        self._m2 -= delta * (x - self._mean)
+
+    def push(self, close: float, date: pd.Timestamp = None):
+        """Append a new bar."""
+        buf = self._closes
+        if len(buf) >= self._fast:
+            self._sum_fast -= buf[-self._fast]
+        if len(buf) >= self._slow:
+            self._sum_slow -= buf[-self._slow]
+        if len(buf) >= self._vol:
+            self._welford_remove(buf[-self._vol])
+        buf.append(close)
+        self._sum_fast += close
+        self._sum_slow += close
+        self._welford_add(close)
+        if date is not None:
+            self.last_date = pd.Timestamp(date).normalize()
+        self._tick()
+
+    def update_last(self, close: float):
+        """Revise the close of the bar that is still forming (a live tick)."""
+        if not self._closes:
+            self.push(close)
+            return
+        old = self._closes[-1]
+        self._closes[-1] = close
+        self._sum_fast += close - old
+        self._sum_slow += close - old
+        self._welford_remove(old)
+        self._welford_add(close)
+        self._tick()
+
+    def on_price(self, price: float, date: pd.Timestamp):
+        """Route a quote to push or update_last depending on whether it opens a new trading day."""
+        date = pd.Timestamp(date).normalize()
+        if self.last_date is None or date > self.last_date:
+            self.push(price, date)
+        elif date == self.last_date:
+            self.update_last(price)
+
+    def _tick(self):
+        self._updates += 1
+        if self._updates % RESYNC_EVERY == 0:
+            values = list(self._closes)
+            self._sum_fast = float(sum(values[-self._fast:]))
+            self._sum_slow = float(sum(values[-self._slow:]))
+            window = values[-self._vol:]
+            self._n = len(window)
+            self._mean = float(np.mean(window)) if window else 0.0
+            self._m2 = float(np.sum((np.asarray(window) - self._mean) ** 2)) if window else 0.0
+
+    def latest(self) -> Dict[str, float]:
+        """Current indicator row, with the same keys and min_periods rules as compute_technicals."""
+        count = len(self._closes)
+        if count == 0:
+            return {}
+        fast_n = min(count, self._fast)
+        slow_n = min(count, self._slow)
+        return {
+            'Close': self._closes[-1],
+            'SMA50': self._sum_fast / fast_n if fast_n >= self._fast_min else np.nan,
+            'SMA200': self._sum_slow / slow_n if slow_n >= self._slow_min else np.nan,
+            'Momentum30': self._closes[-1] - self._closes[-self._lag - 1] if count > self._lag else np.nan,
+            'Volatility30': (
+                float(np.sqrt(max(self._m2, 0.0) / (self._n - 1)))
+                if self._n >= self._vol_min and self._n > 1 else np.nan
+            ),
+        }
+
+    def technical_score(self) -> float:
+        row = self.latest()
+        if not row:
+            return 0.5
+        return float(technicals.technical_score(
+            row['Close'], row['SMA50'], row['SMA200'], row['Momentum30'], row['Volatility30']
+        ))
+
+    def smart_threshold(self, base_threshold: float = 0.6) -> float:
+        row = self.latest()
+        if not row:
+            return base_threshold
+        return float(technicals.smart_threshold(row['Close'], row['Volatility30'], base_threshold))
+
+
+class LiveIndicatorBook:
+    """Indicator state per symbol, seeded lazily from the price store."""
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def ensure(self, symbols: List[str]):
+        """Seed any symbols that have no state yet, with a single store read."""
+        with self._lock:
+            missing = [s for s in symbols if s not in self._states]
+        if missing:
+            self.seed(missing)
+
+    def seed(self, symbols: List[str]):
+        """(Re)build the state of `symbols` from the stored history, e.g. after a full re-score."""
+        prices = price_store.get_closes(symbols, period="1y")
+        with self._lock:
+            for symbol in symbols:
+                if symbol in prices.columns:
+                    self._states[symbol] = IncrementalIndicators.from_history(prices[symbol])
+
+    def retain(self, symbols: List[str]):
+        """Drop the state of symbols nobody watches any more."""
+        keep = set(symbols)
+        with self._lock:
+            self._states = {s: state for s, state in self._states.items() if s in keep}
+
+    def get(self, symbol: str) -> Optional[IncrementalIndicators]:
+        return self._states.get(symbol)
+
+    def on_price(self, symbol: str, price: float, date: pd.Timestamp):
+        state = self._states.get(symbol)
+        if state is not None:
+            with self._lock:
+                state.on_price(price, date)
+
+    def scores(self, symbols: List[str]) -> Dict[str, Dict[str, float]]:
+        out = {}
+        with self._lock:
+            for symbol in symbols:
+                state = self._states.get(symbol)
+                if state is not None:
+                    out[symbol] = {
+                        'currentPrice': state.latest()['Close'],
+                        'technicalScore': state.technical_score(),
+                        'suggestedThreshold': state.smart_threshold(),
+                    }
+        return out
+
+
+live_book = LiveIndicatorBook()
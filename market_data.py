@@ -0,0 +1,197 @@
+"""
+Index quotes for the market ticker bar, refreshed in the background.
+
+A daemon thread refreshes SENSEX, NIFTY 50, BANK NIFTY, DOW, S&P 500 and
+NASDAQ on its own cadence: every minute while either region's exchange is
+open, every 15 minutes otherwise. /market always answers from memory; the
+only on-demand fetch is the very first one before the refresher has run,
+and concurrent callers share it.
+"""
+import logging
+import threading
+from datetime import datetime
+from datetime import time as dtime
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+import metrics
+from cache import SingleFlight, cache
+from lazy import lazy_import
+from ratelimit import upstream_call
+
+yahooquery = lazy_import('yahooquery')
+logger = logging.getLogger(__name__)
+
+# symbol -> display name, per region
+INDICES = {
+    'IN': {
+        '^BSESN': 'SENSEX',
+        '^NSEI': 'NIFTY 50',
+        '^NSEBANK': 'BANK NIFTY',
+    },
+    'US': {
+        '^DJI': 'DOW JONES',
+        '^GSPC': 'S&P 500',
+        '^IXIC': 'NASDAQ',
+    },
+}
+
+# Regular trading session per region (weekdays, exchange local time)
+MARKET_HOURS = {
+    'IN': ('Asia/Kolkata', dtime(9, 15), dtime(15, 30)),
+    'US': ('America/New_York', dtime(9, 30), dtime(16, 0)),
+}
+
+OPEN_REFRESH_INTERVAL = 60      # seconds, while any market is open
+CLOSED_REFRESH_INTERVAL = 900   # 15 minutes otherwise
+
+
+def is_market_open(region: str, now: datetime = None) -> bool:
+    tz_name, opens, closes = MARKET_HOURS[region]
+    local = (now or datetime.now(tz=ZoneInfo('UTC'))).astimezone(ZoneInfo(tz_name))
+    return local.weekday() < 5 and opens <= local.time() <= closes
+
+
+def refresh_interval(now: datetime = None) -> int:
+    if any(is_market_open(region, now) for region in MARKET_HOURS):
+        return OPEN_REFRESH_INTERVAL
+    return CLOSED_REFRESH_INTERVAL
+
+
+def fetch_quotes(symbols: List[str]) -> Dict[str, Dict]:
+    """Latest price, previous close and trading date per symbol, from one multi-symbol price request."""
+    with upstream_call(metrics.YAHOO_HOST):
+        quotes = yahooquery.Ticker(symbols).price
+    if not isinstance(quotes, dict):
+        return {}
+
+    out = {}
+    for symbol in symbols:
+        data = quotes.get(symbol)
+        if not isinstance(data, dict) or not isinstance(data.get('regularMarketPrice'), (int, float)):
+            continue
+        market_time = data.get('regularMarketTime')
+        try:
+            # yahooquery gives the exchange-local time as a string, or epoch seconds
+            date = pd.Timestamp(market_time, unit='s') if isinstance(market_time, (int, float)) else pd.Timestamp(market_time)
+        except (TypeError, ValueError):
+            date = None
+        out[symbol] = {
+            'price': float(data['regularMarketPrice']),
+            'previousClose': data.get('regularMarketPreviousClose'),
+            'date': (date if date is not None and not pd.isna(date) else pd.Timestamp.now()).normalize(),
+        }
+    return out
+
+
+def fetch_market_quotes() -> List[Dict]:
+    """Fetch index quotes for the ticker bar in one batch request"""
+    market_data = []
+
+    # Combine all symbols for a single batch request
+    all_symbols = [symbol for symbols in INDICES.values() for symbol in symbols]
+    with upstream_call(metrics.YAHOO_HOST):
+        quotes = yahooquery.Ticker(all_symbols).price
+
+    if not isinstance(quotes, dict):
+        quotes = {}
+
+    for region, symbols in INDICES.items():
+        for symbol, name in symbols.items():
+            try:
+                if symbol not in quotes or not isinstance(quotes[symbol], dict):
+                    continue
+
+                data = quotes[symbol]
+                current = data.get('regularMarketPrice', 0)
+                prev_close = data.get('regularMarketPreviousClose', 0)
+                change = current - prev_close if prev_close else 0
+                change_pct = (change / prev_close * 100) if prev_close else 0
+
+                market_data.append({
+                    'symbol': symbol,
+                    'name': name,
+                    'price': round(current, 2),
+                    'change': round(change, 2),
+                    'changePercent': round(change_pct, 2),
+                    'region': region
+                })
+            except Exception as e:
+                logger.warning("Error reading quote for %s: %s", symbol, e)
+                continue
+
+    return market_data
+
+
+class MarketDataRefresher:
+    def __init__(self, fetch=fetch_market_quotes):
+        self._fetch = fetch
+        self._data = []
+        self._updated_at = None
+        self._last_error = None
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._thread = None
+        self._wake = threading.Event()
+        self._listeners = []
+
+    def add_listener(self, fn):
+        """Call fn(quotes) after every successful refresh."""
+        self._listeners.append(fn)
+
+    def refresh(self) -> List[Dict]:
+        """Fetch now; concurrent callers share one upstream request."""
+        return self._flight.do('market', self._refresh)
+
+    def _refresh(self) -> List[Dict]:
+        try:
+            # Through the shared cache, so with several workers only one of them calls Yahoo per
+            # half interval; the others pick up its quotes
+            data = cache.get_or_fetch('market', 'indices', self._fetch, ttl=refresh_interval() / 2, serve_stale=False)
+        except Exception as e:
+            logger.warning("Error fetching market data: %s", e)
+            with self._lock:
+                self._last_error = str(e)
+                return self._data
+        with self._lock:
+            if data:
+                self._data = data
+                self._updated_at = datetime.now()
+                self._last_error = None
+            else:
+                self._last_error = 'No quotes returned'
+                return self._data
+        for listener in self._listeners:
+            try:
+                listener(data)
+            except Exception as e:
+                logger.exception("Error in market data listener: %s", e)
+        return data
+
+    def snapshot(self) -> Tuple[List[Dict], Optional[datetime], Optional[str]]:
+        """(quotes, last successful refresh, last error); fetches only if nothing was ever loaded."""
+        with self._lock:
+            loaded = bool(self._data)
+        if not loaded:
+            self.refresh()
+        with self._lock:
+            return self._data, self._updated_at, self._last_error
+
+    def _run(self):
+        while True:
+            self.refresh()
+            self._wake.wait(refresh_interval())
+            self._wake.clear()
+
+    def ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='market-refresher', daemon=True)
+                self._thread.start()
+
+
+market_refresher = MarketDataRefresher()
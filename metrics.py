@@ -0,0 +1,175 @@
+"""
+In-process metrics, served in the Prometheus text format at GET /metrics.
+
+Counters and histograms are plain objects keyed by label values; modules
+record into the shared instances below. Values that already live
+elsewhere (cache hit counts, queue sizes) are read at scrape time by
+collectors registered with register_collector(), so they are not counted
+twice. Metrics are per process: with several workers, scrape each one.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Seconds; covers cached lookups through slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+YAHOO_HOST = 'query2.finance.yahoo.com'
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in labels.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts, the last one for +Inf, then the sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield self.name + '_bucket', {**labels, 'le': _format_value(bound)}, cumulative
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, cumulative
+
+
+_registry: List[_Metric] = []
+# Each collector returns [(name, kind, documentation, [(labels, value), ...]), ...]
+_collectors: List[Callable[[], List[Tuple[str, str, str, List[Tuple[Dict, float]]]]]] = []
+
+STAGE_SECONDS = Histogram('smart_invest_stage_seconds', 'Time spent in each analysis stage.', ('stage',))
+REQUEST_SECONDS = Histogram('smart_invest_http_request_seconds', 'API request latency by route.',
+                            ('route', 'method', 'status'))
+UPSTREAM_REQUESTS = Counter('smart_invest_upstream_requests_total',
+                            'Upstream calls by host and outcome (HTTP status or "error").', ('host', 'outcome'))
+UPSTREAM_SECONDS = Histogram('smart_invest_upstream_request_seconds', 'Upstream call latency by host.', ('host',))
+RATE_LIMIT_WAIT_SECONDS = Histogram('smart_invest_rate_limit_wait_seconds',
+                                    'Time spent waiting for an upstream rate-limit token.', ('host',))
+SENTIMENT_LOOKUPS = Counter('smart_invest_sentiment_cache_total', 'VADER score memo lookups by outcome.', ('outcome',))
+
+
+@contextmanager
+def track_upstream(host: str):
+    """Count and time one upstream call made by a library that doesn't go through http_client."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_REQUESTS.inc(host=host, outcome='error')
+        raise
+    else:
+        UPSTREAM_REQUESTS.inc(host=host, outcome='ok')
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - start, host=host)
+
+
+def register_collector(fn):
+    """Add a callable that reports externally held values at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in metric.samples())
+    for collector in _collectors:
+        for name, kind, documentation, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """Time every request by its route pattern (e.g. /jobs/<job_id>), including response encoding."""
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    # Registered before encoding's hook, so it runs after compression (after_request runs in reverse)
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method,
+                                    status=response.status_code)
+        return response
@@ -0,0 +1,145 @@
+"""
+Market news aggregator behind the /news route.
+
+Every feed of a category is fetched concurrently and each parsed feed is
+cached on its own (cache source 'feeds'), so a request only merges and
+dedupes already-cleaned article lists. On a cache hit no thread or socket
+is touched; on a miss the request waits for the slowest feed rather than
+the sum of all of them.
+
+fetch_news_async is the same pipeline for the ASGI server: feeds are
+awaited together on the event loop and parsed in an executor thread.
+"""
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import pandas as pd
+
+import articles
+from cache import cache, cached
+from http_client import async_http, http
+from lazy import lazy_import
+
+bs4 = lazy_import('bs4')
+logger = logging.getLogger(__name__)
+
+# News RSS feed URLs
+NEWS_FEEDS = {
+    'indian': [
+        'https://news.google.com/rss/search?q=indian+stock+market&hl=en-IN&gl=IN&ceid=IN:en',
+        'https://news.google.com/rss/search?q=nse+bse+sensex+nifty&hl=en-IN&gl=IN&ceid=IN:en',
+    ],
+    'world': [
+        'https://news.google.com/rss/search?q=stock+market+news&hl=en-US&gl=US&ceid=US:en',
+        'https://news.google.com/rss/search?q=wall+street+nasdaq+dow+jones&hl=en-US&gl=US&ceid=US:en',
+    ]
+}
+
+_feed_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='feed-fetch')
+
+
+def _feed_items(content: bytes) -> List[Dict[str, str]]:
+    """Raw title/link/pubDate/source/description text of every <item>."""
+    fields = ('title', 'link', 'pubDate', 'source', 'description')
+    try:
+        root = ET.fromstring(content)
+        return [{f: item.findtext(f) or '' for f in fields} for item in root.iter('item')]
+    except ET.ParseError:
+        # Feeds are occasionally not well-formed; fall back to the forgiving parser
+        soup = bs4.BeautifulSoup(content, 'xml')
+        return [
+            {f: (item.find(f).text if item.find(f) else '') for f in fields}
+            for item in soup.find_all('item')
+        ]
+
+
+def parse_feed(content: bytes) -> List[Dict]:
+    """Parse an RSS document into cleaned article dicts."""
+    raw_items = []
+    for item in _feed_items(content):
+        if not item['title'] or not item['link']:
+            continue
+        raw_items.append({
+            'title': item['title'],
+            'url': item['link'].strip(),
+            'publishedAt': item['pubDate'].strip(),
+            'source': item['source'].strip() or 'Google News',
+            'description': item['description'],
+        })
+    if not raw_items:
+        return []
+
+    # Clean up title and description for the whole feed at once
+    df = pd.DataFrame(raw_items)
+    df['title'] = articles.clean_column(df['title'], strip_urls=True)
+    df['description'] = articles.clean_column(df['description'], strip_urls=True).str[:200]
+    return df[df['title'] != ''].to_dict('records')
+
+
+@cached('feeds', key=lambda feed_url: feed_url)
+def fetch_feed(feed_url: str) -> List[Dict]:
+    """Fetch and parse one feed; an empty list (never cached) on failure."""
+    try:
+        response = http.get(feed_url, timeout=10, conditional=True)
+        response.raise_for_status()
+        return parse_feed(response.content)
+    except Exception as e:
+        logger.warning("Error fetching news from %s: %s", feed_url, e)
+        return []
+
+
+async def fetch_feed_async(feed_url: str) -> List[Dict]:
+    """fetch_feed on the event loop, sharing its cache entries."""
+    async def fetch():
+        try:
+            response = await async_http.get(feed_url, timeout=10, conditional=True)
+            response.raise_for_status()
+            return await asyncio.get_running_loop().run_in_executor(None, parse_feed, response.content)
+        except Exception as e:
+            logger.warning("Error fetching news from %s: %s", feed_url, e)
+            return []
+
+    return await cache.aget_or_fetch('feeds', feed_url, fetch)
+
+
+def _merge_feeds(feeds: List[str], parsed: Dict[str, List[Dict]], limit: int) -> List[Dict]:
+    """Remove duplicates based on title, keeping feed order"""
+    seen_titles = set()
+    unique_articles = []
+    for feed_url in feeds:
+        for article in parsed[feed_url]:
+            if article['title'] not in seen_titles:
+                seen_titles.add(article['title'])
+                unique_articles.append(article)
+                if len(unique_articles) >= limit:
+                    return unique_articles
+    return unique_articles
+
+
+async def fetch_news_async(category: str = 'indian', limit: int = 10) -> List[Dict]:
+    """fetch_news for the event loop: every feed is awaited concurrently."""
+    feeds = NEWS_FEEDS.get(category, NEWS_FEEDS['indian'])
+    results = await asyncio.gather(*(fetch_feed_async(url) for url in feeds))
+    return _merge_feeds(feeds, dict(zip(feeds, results)), limit)
+
+
+def fetch_news(category: str = 'indian', limit: int = 10) -> List[Dict]:
+    """Merged, de-duplicated articles from every feed of a category"""
+    feeds = NEWS_FEEDS.get(category, NEWS_FEEDS['indian'])
+
+    parsed = {}
+    misses = []
+    for feed_url in feeds:
+        items = cache.get('feeds', feed_url)
+        if items is not None:
+            parsed[feed_url] = items
+        else:
+            misses.append(feed_url)
+    if misses:
+        futures = {url: _feed_pool.submit(fetch_feed, url) for url in misses}
+        for url, future in futures.items():
+            parsed[url] = future.result()
+    return _merge_feeds(feeds, parsed, limit)
@@ -0,0 +1,268 @@
+"""
+Local daily price-history store.
+
+Each symbol is kept as a NumPy structured array (date, close, volume) in its
+own .npy file, opened memory-mapped. A request only downloads the bars after
+the last stored date (re-fetching the last bar, which may still be forming)
+and appends them; a full download happens only for new symbols or when a
+longer period than the one already stored is requested. A symbol upstream
+has no history for is remembered for MISSING_TTL, and a failed tail fetch
+is retried on the next request.
+
+Worker processes share the store: each symbol is downloaded under a lease,
+so one worker fetches it while the others wait for its bars.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from cache import DATA_DIR, SOURCE_TTLS, atomic_write, leases
+from lazy import lazy_import
+from ratelimit import upstream_call
+
+yahooquery = lazy_import('yahooquery')
+logger = logging.getLogger(__name__)
+
+BAR_DTYPE = np.dtype([('date', 'datetime64[D]'), ('close', 'f8'), ('volume', 'f8')])
+
+# yahooquery period strings mapped to how far back they reach
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10),
+}
+
+# Don't ask upstream for new bars more often than this per symbol
+MIN_SYNC_INTERVAL = SOURCE_TTLS['prices']
+# Longer than the largest multi-symbol download takes
+SYNC_LEASE_TTL = 120  # seconds
+# A symbol upstream had no history for is not asked for again within this many seconds
+MISSING_TTL = 300
+
+
+def period_start(period: str, today: pd.Timestamp = None) -> Optional[pd.Timestamp]:
+    """First calendar date covered by a yahooquery period; None means all available history."""
+    today = (today or pd.Timestamp.now()).normalize()
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return today.replace(month=1, day=1)
+    if period not in PERIOD_OFFSETS:
+        raise ValueError(f"Unsupported period '{period}'")
+    return today - PERIOD_OFFSETS[period]
+
+
+def split_history(data, symbols: List[str]) -> Dict[str, np.ndarray]:
+    """Split a (possibly multi-symbol) yahooquery history frame into per-symbol bar arrays."""
+    if not isinstance(data, pd.DataFrame) or data.empty:
+        # yahooquery returns a dict of error messages when no symbol resolved
+        return {}
+
+    df = data.reset_index()
+    df = df.rename(columns={c: c.lower() for c in df.columns if isinstance(c, str)})
+    if 'close' not in df.columns or 'date' not in df.columns:
+        logger.warning("Unexpected history columns: %s", list(df.columns))
+        return {}
+    if 'symbol' not in df.columns:
+        if len(symbols) != 1:
+            logger.warning("'symbol' column missing and multiple tickers requested")
+            return {}
+        df['symbol'] = symbols[0]
+
+    # Strip timezone info to avoid "Cannot mix tz-aware with tz-naive", and fold the live
+    # intraday bar onto its trading date
+    dates = pd.to_datetime(df['date'], utc=True).dt.tz_localize(None).dt.normalize()
+    volume = df['volume'] if 'volume' in df.columns else pd.Series(0.0, index=df.index)
+
+    bars = {}
+    for symbol, idx in df.groupby('symbol').groups.items():
+        arr = np.empty(len(idx), dtype=BAR_DTYPE)
+        arr['date'] = dates.loc[idx].to_numpy(dtype='datetime64[D]')
+        arr['close'] = df['close'].loc[idx].to_numpy(dtype='f8')
+        arr['volume'] = volume.loc[idx].fillna(0).to_numpy(dtype='f8')
+        arr = arr[np.argsort(arr['date'], kind='stable')]
+        # keep the last bar for any duplicated date
+        keep = np.append(arr['date'][1:] != arr['date'][:-1], True)
+        bars[symbol] = arr[keep]
+    return bars
+
+
+class PriceStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, symbol: str):
+        base = os.path.join(self.root, quote(symbol, safe=''))
+        return base + '.npy', base + '.json'
+
+    def load(self, symbol: str) -> Optional[np.ndarray]:
+        """Stored bars for a symbol (memory-mapped, read-only), or None."""
+        data_path, _ = self._paths(symbol)
+        if not os.path.exists(data_path):
+            return None
+        try:
+            return np.load(data_path, mmap_mode='r')
+        except Exception as e:
+            logger.warning("Discarding unreadable price store file for %s: %s", symbol, e)
+            return None
+
+    def _meta(self, symbol: str) -> Dict:
+        _, meta_path = self._paths(symbol)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, symbol: str, bars: np.ndarray, meta: Dict):
+        data_path, meta_path = self._paths(symbol)
+        # Write then rename, so readers holding a memory map of the old file are unaffected
+        atomic_write(data_path, lambda f: np.save(f, bars))
+        self._write_meta(symbol, meta)
+
+    def _write_meta(self, symbol: str, meta: Dict):
+        _, meta_path = self._paths(symbol)
+        atomic_write(meta_path, lambda f: json.dump(meta, f), mode='w')
+
+    def _covers(self, meta: Dict, start: Optional[pd.Timestamp]) -> bool:
+        covered_from = meta.get('covered_from')
+        if covered_from is None:
+            return False
+        if covered_from == 'max':
+            return True
+        return start is not None and pd.Timestamp(covered_from) <= start
+
+    def _plan(self, symbols: List[str], start: Optional[pd.Timestamp], now: float):
+        """(symbols needing a full download, {symbol: last stored date} for incremental ones)."""
+        full, incremental = [], {}
+        with self._lock:
+            for symbol in symbols:
+                meta = self._meta(symbol)
+                stored = self.load(symbol)
+                if stored is None and now - meta.get('missing_at', 0) < MISSING_TTL:
+                    continue  # recently found to have no data
+                if stored is None or len(stored) == 0 or not self._covers(meta, start):
+                    full.append(symbol)
+                elif now - meta.get('checked_at', 0) >= MIN_SYNC_INTERVAL:
+                    incremental[symbol] = stored['date'][-1]
+        return full, incremental
+
+    def _outdated(self, symbols: List[str], start: Optional[pd.Timestamp]) -> List[str]:
+        full, incremental = self._plan(symbols, start, time.time())
+        return full + list(incremental)
+
+    def sync(self, symbols: List[str], period: str = '1y'):
+        """Bring the stored history of `symbols` up to date for `period` with as few downloads as possible."""
+        start = period_start(period)
+        leases.run_once('prices', list(dict.fromkeys(symbols)),
+                        todo=lambda pending: self._outdated(pending, start),
+                        work=lambda batch: self._update(batch, period, start),
+                        ttl=SYNC_LEASE_TTL)
+
+    def _update(self, symbols: List[str], period: str, start: Optional[pd.Timestamp]):
+        now = time.time()
+        # Planned again under the lease: another worker may have just stored these.
+        # The lock only guards planning and writing; downloads run without it
+        full, incremental = self._plan(symbols, start, now)
+
+        if full:
+            logger.debug("Price store full download for %s (%s)", full, period)
+            fetched = self._download(full, period=period)
+            covered_from = 'max' if start is None else start.strftime('%Y-%m-%d')
+            with self._lock:
+                for symbol in full if fetched is not None else []:
+                    if symbol in fetched:
+                        self._write(symbol, fetched[symbol], {'covered_from': covered_from, 'checked_at': now})
+                    elif self.load(symbol) is None:
+                        # Upstream answered but has nothing for it (e.g. a bare NSE ticker):
+                        # a short negative entry, so every request doesn't ask again
+                        self._write_meta(symbol, {'missing_at': now})
+
+        if incremental:
+            since = min(incremental.values())
+            logger.debug("Price store incremental download for %s since %s", list(incremental), since)
+            fetched = self._download(list(incremental), start=str(since))
+            if fetched is None:
+                # Not stamped as checked: the next request retries instead of serving stale bars as fresh
+                return
+            with self._lock:
+                for symbol in incremental:
+                    stored = self.load(symbol)
+                    meta = self._meta(symbol)
+                    meta['checked_at'] = now
+                    new_bars = fetched.get(symbol)
+                    if new_bars is not None and len(new_bars):
+                        # Replace the overlapping tail (the previous last bar may have been intraday)
+                        head = stored[stored['date'] < new_bars['date'][0]]
+                        bars = np.concatenate([head, new_bars])
+                    else:
+                        bars = np.array(stored)
+                    self._write(symbol, bars, meta)
+
+    def _download(self, symbols: List[str], period: str = None, start: str = None) -> Optional[Dict[str, np.ndarray]]:
+        """Bars per symbol upstream returned (symbols it has no data for are absent); None if the request failed."""
+        try:
+            # Use single string if only one ticker to avoid MultiIndex complexity in some cases
+            with upstream_call(metrics.YAHOO_HOST):
+                tk = yahooquery.Ticker(symbols[0] if len(symbols) == 1 else symbols)
+                data = tk.history(start=start) if start else tk.history(period=period)
+            return split_history(data, symbols)
+        except Exception as e:
+            logger.warning("Price store download failed for %s: %s", symbols, e)
+            return None
+
+    def _slice(self, symbol: str, start: Optional[pd.Timestamp]) -> Optional[np.ndarray]:
+        bars = self.load(symbol)
+        if bars is None or len(bars) == 0:
+            return None
+        if start is not None:
+            bars = bars[np.searchsorted(bars['date'], np.datetime64(start.date(), 'D')):]
+        return bars
+
+    def get_closes(self, symbols: List[str], period: str = '1y') -> pd.DataFrame:
+        """Date x symbol frame of closing prices, assembled directly from the stored arrays."""
+        self.sync(symbols, period)
+        start = period_start(period)
+        columns = {}
+        for symbol in symbols:
+            bars = self._slice(symbol, start)
+            if bars is not None and len(bars):
+                columns[symbol] = pd.Series(
+                    np.array(bars['close']), index=pd.DatetimeIndex(np.array(bars['date']), name='date')
+                )
+        if not columns:
+            return pd.DataFrame()
+        prices = pd.DataFrame(columns)
+        prices.columns.name = 'symbol'
+        return prices
+
+    def get_frame(self, symbol: str, period: str = '1y') -> pd.DataFrame:
+        """Single-symbol frame with date, close and volume columns."""
+        self.sync([symbol], period)
+        bars = self._slice(symbol, period_start(period))
+        if bars is None or len(bars) == 0:
+            return pd.DataFrame()
+        return pd.DataFrame({
+            'date': pd.DatetimeIndex(np.array(bars['date'])),
+            'close': np.array(bars['close']),
+            'volume': np.array(bars['volume']),
+        })
+
+
+price_store = PriceStore(os.path.join(DATA_DIR, 'prices'))
@@ -0,0 +1,98 @@
+"""
+Upstream rate limiting shared by every worker process.
+
+Each upstream host has a token bucket stored in a small SQLite file, so
+the request rate to Yahoo, Google News and NewsAPI stays the same however
+many workers run on the machine. Taking a token is one short IMMEDIATE
+transaction; when the bucket is empty the caller reserves the next token
+and sleeps until it is due, so waiting callers are served in order.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+import metrics
+from cache import DATA_DIR
+
+# host -> (tokens per second, burst size)
+UPSTREAM_RATES: Dict[str, Tuple[float, int]] = {
+    metrics.YAHOO_HOST: (4.0, 10),
+    'news.google.com': (2.0, 10),
+    'newsapi.org': (1.0, 5),
+}
+# Callers that would have to wait longer than this fail instead
+MAX_WAIT = 10.0  # seconds
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class TokenBucketLimiter:
+    def __init__(self, path: str, rates: Dict[str, Tuple[float, int]] = None):
+        self.path = path
+        self.rates = dict(UPSTREAM_RATES if rates is None else rates)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Opened on first use, so importing the module creates no file
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Autocommit mode, so acquire() can open its own IMMEDIATE transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL)')
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, name: str, max_wait: float = MAX_WAIT) -> float:
+        """Take one token for `name`, sleeping until it is available; returns the time waited."""
+        wait = self.reserve(name, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def reserve(self, name: str, max_wait: float = MAX_WAIT) -> float:
+        """Take one token for `name` without sleeping; returns how long to wait before using it."""
+        if name not in self.rates:
+            return 0.0
+        rate, burst = self.rates[name]
+        conn = self._conn()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            row = conn.execute('SELECT tokens, updated_at FROM buckets WHERE name = ?', (name,)).fetchone()
+            tokens = float(burst) if row is None else min(float(burst), row[0] + (now - row[1]) * rate)
+            # A negative balance is tokens already promised to waiting callers
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if wait > max_wait:
+                conn.execute('ROLLBACK')
+                raise RateLimitExceeded(f"Rate limit for {name}: next slot in {wait:.1f}s")
+            conn.execute('INSERT OR REPLACE INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                         (name, tokens - 1, now))
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            # BEGIN itself may have failed (database is locked); there is nothing to roll back then
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        if wait > 0:
+            metrics.RATE_LIMIT_WAIT_SECONDS.observe(wait, host=name)
+        return wait
+
+
+rate_limiter = TokenBucketLimiter(
+    os.environ.get('SMART_INVEST_RATE_LIMIT_PATH', os.path.join(DATA_DIR, 'ratelimit.sqlite'))
+)
+
+
+@contextmanager
+def upstream_call(host: str):
+    """Wait for a token for `host`, then count and time the call."""
+    rate_limiter.acquire(host)
+    with metrics.track_upstream(host):
+        yield
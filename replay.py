@@ -0,0 +1,254 @@
+"""
+Offline replay of the upstream data sources, for benchmarks and debugging.
+
+ReplayTicker stands in for yahooquery's Ticker: it serves recorded
+responses from a fixture directory when there are any (see record()), and
+otherwise deterministic synthetic prices and fundamentals generated from
+the symbol name. FeedStub is a local HTTP server that answers Google News
+RSS and NewsAPI requests with canned payloads; install() routes the shared
+sync and async HTTP clients to it, so the real request/parse path is still
+exercised.
+
+    import replay
+    replay.install()          # before running any analysis
+"""
+import json
+import os
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from requests.adapters import HTTPAdapter
+
+from price_store import period_start
+
+FIXTURES_DIR = os.environ.get('SMART_INVEST_FIXTURES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures'))
+MODULES = ('summary_detail', 'financial_data', 'key_stats', 'price')
+# Bare (suffix-less) symbols that are listed; any other bare symbol only exists with .NS
+BARE_LISTINGS = {'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'META', 'NVDA', 'TSLA'}
+REPLAY_END = pd.Timestamp('2026-10-16')
+HISTORY_DAYS = 2600   # about ten years of business days
+ARTICLES_PER_FEED = 20
+
+
+def _seed(symbol: str) -> int:
+    # crc32 rather than hash(), so every process generates the same series
+    return zlib.crc32(symbol.encode())
+
+
+def _is_unknown(symbol: str) -> bool:
+    # Like Yahoo, "TCS" finds nothing while "TCS.NS" does
+    return '.' not in symbol and not symbol.startswith('^') and symbol not in BARE_LISTINGS
+
+
+def synthetic_history(symbol: str) -> pd.DataFrame:
+    rng = np.random.default_rng(_seed(symbol))
+    dates = pd.bdate_range(end=REPLAY_END, periods=HISTORY_DAYS)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, HISTORY_DAYS)))
+    volume = rng.integers(100_000, 5_000_000, HISTORY_DAYS).astype(float)
+    index = pd.MultiIndex.from_arrays([[symbol] * HISTORY_DAYS, dates.date], names=['symbol', 'date'])
+    return pd.DataFrame({'open': close, 'high': close, 'low': close, 'close': close, 'volume': volume}, index=index)
+
+
+def synthetic_module(symbol: str, module: str) -> Dict:
+    rng = np.random.default_rng(_seed(symbol + module))
+    if module == 'summary_detail':
+        return {'trailingPE': float(rng.uniform(5, 80)), 'navPrice': None}
+    if module == 'financial_data':
+        return {'totalRevenue': float(rng.uniform(1e8, 1e11)), 'netIncomeToCommon': float(rng.uniform(-1e8, 1e10)),
+                'currentPrice': float(rng.uniform(50, 3000)), 'revenueGrowth': float(rng.normal(0.08, 0.1)),
+                'profitMargins': float(rng.normal(0.1, 0.08))}
+    if module == 'key_stats':
+        return {'trailingEps': float(rng.normal(20, 30)), 'sharesOutstanding': float(rng.integers(1e7, 1e10))}
+    price = float(rng.uniform(50, 3000))
+    return {'regularMarketPrice': price, 'regularMarketPreviousClose': price * float(rng.uniform(0.97, 1.03)),
+            'longName': f"{symbol.split('.')[0].title()} Limited"}
+
+
+def _fixture_path(symbol: str, name: str) -> str:
+    return os.path.join(FIXTURES_DIR, symbol.replace('/', '_'), name)
+
+
+class ReplayTicker:
+    """Drop-in for yahooquery.Ticker backed by fixtures or synthetic data."""
+
+    def __init__(self, symbols, **kwargs):
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+
+    def history(self, period: str = '1y', interval: str = '1d', start=None, end=None):
+        frames = []
+        for symbol in self.symbols:
+            if _is_unknown(symbol):
+                continue
+            path = _fixture_path(symbol, 'history.pkl')
+            frames.append(pd.read_pickle(path) if os.path.exists(path) else synthetic_history(symbol))
+        if not frames:
+            return {s: 'No data found, symbol may be delisted' for s in self.symbols}
+        df = pd.concat(frames)
+        dates = pd.to_datetime(df.index.get_level_values('date'))
+        if start is not None:
+            return df[dates >= pd.Timestamp(start)]
+        begin = period_start(period, today=REPLAY_END)
+        return df[dates >= begin] if begin is not None else df
+
+    def _module(self, module: str) -> Dict:
+        out = {}
+        for symbol in self.symbols:
+            path = _fixture_path(symbol, module + '.json')
+            if os.path.exists(path):
+                with open(path) as f:
+                    out[symbol] = json.load(f)
+            elif _is_unknown(symbol):
+                out[symbol] = f'Quote not found for ticker symbol: {symbol}'
+            else:
+                out[symbol] = synthetic_module(symbol, module)
+        return out
+
+    summary_detail = property(lambda self: self._module('summary_detail'))
+    financial_data = property(lambda self: self._module('financial_data'))
+    key_stats = property(lambda self: self._module('key_stats'))
+    price = property(lambda self: self._module('price'))
+
+
+def record(symbols: List[str], period: str = '10y'):
+    """Fetch `symbols` live with yahooquery and save the responses as fixtures for ReplayTicker."""
+    from yahooquery import Ticker
+    tk = Ticker(symbols)
+    history = tk.history(period=period)
+    modules = {m: getattr(tk, m) for m in MODULES}
+    for symbol in symbols:
+        os.makedirs(_fixture_path(symbol, ''), exist_ok=True)
+        if isinstance(history, pd.DataFrame) and symbol in history.index.get_level_values('symbol'):
+            history.xs(symbol, level='symbol', drop_level=False).to_pickle(_fixture_path(symbol, 'history.pkl'))
+        for module, data in modules.items():
+            if isinstance(data, dict) and isinstance(data.get(symbol), dict):
+                with open(_fixture_path(symbol, module + '.json'), 'w') as f:
+                    json.dump(data[symbol], f, default=str)
+
+
+def rss_payload(query: str) -> bytes:
+    """A Google News style RSS document with ARTICLES_PER_FEED items about `query`."""
+    rng = np.random.default_rng(_seed(query))
+    moods = ['surges on strong quarterly results', 'slips as margins come under pressure',
+             'holds steady ahead of earnings', 'rallies after analyst upgrade', 'falls on weak guidance']
+    items = []
+    for i in range(ARTICLES_PER_FEED):
+        title = f"{query} {moods[int(rng.integers(len(moods)))]} ({i})"
+        link = f"https://news.example.com/{zlib.crc32(title.encode())}"
+        description = (f'<a href="{link}" target="_blank">{title}</a>&nbsp;&nbsp;'
+                       f'<font color="#6f6f6f">Example Wire</font>')
+        items.append(
+            f"<item><title>{escape(title)}</title><link>{link}</link>"
+            f"<pubDate>Thu, {15 - i % 7:02d} Oct 2026 {i % 24:02d}:00:00 GMT</pubDate>"
+            f"<description>{escape(description)}</description>"
+            f"<source url=\"https://news.example.com\">Example Wire</source></item>"
+        )
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>{escape(query)}</title>{''.join(items)}</channel></rss>").encode()
+
+
+def newsapi_payload(query: str, page_size: int) -> bytes:
+    rng = np.random.default_rng(_seed('newsapi' + query))
+    articles = [{
+        'source': {'id': None, 'name': 'Example Wire'},
+        'title': f"{query} shares move {rng.normal(0, 3):+.1f}% in early trade ({i})",
+        'description': f"Investors weigh the latest numbers from {query}.",
+        'content': f"{query} reported results that were broadly in line with estimates... [+1200 chars]",
+        'publishedAt': f"2026-10-{15 - i % 7:02d}T{i % 24:02d}:00:00Z",
+        'url': f"https://news.example.com/newsapi/{i}",
+    } for i in range(min(page_size, ARTICLES_PER_FEED))]
+    return json.dumps({'status': 'ok', 'totalResults': len(articles), 'articles': articles}).encode()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        if url.path.startswith('/v2/everything'):
+            body, content_type = newsapi_payload(params.get('q', [''])[0], int(params.get('pageSize', ['20'])[0])), 'application/json'
+        else:
+            query = params.get('q', [''])[0].split(' when:')[0]
+            body, content_type = rss_payload(query), 'application/rss+xml'
+        etag = '"%08x"' % zlib.crc32(body)
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeedStub:
+    """Local HTTP server with canned Google News RSS and NewsAPI responses."""
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name='feed-stub', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+class _StubAdapter(HTTPAdapter):
+    """Sends requests for the news hosts to the local stub instead."""
+
+    def __init__(self, stub_url: str, **kwargs):
+        self.stub_url = stub_url
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        request.url = f"{self.stub_url}{url.path}?{url.query}"
+        return super().send(request, **kwargs)
+
+
+def _async_stub_transport(stub_url: str):
+    """_StubAdapter for the async client: an httpx transport that sends every request to the stub."""
+    import httpx
+    stub = httpx.URL(stub_url)
+
+    class StubTransport(httpx.AsyncHTTPTransport):
+        async def handle_async_request(self, request):
+            request.url = request.url.copy_with(scheme=stub.scheme, host=stub.host, port=stub.port)
+            return await super().handle_async_request(request)
+
+    return StubTransport()
+
+
+NEWS_HOSTS = ('https://news.google.com', 'https://newsapi.org')
+
+
+def install() -> FeedStub:
+    """Route yahooquery and the news HTTP client to offline data; returns the running feed stub."""
+    # The app reaches Ticker through the (lazily imported) yahooquery module, so one patch covers every caller
+    import yahooquery
+    yahooquery.Ticker = ReplayTicker
+
+    # Nothing upstream to protect; pacing replayed calls would only distort timings
+    from ratelimit import rate_limiter
+    rate_limiter.rates.clear()
+
+    from http_client import async_http, http
+    stub = FeedStub()
+    for host in NEWS_HOSTS:
+        http.session.mount(host, _StubAdapter(stub.url))
+    try:
+        for host in NEWS_HOSTS:
+            async_http.mount(host, _async_stub_transport(stub.url))
+    except ImportError:
+        pass  # httpx is only needed by the (optional) async server
+    return stub
@@ -0,0 +1,199 @@
+"""
+Universe screener behind /screen.
+
+Ranks a whole universe (a named list or the caller's tickers) by composite
+score in a few array passes: closes come from the price store in parallel
+multi-symbol chunks, technicals from technical_snapshot, fundamentals from
+the universe table. Sentiment uses news that is already cached; with
+includeNews, news is fetched only for the best-ranked candidates that lack
+it, and those are re-ranked.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import technicals
+from fundamentals import fundamentals_universe
+from price_store import price_store
+from smart_invest_logic import (STAGE_TIMEOUTS, _has_closes, _weights_from_params, cached_news_for_ticker,
+                                fetch_news_for_ticker, preprocess_and_score_news)
+from symbols import KNOWN_SYMBOLS, retry_as_nse, symbol_resolver
+
+# Named universes are the resolver's seed listings only, not index constituents;
+# screen a full index by passing its symbols as 'tickers'
+UNIVERSES = {
+    'seed_nse': [s for s in KNOWN_SYMBOLS if s.endswith('.NS')],
+    'seed_us': [s for s in KNOWN_SYMBOLS if '.' not in s],
+    'known': list(KNOWN_SYMBOLS),
+}
+MAX_SCREEN_TICKERS = 3000
+PRICE_CHUNK = 250          # symbols per price store download
+DEFAULT_TOP_N = 25
+MAX_TOP_N = 500
+NEWS_MAX_ARTICLES = 10     # same as /analyze/batch, so their cached news is shared
+MAX_NEWS_CANDIDATES = 100
+
+_screen_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='screen')
+
+
+def _universe_symbols(params: Dict) -> List[str]:
+    tickers = params.get('tickers')
+    if not isinstance(tickers, list) or not tickers:
+        tickers = UNIVERSES.get(str(params.get('universe', 'known')).lower(), [])
+    requested = dict.fromkeys(str(t).strip().upper() for t in tickers if str(t).strip())
+    return list(requested)
+
+
+def _closes(symbols: List[str]) -> pd.DataFrame:
+    """One year of closes (date x symbol), PRICE_CHUNK symbols per download, chunks in parallel."""
+    chunks = [symbols[i:i + PRICE_CHUNK] for i in range(0, len(symbols), PRICE_CHUNK)]
+    frames = [f for f in _screen_pool.map(lambda c: price_store.get_closes(c, period='1y'), chunks) if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, axis=1)
+
+
+def _sentiment(news_df) -> float:
+    if news_df is None:
+        return np.nan
+    news_df = preprocess_and_score_news(news_df)
+    if news_df.empty:
+        return np.nan
+    return (news_df['compound'].mean() + 1) / 2
+
+
+def _number(params: Dict, key: str, default=None) -> Optional[float]:
+    value = params.get(key, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"'{key}' must be a number.")
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"'{key}' must be a number.") from None
+    if not np.isfinite(value):
+        raise ValueError(f"'{key}' must be a finite number.")
+    return value
+
+
+def _parse_options(params: Dict) -> Dict:
+    """Validated topN and filters of a screen request; ValueError with a message otherwise."""
+    return {
+        'topN': max(1, min(int(_number(params, 'topN', DEFAULT_TOP_N)), MAX_TOP_N)),
+        'minScore': _number(params, 'minScore'),
+        'maxVolatility': _number(params, 'maxVolatility'),
+    }
+
+
+def validate_params(params: Dict) -> Optional[str]:
+    """Error message for an invalid screen request (answered with 400), or None."""
+    try:
+        _parse_options(params)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+def run_screen(params: Dict) -> Dict:
+    requested = _universe_symbols(params)
+    if not requested:
+        return {"error": "Please provide a 'tickers' list or a known 'universe' (" + ', '.join(UNIVERSES) + ")."}
+    if len(requested) > MAX_SCREEN_TICKERS:
+        return {"error": f"At most {MAX_SCREEN_TICKERS} tickers can be screened per request."}
+
+    weights = _weights_from_params(params)
+    include_news = params.get('includeNews', False)
+
+    try:
+        options = _parse_options(params)
+        top_n, min_score, max_volatility = options['topN'], options['minScore'], options['maxVolatility']
+        # Resolve locally; unknown bare tickers without prices get one .NS retry, as in /analyze/batch
+        resolved = {t: symbol_resolver.resolve(t) for t in requested}
+        symbols = list(dict.fromkeys(resolved.values()))
+        prices = _closes(symbols)
+        alt_prices = retry_as_nse(resolved, prices, _closes, _has_closes)
+        if alt_prices is not None and not alt_prices.empty:
+            prices = pd.concat([prices, alt_prices], axis=1) if not prices.empty else alt_prices
+
+        tech = technicals.technical_snapshot(prices)
+        unresolved = [t for t in requested if resolved[t] not in tech.index]
+        symbol_resolver.learn_many({t: resolved[t] for t in requested if resolved[t] in tech.index})
+        symbols = list(tech.index)
+        if not symbols:
+            return {"count": 0, "results": [], "unresolved": unresolved}
+
+        fundamentals_universe.lookup(symbols)
+        table = fundamentals_universe.table().reindex(symbols)
+        # Rows that couldn't be fetched score like an empty fundamentals dict
+        fund_score = table['fundamentalScore'].fillna(0.5).to_numpy(dtype='f8')
+
+        names = {s: symbol_resolver.company_name(s) for s in symbols}
+        sentiment = np.array([
+            _sentiment(cached_news_for_ticker(s, names[s], NEWS_MAX_ARTICLES)) for s in symbols
+        ], dtype='f8')
+
+        tech_score = tech['technicalScore'].to_numpy(dtype='f8')
+        # 30-day price standard deviation as a fraction of the price, as used for the threshold
+        with np.errstate(invalid='ignore', divide='ignore'):
+            volatility = tech['Volatility30'].to_numpy(dtype='f8') / tech['Close'].to_numpy(dtype='f8')
+        threshold = tech['suggestedThreshold'].to_numpy(dtype='f8')
+
+        def composite(sent):
+            s = (weights['sentiment'] * np.nan_to_num(sent, nan=0.5) + weights['technical'] * tech_score
+                 + weights['fundamental'] * fund_score)
+            return np.clip(s, 0.0, 1.0)
+
+        keep = np.ones(len(symbols), dtype=bool)
+        if max_volatility is not None:
+            keep &= ~(volatility > max_volatility)
+        final = composite(sentiment)
+
+        skipped = []
+        if include_news:
+            # Fetch news only for the leading candidates that have none cached, then re-rank
+            n_candidates = min(MAX_NEWS_CANDIDATES, 2 * top_n)
+            order = np.lexsort((threshold, -final))
+            candidates = [i for i in order if keep[i] and np.isnan(sentiment[i])][:n_candidates]
+            futures = {
+                i: _screen_pool.submit(fetch_news_for_ticker, symbols[i], company_name=names[symbols[i]],
+                                       max_articles=NEWS_MAX_ARTICLES)
+                for i in candidates
+            }
+            done, not_done = wait(futures.values(), timeout=STAGE_TIMEOUTS['news'])
+            for i, future in futures.items():
+                if future in done and future.exception() is None:
+                    sentiment[i] = _sentiment(future.result())
+            if not_done:
+                skipped.append('news')
+            final = composite(sentiment)
+
+        if min_score is not None:
+            keep &= final >= min_score
+
+        # Best composite first; among equal scores, the lower (easier) threshold first
+        order = [i for i in np.lexsort((threshold, -final)) if keep[i]][:top_n]
+        results = [{
+            "ticker": symbols[i],
+            "name": names[symbols[i]],
+            "currentPrice": float(tech['Close'].iat[i]),
+            "finalScore": float(final[i]),
+            "suggestedThreshold": float(round(threshold[i], 2)),
+            "aboveThreshold": bool(final[i] >= threshold[i]),
+            "sentimentScore": float(np.nan_to_num(sentiment[i], nan=0.5)),
+            "hasNews": bool(not np.isnan(sentiment[i])),
+            "technicalScore": float(tech_score[i]),
+            "fundamentalScore": float(fund_score[i]),
+            "volatility30": None if np.isnan(volatility[i]) else float(volatility[i]),
+        } for i in order]
+
+        screen = {"count": len(symbols), "matched": int(keep.sum()), "results": results}
+        if unresolved:
+            screen["unresolved"] = unresolved
+        if skipped:
+            screen["skippedStages"] = skipped
+        return screen
+    except Exception as e:
+        return {"error": str(e)}
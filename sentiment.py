@@ -0,0 +1,123 @@
+"""
+Batched VADER sentiment scoring.
+
+The same headlines come back on every refresh and across tickers that
+share news, so scores are memoized in a bounded LRU keyed by a hash of the
+text. Only cache misses are scored; large batches of misses are spread
+over a process pool.
+
+The analyzer is built on first use, never at import. vaderSentiment ships
+its lexicon in the package; without it, NLTK's analyzer is used with a
+lexicon that must already be installed (python -m nltk.downloader
+vader_lexicon at build time). Nothing is downloaded at runtime.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import numpy as np
+
+import metrics
+from cache import MemoryBackend
+
+# Score columns of a scored text, in VADER's polarity_scores order
+VADER_FIELDS = ['neg', 'neu', 'pos', 'compound']
+NEUTRAL_SCORE = (0.0, 1.0, 0.0, 0.0)
+
+SCORE_CACHE_SIZE = 50000
+# Scoring in-process is cheaper than pickling texts to workers below this many misses
+PROCESS_POOL_THRESHOLD = 512
+PROCESS_POOL_CHUNK = 128
+
+_score_cache = MemoryBackend(maxsize=SCORE_CACHE_SIZE)
+_pool = None
+_pool_lock = threading.Lock()
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def _build_analyzer():
+    try:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        return SentimentIntensityAnalyzer()
+    except ImportError:
+        pass
+    from nltk.sentiment.vader import SentimentIntensityAnalyzer
+    try:
+        return SentimentIntensityAnalyzer()
+    except LookupError:
+        raise LookupError("VADER lexicon not found: pip install vaderSentiment, "
+                          "or run `python -m nltk.downloader vader_lexicon` when building the image") from None
+
+
+def get_analyzer():
+    """The shared VADER analyzer, built on first call."""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = _build_analyzer()
+    return _analyzer
+
+
+def _text_key(text: str) -> str:
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _score_chunk(texts: List[str]) -> List[tuple]:
+    sia = get_analyzer()
+    scores = []
+    for text in texts:
+        s = sia.polarity_scores(text)
+        scores.append((s['neg'], s['neu'], s['pos'], s['compound']))
+    return scores
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: a fork of the threaded server could inherit locks other threads hold
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 2,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def score_texts(texts: List[str]) -> np.ndarray:
+    """Return an (n, 4) array of neg/neu/pos/compound scores for `texts`, in order."""
+    scores = np.empty((len(texts), len(VADER_FIELDS)))
+    pending = {}
+    hits = 0
+    for i, text in enumerate(texts):
+        text = str(text or '').strip()
+        if not text:
+            scores[i] = NEUTRAL_SCORE
+            continue
+        key = _text_key(text)
+        entry = _score_cache.get(key)
+        if entry is not None:
+            scores[i] = entry[0]
+            hits += 1
+        else:
+            # Duplicates within the batch are scored once
+            pending.setdefault(key, (text, []))[1].append(i)
+
+    if hits:
+        metrics.SENTIMENT_LOOKUPS.inc(hits, outcome='hit')
+    if pending:
+        metrics.SENTIMENT_LOOKUPS.inc(len(pending), outcome='miss')
+        keys = list(pending)
+        miss_texts = [pending[k][0] for k in keys]
+        if len(miss_texts) >= PROCESS_POOL_THRESHOLD:
+            chunks = [miss_texts[i:i + PROCESS_POOL_CHUNK] for i in range(0, len(miss_texts), PROCESS_POOL_CHUNK)]
+            results = [s for chunk in _get_pool().map(_score_chunk, chunks) for s in chunk]
+        else:
+            results = _score_chunk(miss_texts)
+        for key, result in zip(keys, results):
+            _score_cache.set(key, result, 0.0)
+            scores[pending[key][1]] = result
+
+    return scores
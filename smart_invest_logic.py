@@ -1,131 +1,65 @@
+import asyncio
+import functools
+import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
 from typing import List, Dict
 
 import numpy as np
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-import re
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-import nltk
-from yahooquery import Ticker
 
-# Download VADER lexicon
-try:
-    nltk.data.find('sentiment/vader_lexicon.zip')
-except LookupError:
-    nltk.download('vader_lexicon')
+from cache import cache, cached
+from http_client import async_http, http
+from price_store import price_store
+from symbols import retry_as_nse, symbol_resolver
+from fundamentals import fundamentals_universe, score_fundamentals
+from live_indicators import IncrementalIndicators
+import technicals
+import sentiment
+import articles
+import metrics
+from lazy import lazy_import
 
-sia = SentimentIntensityAnalyzer()
+bs4 = lazy_import('bs4')
 
+logger = logging.getLogger(__name__)
+
+@cached('prices', key=lambda tickers, period="1y": f"{','.join(tickers)}|{period}")
 def fetch_price_data(tickers: List[str], period: str = "1y") -> pd.DataFrame:
-    """Fetch Close price series for tickers using yahooquery."""
+    """Close price series (date x symbol) for tickers, served from the incremental price store."""
     try:
-        print(f"DEBUG: Fetching price data for {tickers} with period {period}")
-        # Use single string if only one ticker to avoid MultiIndex complexity in some cases
-        query_tickers = tickers[0] if len(tickers) == 1 else tickers
-        tk = Ticker(query_tickers)
-        data = tk.history(period=period)
-        
-        print(f"DEBUG: Raw data from YahooQuery: {type(data)}")
-        if data is not None and not data.empty:
-             print(f"DEBUG: Raw data Columns: {data.columns}")
-             print(f"DEBUG: Raw data Head:\n{data.head(2)}")
-        
-        if data is None or data.empty:
-            print("DEBUG: YahooQuery returned None or Empty")
-            return pd.DataFrame()
-        
-        # Normalize column names to title case to match rest of logic if needed, 
-        # but pivoted uses 'close' from yahooquery which is lower case.
-        if 'close' not in data.columns and 'Close' not in data.columns:
-            print(f"DEBUG: 'close' column not found. Columns: {data.columns}")
-            return pd.DataFrame()
-
-        # Handle MultiIndex vs Flat Index
-        df_reset = data.reset_index()
-        
-        if 'symbol' not in df_reset.columns:
-            # If single ticker, symbols might not be in columns, 
-            # maybe it's just the date index
-            if len(tickers) == 1:
-                df_reset['symbol'] = tickers[0]
-            else:
-                print("DEBUG: 'symbol' column missing and multiple tickers requested")
-                return pd.DataFrame()
-
-        # Ensure 'date' column exists (it might be 'Date' or index)
-        if 'date' not in df_reset.columns:
-            if 'Date' in df_reset.columns:
-                df_reset = df_reset.rename(columns={'Date': 'date'})
-            else:
-                 print(f"DEBUG: 'date' column missing. Columns: {df_reset.columns}")
-                 return pd.DataFrame()
-
-        # Convert to datetime and strip timezone info to avoid "Cannot mix tz-aware with tz-naive"
-        df_reset['date'] = pd.to_datetime(df_reset['date'], utc=True).dt.tz_localize(None)
-        
-        # Use whatever 'close' variant exists
-        val_col = 'close' if 'close' in df_reset.columns else 'Close'
-        
-        pivoted = df_reset.pivot(index='date', columns='symbol', values=val_col)
-        print(f"DEBUG: Successfully pivoted data. Shape: {pivoted.shape}")
-        return pivoted
-    except Exception as e:
-        print(f"DEBUG: YahooQuery fetch failed: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.debug("Fetching price data for %s with period %s", tickers, period)
+        prices = price_store.get_closes(tickers, period=period)
+        if prices.empty:
+            logger.debug("Price store returned no data for %s", tickers)
+        return prices
+    except Exception:
+        logger.exception("Price fetch failed for %s", tickers)
         return pd.DataFrame()
 
 def fetch_fundamentals(ticker: str) -> Dict[str, float]:
-    """Fetch fundamental data using yahooquery properties."""
+    """Fundamentals for one ticker from the universe table (fetched on first use)."""
+    return fetch_fundamentals_batch([ticker]).get(ticker, {})
+
+def fetch_fundamentals_batch(tickers: List[str]) -> Dict[str, Dict[str, float]]:
+    """Fundamentals for many tickers; rows the universe table lacks are fetched with multi-symbol calls."""
     try:
-        tk = Ticker(ticker)
-        
-        # Use simple properties instead of get_modules to avoid ValidationErrors
-        summary_detail = tk.summary_detail.get(ticker, {})
-        financial_data = tk.financial_data.get(ticker, {})
-        key_stats = tk.key_stats.get(ticker, {})
-        default_stats = tk.key_stats.get(ticker, {}) # Backup
-        
-        # Helper to safely get float
-        def get_val(data_dict, key):
-            val = data_dict.get(key)
-            if isinstance(val, (int, float)):
-                return float(val)
-            return None
-
-        revenue = get_val(financial_data, 'totalRevenue')
-        net_income = get_val(financial_data, 'netIncomeToCommon') or get_val(key_stats, 'netIncomeToCommon')
-        trailing_pe = get_val(summary_detail, 'trailingPE')
-        eps = get_val(key_stats, 'trailingEps') or get_val(default_stats, 'trailingEps')
-        
-        market_price = get_val(financial_data, 'currentPrice') or get_val(summary_detail, 'navPrice')
-        revenue_growth = get_val(financial_data, 'revenueGrowth')
-        net_margin = get_val(financial_data, 'profitMargins')
-        shares_outstanding = get_val(key_stats, 'sharesOutstanding') or get_val(default_stats, 'sharesOutstanding')
-        
-        return {
-            'revenue': revenue if revenue is not None else np.nan,
-            'net_income': net_income if net_income is not None else np.nan,
-            'trailingPE': trailing_pe if trailing_pe is not None else np.nan,
-            'eps': eps if eps is not None else np.nan,
-            'marketPrice': market_price if market_price is not None else np.nan,
-            'revenueYoY': (revenue_growth * 100) if revenue_growth is not None else 0.0,
-            'netMargin': (net_margin * 100) if net_margin is not None else 0.0,
-            'sharesOutstanding': int(shares_outstanding) if shares_outstanding is not None else 0
-        }
+        return fundamentals_universe.lookup(tickers)
     except Exception as e:
-        print(f"YahooQuery fundamentals failed for {ticker}: {e}")
+        logger.warning("YahooQuery fundamentals failed for %s: %s", tickers, e)
         return {}
 
-def fetch_news_for_ticker(ticker: str, company_name: str = None, max_articles: int = 20, newsapi_key: str = "") -> pd.DataFrame:
-    articles = []
+def _news_cache_key(ticker: str, company_name: str = None, max_articles: int = 20, newsapi_key: str = "") -> str:
+    # TCS and TCS.NS produce the same query, so they share an entry; the API key itself is never stored
+    query = (company_name or ticker.replace('.NS', '')).strip()
+    return f"{query}|{max_articles}|{'newsapi' if newsapi_key else 'rss'}"
+
+def _news_request(ticker: str, company_name: str = None, max_articles: int = 20, newsapi_key: str = "") -> Dict:
+    """GET arguments for the NewsAPI query (with a key) or the Google News RSS search of a ticker."""
     query = (company_name or ticker.replace('.NS', '')).strip()
     if newsapi_key:
-        url = 'https://newsapi.org/v2/everything'
         params = {
             'q': query,
             'pageSize': max_articles,
@@ -133,49 +67,77 @@ def fetch_news_for_ticker(ticker: str, company_name: str = None, max_articles: i
             'sortBy': 'publishedAt',
             'apiKey': newsapi_key
         }
-        try:
-            r = requests.get(url, params=params, timeout=15)
-            print(f"DEBUG: NewsAPI request to {r.url} returned status {r.status_code} for {ticker}")
-            data = r.json()
-            arts = data.get('articles', [])
-            print(f"DEBUG: NewsAPI returned {len(arts)} articles for {ticker}")
-            for art in arts:
-                articles.append({
-                    'ticker': ticker,
-                    'title': art.get('title'),
-                    'description': art.get('description'),
-                    'content': art.get('content'),
-                    'publishedAt': art.get('publishedAt'),
-                    'source': art.get('source', {}).get('name')
-                })
-        except Exception as e:
-            print('NewsAPI fetch failed for', ticker, e)
+        return {'url': 'https://newsapi.org/v2/everything', 'params': params, 'timeout': 15}
+    # Passed as params so names like "Larsen & Toubro" are encoded, not split into a new query field
+    params = {'q': f"{query} when:7d", 'hl': 'en-IN', 'gl': 'IN', 'ceid': 'IN:en'}
+    return {'url': 'https://news.google.com/rss/search', 'params': params, 'timeout': 10, 'conditional': True}
+
+def _news_frame(ticker: str, r, max_articles: int = 20, newsapi_key: str = "") -> pd.DataFrame:
+    """Articles DataFrame from a NewsAPI or RSS response (requests or httpx)."""
+    articles = []
+    if newsapi_key:
+        data = r.json()
+        arts = data.get('articles', [])
+        # r.url carries the API key, so it is not logged
+        logger.debug("NewsAPI returned status %s and %d articles for %s", r.status_code, len(arts), ticker)
+        for art in arts:
+            articles.append({
+                'ticker': ticker,
+                'title': art.get('title'),
+                'description': art.get('description'),
+                'content': art.get('content'),
+                'publishedAt': art.get('publishedAt'),
+                'source': art.get('source', {}).get('name')
+            })
     else:
-        rss_url = f"https://news.google.com/rss/search?q={query}+when:7d&hl=en-IN&gl=IN&ceid=IN:en"
-        try:
-            r = requests.get(rss_url, timeout=10)
-            print(f"DEBUG: Google RSS request to {rss_url} returned status {r.status_code} for {ticker}")
-            soup = BeautifulSoup(r.content, 'html.parser') # Changed from xml as per notebook output error
-            items = soup.find_all('item')[:max_articles]
-            print(f"DEBUG: Google RSS returned {len(items)} items for {ticker}")
-            for it in items:
-                articles.append({
-                    'ticker': ticker,
-                    'title': it.title.text if it.title else None,
-                    'description': it.description.text if it.description else None,
-                    'content': None,
-                    'publishedAt': it.pubDate.text if it.pubDate else None,
-                    'source': it.source.text if it.source else None
-                })
-        except Exception as e:
-            print('Google News fetch failed for', ticker, e)
-    
+        soup = bs4.BeautifulSoup(r.content, 'html.parser') # Changed from xml as per notebook output error
+        items = soup.find_all('item')[:max_articles]
+        logger.debug("Google RSS returned status %s and %d items for %s", r.status_code, len(items), ticker)
+        for it in items:
+            articles.append({
+                'ticker': ticker,
+                'title': it.title.text if it.title else None,
+                'description': it.description.text if it.description else None,
+                'content': None,
+                'publishedAt': it.pubDate.text if it.pubDate else None,
+                'source': it.source.text if it.source else None
+            })
+
     df = pd.DataFrame(articles)
     if not df.empty:
         df['publishedAt'] = pd.to_datetime(df['publishedAt'], errors='coerce')
         df = df.drop_duplicates(subset=['title']).reset_index(drop=True)
     return df
 
+@cached('news', key=_news_cache_key)
+def fetch_news_for_ticker(ticker: str, company_name: str = None, max_articles: int = 20, newsapi_key: str = "") -> pd.DataFrame:
+    try:
+        r = http.get(**_news_request(ticker, company_name, max_articles, newsapi_key))
+        return _news_frame(ticker, r, max_articles, newsapi_key)
+    except Exception as e:
+        logger.warning("%s fetch failed for %s: %s", 'NewsAPI' if newsapi_key else 'Google News', ticker, e)
+        return pd.DataFrame()
+
+async def fetch_news_for_ticker_async(ticker: str, company_name: str = None, max_articles: int = 20,
+                                      newsapi_key: str = "") -> pd.DataFrame:
+    """fetch_news_for_ticker on the event loop; same cache entries, parsing runs in an executor thread."""
+    async def fetch():
+        try:
+            r = await async_http.get(**_news_request(ticker, company_name, max_articles, newsapi_key))
+            return await asyncio.get_running_loop().run_in_executor(
+                None, _news_frame, ticker, r, max_articles, newsapi_key)
+        except Exception as e:
+            logger.warning("%s fetch failed for %s: %s", 'NewsAPI' if newsapi_key else 'Google News', ticker, e)
+            return pd.DataFrame()
+
+    key = _news_cache_key(ticker, company_name, max_articles, newsapi_key)
+    return await cache.aget_or_fetch('news', key, fetch)
+
+def cached_news_for_ticker(ticker: str, company_name: str = None, max_articles: int = 20):
+    """RSS news already cached (and fresh) for a ticker, or None; never goes upstream."""
+    # A peek, not a lookup: the screener scores a miss as neutral, so it isn't counted as one
+    return cache.get('news', _news_cache_key(ticker, company_name, max_articles), count=False)
+
 def preprocess_and_score_news(df: pd.DataFrame) -> pd.DataFrame:
     if df is None or df.empty:
         return pd.DataFrame(columns=['ticker','title','description','text','publishedAt','source','neg','neu','pos','compound'])
@@ -183,9 +145,9 @@ def preprocess_and_score_news(df: pd.DataFrame) -> pd.DataFrame:
     df['title'] = df['title'].astype(str)
     df['description'] = df.get('description', '').fillna('').astype(str)
     df['text'] = (df['title'] + '. ' + df['description']).str.strip()
-    scores = df['text'].apply(lambda t: sia.polarity_scores(t) if str(t).strip() else {'neg':0,'neu':1,'pos':0,'compound':0})
-    scores_df = pd.DataFrame(list(scores))
-    df = pd.concat([df.reset_index(drop=True), scores_df.reset_index(drop=True)], axis=1)
+    df = df.reset_index(drop=True)
+    # Scored as one batch through the memoized pipeline; repeated headlines cost a dict lookup
+    df[sentiment.VADER_FIELDS] = sentiment.score_texts(df['text'].tolist())
     return df
 
 def compute_technicals(close_series: pd.Series) -> pd.DataFrame:
@@ -198,56 +160,33 @@ def compute_technicals(close_series: pd.Series) -> pd.DataFrame:
     df['Volatility30'] = df['Close'].rolling(window=30, min_periods=10).std()
     return df
 
+def _live_row(source):
+    """The latest() row of live indicator state, or None for a compute_technicals frame."""
+    if isinstance(source, IncrementalIndicators):
+        return source.latest()
+    if isinstance(source, dict):
+        return source
+    return None
+
 def technical_score_for_latest(df: pd.DataFrame) -> float:
-    if df is None or df.empty:
+    """Technical score of the latest bar: a compute_technicals frame, an IncrementalIndicators or its latest() row."""
+    latest = _live_row(df)
+    if latest is None:
+        if df is None or df.empty:
+            return 0.5
+        latest = df.dropna(how='all').tail(1).iloc[0]
+    elif not latest:
         return 0.5
-    latest = df.dropna(how='all').tail(1).iloc[0]
-    score = 0.5
-    try:
-        if not np.isnan(latest.get('SMA50')) and not np.isnan(latest.get('SMA200')):
-            score += 0.2 if latest['SMA50'] > latest['SMA200'] else -0.1
-    except Exception:
-        pass
-    try:
-        if not np.isnan(latest.get('Momentum30')):
-            score += 0.15 if latest['Momentum30'] > 0 else -0.1
-    except Exception:
-        pass
-    try:
-        vol = latest.get('Volatility30', np.nan)
-        if not np.isnan(vol) and not np.isnan(latest.get('Close')):
-            vol_pen = min(0.2, (vol / (latest['Close'] + 1e-9)))
-            score -= vol_pen
-    except Exception:
-        pass
-    return float(np.clip(score, 0.0, 1.0))
+    # Same rule set as the batched engine, applied to one row
+    score = technicals.technical_score(
+        latest.get('Close', np.nan), latest.get('SMA50', np.nan), latest.get('SMA200', np.nan),
+        latest.get('Momentum30', np.nan), latest.get('Volatility30', np.nan)
+    )
+    return float(score)
 
 def fundamental_score_from_info(info: Dict[str,float]) -> float:
-    score = 0.5
-    try:
-        net_income = info.get('net_income', np.nan)
-        if not np.isnan(net_income) and net_income > 0:
-            score += 0.15
-    except Exception:
-        pass
-    try:
-        pe = info.get('trailingPE', np.nan)
-        if not np.isnan(pe):
-            if pe <= 25:
-                score += 0.1
-            elif pe <= 50:
-                score += 0.02
-            else:
-                score -= 0.15
-    except Exception:
-        pass
-    try:
-        eps = info.get('eps', np.nan)
-        if not np.isnan(eps) and eps > 0:
-            score += 0.05
-    except Exception:
-        pass
-    return float(np.clip(score, 0.0, 1.0))
+    row = pd.DataFrame([{col: info.get(col, np.nan) for col in ('net_income', 'trailingPE', 'eps')}])
+    return float(score_fundamentals(row)[0])
 
 def compute_composite_score(sentiment_s, technical_s, fundamental_s, weights) -> float:
     s = weights['sentiment'] * sentiment_s + weights['technical'] * technical_s + weights['fundamental'] * fundamental_s
@@ -260,177 +199,373 @@ def calculate_smart_threshold(tech_df: pd.DataFrame, base_threshold: float = 0.6
     Lower Volatility -> Lower Threshold (Be more aggressive)
     """
     try:
-        if tech_df is None or tech_df.empty:
+        # Live indicator state (or its latest() row) is read as is, like the last frame row
+        latest = _live_row(tech_df)
+        if latest is None:
+            if tech_df is None or tech_df.empty:
+                return base_threshold
+            latest = tech_df.iloc[-1]
+        elif not latest:
             return base_threshold
-            
-        latest = tech_df.iloc[-1]
-        volatility = latest.get('Volatility30', 0)
-        close = latest.get('Close', 1)
-        
-        if close == 0: return base_threshold
-        
-        vol_pct = volatility / close
-        
-        # If volatility is high (> 2% daily), raise threshold to ensure quality
-        if vol_pct > 0.02:
-            return 0.70
-        # If volatility is moderate (1-2%), keep standard
-        elif vol_pct > 0.01:
-            return 0.65
-        # If volatility is low (< 1%), slightly lower threshold
-        else:
-            return 0.55
-            
+        # > 2% daily volatility -> 0.70, 1-2% -> 0.65, below 1% -> 0.55
+        return float(technicals.smart_threshold(latest.get('Close', 1), latest.get('Volatility30', 0), base_threshold))
     except Exception:
         return base_threshold
 
+DEFAULT_WEIGHTS = {'sentiment': 0.3, 'technical': 0.3, 'fundamental': 0.4}
+
+def _weights_from_params(params: Dict) -> Dict[str, float]:
+    return {
+        'sentiment': params.get('sentimentWeight', DEFAULT_WEIGHTS['sentiment']),
+        'technical': params.get('technicalWeight', DEFAULT_WEIGHTS['technical']),
+        'fundamental': params.get('fundamentalWeight', DEFAULT_WEIGHTS['fundamental'])
+    }
+
+def _price_change(close_series: pd.Series):
+    """Return (last_price, percent change vs previous close) for a price series."""
+    closes = close_series.dropna()
+    last_price = float(closes.iloc[-1])
+    prev_price = float(closes.iloc[-2]) if len(closes) > 1 else last_price
+    return last_price, ((last_price - prev_price) / prev_price) * 100
+
+def _fundamentals_summary(fund_info: Dict[str, float], last_price: float) -> Dict[str, float]:
+    return {
+        "marketPrice": fund_info.get('marketPrice', last_price),
+        "totalRevenue": fund_info.get('revenue', 0),
+        "netIncome": fund_info.get('net_income', 0),
+        "revenueYoY": fund_info.get('revenueYoY', 0.0),
+        "netMargin": fund_info.get('netMargin', 0.0),
+        "trailingEPS": fund_info.get('eps', 0.0),
+        "trailingPE": fund_info.get('trailingPE', 0.0),
+        "sharesOutstanding": fund_info.get('sharesOutstanding', 0)
+    }
+
+# Upstream stages of an analysis run on a shared pool so that a slow source
+# (usually the RSS feed) does not hold up the others.
+STAGE_TIMEOUTS = {
+    'prices': 20,
+    'fundamentals': 15,
+    'news': 12,
+}
+_STAGE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix='analysis-stage')
+
+def _timed(stage: str, fn, *args, **kwargs):
+    """Call fn, recording its duration under `stage` in the stage latency histogram."""
+    with metrics.STAGE_SECONDS.time(stage=stage):
+        return fn(*args, **kwargs)
+
+def _start_stage(stage: str, fn, *args, **kwargs):
+    """Submit a fetch stage to the shared pool; returns (future, deadline)."""
+    return _STAGE_POOL.submit(_timed, stage, fn, *args, **kwargs), time.monotonic() + STAGE_TIMEOUTS[stage]
+
+def _stage_result(stage: str, pending, default, skipped: List[str]):
+    """Wait for a stage until its deadline; on timeout or failure record it and return the default."""
+    future, deadline = pending
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        logger.warning("Stage '%s' timed out after %ss, continuing without it", stage, STAGE_TIMEOUTS[stage])
+    except Exception as e:
+        logger.warning("Stage '%s' failed: %s", stage, e)
+    skipped.append(stage)
+    return default
+
+def _no_prices_error(ticker: str) -> Dict:
+    return {"error": f"Yahoo Finance returned no data for {ticker}. This is often due to a temporary Rate Limit or an invalid ticker. If looking for an Indian stock, try explicitly adding .NS"}
+
+def _missing_column_error(ticker: str) -> Dict:
+    return {"error": f"Ticker {ticker} not found in fetched data. Hint: For Indian stocks, use .NS suffix (e.g., TCS.NS)"}
+
+def _close_series(ticker: str, prices: pd.DataFrame):
+    """The ticker's close column (matched case-insensitively), or None if it is missing."""
+    if ticker in prices.columns:
+        return prices[ticker]
+    matches = [c for c in prices.columns if c.lower() == ticker.lower()]
+    return prices[matches[0]] if matches else None
+
+def _has_closes(prices: pd.DataFrame, ticker: str) -> bool:
+    close = _close_series(ticker, prices)
+    return close is not None and not close.dropna().empty
+
+def _analysis_result(ticker: str, close: pd.Series, fund_info: Dict[str, float], news_df: pd.DataFrame,
+                     weights: Dict[str, float], skipped: List[str]) -> Dict:
+    """Score fetched data into the /analyze response; all CPU, no I/O."""
+    with metrics.STAGE_SECONDS.time(stage='technicals'):
+        tech_df = compute_technicals(close.dropna())
+        tscore = technical_score_for_latest(tech_df)
+
+    fscore = fundamental_score_from_info(fund_info)
+
+    news_df = _timed('sentiment', preprocess_and_score_news, news_df)
+
+    sscore_raw = 0.0
+    if not news_df.empty:
+        sscore_raw = news_df['compound'].mean()
+    logger.debug("Scored %d news articles for %s, mean compound %.4f", len(news_df), ticker, sscore_raw)
+
+    sscore_rescaled = (sscore_raw + 1) / 2
+
+    final_score = compute_composite_score(sscore_rescaled, tscore, fscore, weights)
+
+    last_price, price_change = _price_change(close)
+
+    # Convert news_df to serializable list of articles for frontend debugging
+    articles_list = _timed('serialization', articles.serialize_articles, news_df)
+
+    result = {
+        "ticker": ticker,
+        "currentPrice": last_price,
+        "priceChange": price_change,
+        "sentimentScore": sscore_rescaled,
+        "technicalScore": tscore,
+        "fundamentalScore": fscore,
+        "finalScore": final_score,
+        "sentimentArticles": articles_list,
+        # Suggest a threshold based on recent volatility (0.0 - 1.0)
+        "suggestedThreshold": float(round(calculate_smart_threshold(tech_df), 2)),
+        "fundamentals": _fundamentals_summary(fund_info, last_price)
+    }
+    if skipped:
+        # Stages that timed out or failed; their scores fell back to neutral defaults
+        result["skippedStages"] = skipped
+    return result
+
 def run_investment_analysis(params: Dict):
-    ticker = params.get('ticker', 'TCS.NS').upper()
+    requested = params.get('ticker', 'TCS.NS').upper()
+    # Resolve bare NSE tickers and company names locally, before anything is fetched
+    ticker = symbol_resolver.resolve(requested)
+    company_name = symbol_resolver.company_name(ticker)
     max_news = params.get('maxNews', 20)
+    # Fetch prices, fundamentals and news in parallel unless explicitly disabled
+    concurrent = params.get('concurrent', True)
     
     # Weights configuration
-    weights = {
-        'sentiment': params.get('sentimentWeight', 0.3),
-        'technical': params.get('technicalWeight', 0.3),
-        'fundamental': params.get('fundamentalWeight', 0.4)
-    }
+    weights = _weights_from_params(params)
 
     # Fetch data
     try:
-        prices = fetch_price_data([ticker], period="1y")
+        skipped = []
+        fund_pending = news_pending = None
+        if concurrent:
+            price_pending = _start_stage('prices', fetch_price_data, [ticker], "1y")
+            fund_pending = _start_stage('fundamentals', fetch_fundamentals, ticker)
+            # The news query drops the .NS suffix, so this stays valid if the ticker is re-resolved below
+            news_pending = _start_stage('news', fetch_news_for_ticker, ticker, company_name=company_name, max_articles=max_news)
+            prices = _stage_result('prices', price_pending, pd.DataFrame(), skipped)
+        else:
+            prices = _timed('prices', fetch_price_data, [ticker], "1y")
         
-        # If no data and ticker doesn't have a suffix, try adding .NS (for NSE India)
-        if prices.empty and '.' not in ticker:
-             print(f"DEBUG: No data for {ticker}, trying {ticker}.NS")
-             alt_ticker = f"{ticker}.NS"
-             alt_prices = fetch_price_data([alt_ticker], period="1y")
-             if not alt_prices.empty:
-                 ticker = alt_ticker
-                 prices = alt_prices
+        # Unknown bare ticker with no data: try adding .NS (for NSE India)
+        resolved = {ticker: ticker}
+        alt_prices = retry_as_nse(resolved, prices, lambda alt: _timed('ns_retry', fetch_price_data, alt, "1y"),
+                                  _has_closes)
+        if resolved[ticker] != ticker:
+            ticker = resolved[ticker]
+            prices = alt_prices
+            if 'prices' in skipped:
+                skipped.remove('prices')
+            # Fundamentals started for the bare symbol belong to a different listing
+            if concurrent:
+                fund_pending = _start_stage('fundamentals', fetch_fundamentals, ticker)
+
+        if not prices.empty:
+            symbol_resolver.learn(requested, ticker)
 
         if prices.empty:
-            return {"error": f"Yahoo Finance returned no data for {ticker}. This is often due to a temporary Rate Limit or an invalid ticker. If looking for an Indian stock, try explicitly adding .NS"}
-        
-        if ticker not in prices.columns and ticker.lower() not in [c.lower() for c in prices.columns]:
-            return {"error": f"Ticker {ticker} not found in fetched data. Hint: For Indian stocks, use .NS suffix (e.g., TCS.NS)"}
-        
-        # Use the actual column name from the dataframe
-        actual_col = ticker if ticker in prices.columns else [c for c in prices.columns if c.lower() == ticker.lower()][0]
-        
-        tech_df = compute_technicals(prices[actual_col].dropna())
-        tscore = technical_score_for_latest(tech_df)
-        
+            return _no_prices_error(ticker)
+        close = _close_series(ticker, prices)
+        if close is None:
+            return _missing_column_error(ticker)
+
         # Fundamentals
-        fund_info = fetch_fundamentals(ticker)
-        fscore = fundamental_score_from_info(fund_info)
-        
+        if concurrent:
+            fund_info = _stage_result('fundamentals', fund_pending, {}, skipped)
+        else:
+            fund_info = _timed('fundamentals', fetch_fundamentals, ticker)
+
         # News/Sentiment
-        news_df = fetch_news_for_ticker(ticker, max_articles=max_news)
-        news_df = preprocess_and_score_news(news_df)
-
-        print(f"DEBUG: Processed news articles count: {len(news_df)} for {ticker}")
-        sscore_raw = 0.0
-        if not news_df.empty:
-            sscore_raw = news_df['compound'].mean()
-            print(f"DEBUG: Mean compound score from news: {sscore_raw}")
-
-        sscore_rescaled = (sscore_raw + 1) / 2
-
-        final_score = compute_composite_score(sscore_rescaled, tscore, fscore, weights)
-
-        last_price = float(prices[ticker].dropna().iloc[-1])
-        prev_price = float(prices[ticker].dropna().iloc[-2]) if len(prices[ticker].dropna()) > 1 else last_price
-        price_change = ((last_price - prev_price) / prev_price) * 100
-
-        # Convert news_df to serializable list of articles for frontend debugging
-        def _strip_html(x):
-            try:
-                return BeautifulSoup(str(x or ''), 'html.parser').get_text().strip()
-            except Exception:
-                return (x or '')
-
-        articles_list = []
-        for _, row in news_df.iterrows():
-            published = None
-            try:
-                if pd.notnull(row.get('publishedAt')):
-                    published = pd.to_datetime(row.get('publishedAt'))
-                    published = published.isoformat()
-            except Exception:
-                published = None
-
-            # Clean fields: strip HTML, extract first anchor href (if any) and remove anchors from text
-            title_raw = row.get('title') or row.get('headline') or ''
-            summary_raw = row.get('description') or row.get('summary') or ''
-            content_raw = row.get('content') or ''
-
-            url_candidate = None
-            try:
-                desc_soup = BeautifulSoup(str(summary_raw or ''), 'html.parser')
-                a_tag = desc_soup.find('a', href=True)
-                if a_tag and a_tag.get('href'):
-                    url_candidate = a_tag.get('href')
-                    a_tag.decompose()
-                # remove any remaining anchor tags
-                for at in desc_soup.find_all('a'):
-                    at.decompose()
-                summary = desc_soup.get_text().strip()
-            except Exception:
-                summary = _strip_html(summary_raw)
-
-            # remove raw URLs that sometimes appear in RSS descriptions
-            try:
-                summary = re.sub(r'https?://\S+', '', summary).strip()
-            except Exception:
-                pass
-
-            title = _strip_html(title_raw)
-            content = _strip_html(content_raw)
-
-            # Determine final URL (prefer explicit url field, then href found in description, then link)
-            url = (row.get('url') or url_candidate or row.get('link') or None)
-
-            source_obj = row.get('source')
-            if isinstance(source_obj, dict):
-                source_name = source_obj.get('name') or source_obj.get('id') or ''
-            else:
-                source_name = str(source_obj) if source_obj is not None else ''
-
-            articles_list.append({
-                'title': title if title else None,
-                'summary': summary if summary else None,
-                'content': content if content else None,
-                'publishedAt': published,
-                'source': source_name,
-                'url': url,
-                'neg': float(row.get('neg', 0)) if row.get('neg', None) is not None else 0.0,
-                'neu': float(row.get('neu', 0)) if row.get('neu', None) is not None else 0.0,
-                'pos': float(row.get('pos', 0)) if row.get('pos', None) is not None else 0.0,
-                'compound': float(row.get('compound', 0)) if row.get('compound', None) is not None else 0.0
-            })
+        if concurrent:
+            news_df = _stage_result('news', news_pending, pd.DataFrame(), skipped)
+        else:
+            news_df = _timed('news', fetch_news_for_ticker, ticker, company_name=company_name, max_articles=max_news)
+
+        return _analysis_result(ticker, close, fund_info, news_df, weights, skipped)
+    except Exception as e:
+        return {"error": str(e)}
+
+def _start_stage_async(stage: str, fn, *args, **kwargs):
+    """_start_stage for the event loop: coroutines become tasks, blocking fetches run on the stage pool."""
+    if asyncio.iscoroutinefunction(fn):
+        future = asyncio.ensure_future(_timed_async(stage, fn(*args, **kwargs)))
+    else:
+        future = asyncio.get_running_loop().run_in_executor(_STAGE_POOL, functools.partial(_timed, stage, fn, *args, **kwargs))
+    return future, time.monotonic() + STAGE_TIMEOUTS[stage]
+
+async def _timed_async(stage: str, coro):
+    with metrics.STAGE_SECONDS.time(stage=stage):
+        return await coro
+
+async def _stage_result_async(stage: str, pending, default, skipped: List[str]):
+    """_stage_result without blocking the loop; a stage that times out keeps running and fills the cache."""
+    future, deadline = pending
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        logger.warning("Stage '%s' timed out after %ss, continuing without it", stage, STAGE_TIMEOUTS[stage])
+    except Exception as e:
+        logger.warning("Stage '%s' failed: %s", stage, e)
+    skipped.append(stage)
+    return default
+
+async def run_investment_analysis_async(params: Dict):
+    """
+    run_investment_analysis for the ASGI server. News is awaited with the
+    async HTTP client; yahooquery has no async API, so prices and
+    fundamentals still run on the stage pool, and scoring (VADER, pandas)
+    runs in an executor so the event loop only ever waits.
+    """
+    loop = asyncio.get_running_loop()
+    requested = params.get('ticker', 'TCS.NS').upper()
+    max_news = params.get('maxNews', 20)
+    concurrent = params.get('concurrent', True)
+    weights = _weights_from_params(params)
 
-        result = {
-            "ticker": ticker,
-            "currentPrice": last_price,
-            "priceChange": price_change,
-            "sentimentScore": sscore_rescaled,
-            "technicalScore": tscore,
-            "fundamentalScore": fscore,
-            "finalScore": final_score,
-            "sentimentArticles": articles_list,
-            # Suggest a threshold based on recent volatility (0.0 - 1.0)
-            "suggestedThreshold": float(round(calculate_smart_threshold(tech_df), 2)),
-            "fundamentals": {
-                "marketPrice": fund_info.get('marketPrice', last_price),
-                "totalRevenue": fund_info.get('revenue', 0),
-                "netIncome": fund_info.get('net_income', 0),
-                "revenueYoY": fund_info.get('revenueYoY', 0.0),
-                "netMargin": fund_info.get('netMargin', 0.0),
-                "trailingEPS": fund_info.get('eps', 0.0),
-                "trailingPE": fund_info.get('trailingPE', 0.0),
-                "sharesOutstanding": fund_info.get('sharesOutstanding', 0)
+    def in_pool(stage, fn, *args, **kwargs):
+        return loop.run_in_executor(_STAGE_POOL, functools.partial(_timed, stage, fn, *args, **kwargs))
+
+    try:
+        # May read the local price store, so it stays off the loop too
+        ticker = await loop.run_in_executor(None, symbol_resolver.resolve, requested)
+        company_name = symbol_resolver.company_name(ticker)
+
+        skipped = []
+        fund_pending = news_pending = None
+        if concurrent:
+            price_pending = _start_stage_async('prices', fetch_price_data, [ticker], "1y")
+            fund_pending = _start_stage_async('fundamentals', fetch_fundamentals, ticker)
+            news_pending = _start_stage_async('news', fetch_news_for_ticker_async, ticker,
+                                              company_name=company_name, max_articles=max_news)
+            prices = await _stage_result_async('prices', price_pending, pd.DataFrame(), skipped)
+        else:
+            prices = await in_pool('prices', fetch_price_data, [ticker], "1y")
+
+        resolved = {ticker: ticker}
+        alt_prices = await loop.run_in_executor(_STAGE_POOL, retry_as_nse, resolved, prices,
+                                                lambda alt: _timed('ns_retry', fetch_price_data, alt, "1y"),
+                                                _has_closes)
+        if resolved[ticker] != ticker:
+            ticker = resolved[ticker]
+            prices = alt_prices
+            if 'prices' in skipped:
+                skipped.remove('prices')
+            if concurrent:
+                fund_pending = _start_stage_async('fundamentals', fetch_fundamentals, ticker)
+
+        if prices.empty:
+            return _no_prices_error(ticker)
+        await loop.run_in_executor(None, symbol_resolver.learn, requested, ticker)
+        close = _close_series(ticker, prices)
+        if close is None:
+            return _missing_column_error(ticker)
+
+        if concurrent:
+            fund_info = await _stage_result_async('fundamentals', fund_pending, {}, skipped)
+            news_df = await _stage_result_async('news', news_pending, pd.DataFrame(), skipped)
+        else:
+            fund_info = await in_pool('fundamentals', fetch_fundamentals, ticker)
+            news_df = await _timed_async('news', fetch_news_for_ticker_async(
+                ticker, company_name=company_name, max_articles=max_news))
+
+        return await loop.run_in_executor(None, _analysis_result, ticker, close, fund_info, news_df, weights, skipped)
+    except Exception as e:
+        return {"error": str(e)}
+
+MAX_BATCH_TICKERS = 100
+
+def run_batch_analysis(params: Dict):
+    """
+    Score a whole list of tickers in one pass.
+    Prices and fundamentals are fetched with one multi-symbol call each; news
+    is per ticker by nature, so those requests are fanned out over the stage pool.
+    """
+    requested = []
+    for t in params.get('tickers') or []:
+        t = str(t).strip().upper()
+        if t and t not in requested:
+            requested.append(t)
+    if not requested:
+        return {"error": "Please provide a non-empty 'tickers' list."}
+    if len(requested) > MAX_BATCH_TICKERS:
+        return {"error": f"At most {MAX_BATCH_TICKERS} tickers can be analysed per batch request."}
+
+    max_news = params.get('maxNews', 10)
+    include_news = params.get('includeNews', True)
+    weights = _weights_from_params(params)
+
+    try:
+        resolved = {t: symbol_resolver.resolve(t) for t in requested}
+        prices = _timed('batch_prices', fetch_price_data, list(dict.fromkeys(resolved.values())), "1y")
+
+        def has_prices(symbol):
+            return _has_closes(prices, symbol)
+
+        # Retry every unknown bare ticker that came back empty with the .NS suffix, in a single request
+        alt_prices = retry_as_nse(resolved, prices, lambda alt: _timed('batch_ns_retry', fetch_price_data, alt, "1y"),
+                                  _has_closes)
+        if alt_prices is not None:
+            prices = pd.concat([prices, alt_prices], axis=1) if not prices.empty else alt_prices
+
+        errors = {t: f"No price data found for {t}" for t in requested if not has_prices(resolved[t])}
+        symbol_resolver.learn_many({t: resolved[t] for t in requested if t not in errors})
+        symbols = list(dict.fromkeys(resolved[t] for t in requested if t not in errors))
+        if not symbols:
+            return {"count": 0, "results": {}, "errors": errors}
+
+        fundamentals = _timed('batch_fundamentals', fetch_fundamentals_batch, symbols)
+
+        sentiment = {s: 0.5 for s in symbols}
+        article_counts = {s: 0 for s in symbols}
+        skipped_news = []
+        if include_news:
+            pending = {
+                s: _start_stage('news', fetch_news_for_ticker, s,
+                                company_name=symbol_resolver.company_name(s), max_articles=max_news)
+                for s in symbols
             }
-        }
-        return result
+            for s, stage in pending.items():
+                news_df = _timed('sentiment', preprocess_and_score_news,
+                                 _stage_result('news', stage, pd.DataFrame(), skipped_news))
+                if not news_df.empty:
+                    sentiment[s] = (news_df['compound'].mean() + 1) / 2
+                    article_counts[s] = len(news_df)
+
+        # Indicators and scores for every symbol in one array pass
+        tech = _timed('batch_technicals', technicals.technical_snapshot, prices[symbols])
+
+        results = {}
+        for t in requested:
+            if t in errors:
+                continue
+            s = resolved[t]
+            tscore = float(tech.at[s, 'technicalScore'])
+            fund_info = fundamentals.get(s, {})
+            fscore = fundamental_score_from_info(fund_info)
+            last_price, price_change = _price_change(prices[s])
+            results[t] = {
+                "ticker": s,
+                "currentPrice": last_price,
+                "priceChange": price_change,
+                "sentimentScore": sentiment[s],
+                "technicalScore": tscore,
+                "fundamentalScore": fscore,
+                "finalScore": compute_composite_score(sentiment[s], tscore, fscore, weights),
+                "articleCount": article_counts[s],
+                "suggestedThreshold": float(round(tech.at[s, 'suggestedThreshold'], 2)),
+                "fundamentals": _fundamentals_summary(fund_info, last_price)
+            }
+        batch = {"count": len(results), "results": results, "errors": errors}
+        if skipped_news:
+            batch["skippedStages"] = ['news']
+        return batch
     except Exception as e:
         return {"error": str(e)}
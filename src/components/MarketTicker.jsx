@@ -7,8 +7,24 @@ export default function MarketTicker() {
 
   useEffect(() => {
     fetchMarketData();
-    const interval = setInterval(fetchMarketData, 900000);
-    return () => clearInterval(interval);
+    if (typeof EventSource === 'undefined') {
+      const interval = setInterval(fetchMarketData, 900000);
+      return () => clearInterval(interval);
+    }
+    // The server pushes only the fields that changed, keyed by index symbol
+    const source = new EventSource('http://localhost:5000/stream');
+    source.addEventListener('market', (event) => {
+      const delta = JSON.parse(event.data);
+      setMarketData((prev) => {
+        const next = prev.map((item) => (delta[item.symbol] ? { ...item, ...delta[item.symbol] } : item));
+        Object.entries(delta).forEach(([symbol, fields]) => {
+          if (!prev.some((item) => item.symbol === symbol)) next.push({ symbol, ...fields });
+        });
+        return next;
+      });
+      setLoading(false);
+    });
+    return () => source.close();
   }, []);
 
   const fetchMarketData = async () => {
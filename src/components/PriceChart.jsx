@@ -2,6 +2,10 @@ import React, { useState, useEffect } from 'react';
 import { LineChart, Line, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from 'recharts';
 import './PriceChart.css';
 
+// The chart is a few hundred pixels wide; the server downsamples longer series to this
+const MAX_CHART_POINTS = 400;
+const PERIODS = ['1mo', '3mo', '6mo', '1y', '2y', '5y'];
+
 export default function PriceChart({ ticker }) {
   const [chartData, setChartData] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -15,10 +19,13 @@ export default function PriceChart({ ticker }) {
   const fetchHistory = async (p) => {
     setLoading(true);
     try {
-      const res = await fetch(`http://localhost:5000/history?ticker=${encodeURIComponent(ticker)}&period=${p}`);
+      const res = await fetch(
+        `http://localhost:5000/history?ticker=${encodeURIComponent(ticker)}&period=${p}&interval=auto&format=columns&maxPoints=${MAX_CHART_POINTS}`
+      );
       const data = await res.json();
-      if (data.history) {
-        setChartData(data.history);
+      if (data.columns) {
+        const { date, close, volume, sma50, sma200 } = data.columns;
+        setChartData(date.map((d, i) => ({ date: d, close: close[i], volume: volume[i], sma50: sma50[i], sma200: sma200[i] })));
       }
     } catch (err) {
       console.error('Error fetching history:', err);
@@ -54,7 +61,7 @@ export default function PriceChart({ ticker }) {
         <h3 className="card-title" style={{ marginBottom: 0 }}>Price Chart</h3>
         <div className="chart-controls">
           <div className="period-btns">
-            {['1mo', '3mo', '6mo', '1y', '2y'].map((p) => (
+            {PERIODS.map((p) => (
               <button
                 key={p}
                 className={`period-btn ${period === p ? 'active' : ''}`}
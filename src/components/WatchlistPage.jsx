@@ -24,6 +24,24 @@ export default function WatchlistPage() {
     localStorage.setItem('smartinvest_watchlist_scores', JSON.stringify(scores));
   }, [scores]);
 
+  // Live score updates: the server re-scores all watched tickers in one loop and pushes changed fields
+  useEffect(() => {
+    if (watchlist.length === 0 || typeof EventSource === 'undefined') return undefined;
+    const source = new EventSource(`http://localhost:5000/stream?symbols=${encodeURIComponent(watchlist.join(','))}`);
+    source.addEventListener('score', (event) => {
+      const delta = JSON.parse(event.data);
+      const updatedAt = new Date().toISOString();
+      setScores((prev) => {
+        const next = { ...prev };
+        Object.entries(delta).forEach(([t, fields]) => {
+          next[t] = { ...prev[t], ...fields, updatedAt };
+        });
+        return next;
+      });
+    });
+    return () => source.close();
+  }, [watchlist]);
+
   const addTicker = (e) => {
     e.preventDefault();
     const t = newTicker.trim().toUpperCase();
@@ -72,8 +90,40 @@ export default function WatchlistPage() {
     }
   };
 
-  const refreshAll = () => {
-    watchlist.forEach((t) => refreshTicker(t));
+  const refreshAll = async () => {
+    if (watchlist.length === 0) return;
+    setLoading(Object.fromEntries(watchlist.map((t) => [t, true])));
+    try {
+      const res = await fetch('http://localhost:5000/analyze/batch', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ tickers: watchlist, maxNews: 10, sentimentWeight: 0.3, technicalWeight: 0.3, fundamentalWeight: 0.4 }),
+      });
+      const data = await res.json();
+      if (!data.error && data.results) {
+        const updatedAt = new Date().toISOString();
+        setScores((prev) => {
+          const next = { ...prev };
+          Object.entries(data.results).forEach(([t, r]) => {
+            next[t] = {
+              ticker: r.ticker,
+              currentPrice: r.currentPrice,
+              priceChange: r.priceChange,
+              finalScore: r.finalScore,
+              sentimentScore: r.sentimentScore,
+              technicalScore: r.technicalScore,
+              fundamentalScore: r.fundamentalScore,
+              updatedAt,
+            };
+          });
+          return next;
+        });
+      }
+    } catch (err) {
+      console.error('Error refreshing watchlist:', err);
+    } finally {
+      setLoading({});
+    }
   };
 
   return (
@@ -0,0 +1,269 @@
+"""
+Server-sent event hub for the market ticker and watchlist scores.
+
+One shared loop feeds every open dashboard: index quotes arrive from the
+market refresher, and watchlist scores for the union of all subscribed
+tickers are refreshed once per cycle. A full batch analysis (news
+sentiment, fundamentals, technicals) runs every FULL_RESCORE_INTERVAL; the
+cycles in between fetch one multi-symbol quote and fold it into each
+symbol's incremental indicator state (live_indicators), re-scoring only the
+technical side against the last sentiment and fundamentals. Each update is
+diffed against the last published state and only changed fields are sent.
+Every event is encoded once and then handed to the subscribers that want
+it, so server work grows with the number of symbols, not of browsers.
+
+Streams served by the ASGI app use an AsyncSubscription, which hands each
+message to the event loop instead of parking a thread per open stream.
+"""
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from live_indicators import LiveIndicatorBook, live_book
+from market_data import fetch_quotes, market_refresher
+from smart_invest_logic import DEFAULT_WEIGHTS, MAX_BATCH_TICKERS, compute_composite_score, run_batch_analysis
+
+logger = logging.getLogger(__name__)
+
+WATCHLIST_REFRESH_INTERVAL = 60   # seconds between watchlist re-scores
+FULL_RESCORE_INTERVAL = 600       # seconds between full batch analyses; live quotes in between
+KEEPALIVE_INTERVAL = 15           # seconds between SSE comments on an idle stream
+SUBSCRIBER_QUEUE_SIZE = 256
+# Fields of a watchlist score event
+WATCHLIST_FIELDS = ['ticker', 'currentPrice', 'priceChange', 'finalScore', 'sentimentScore',
+                    'technicalScore', 'fundamentalScore', 'suggestedThreshold']
+
+
+def format_event(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+def diff_fields(previous: Optional[Dict], current: Dict) -> Dict:
+    """Fields of `current` that differ from `previous` (all of them if there is no previous)."""
+    if previous is None:
+        return dict(current)
+    return {k: v for k, v in current.items() if previous.get(k) != v}
+
+
+def _rounded(values: Dict) -> Dict:
+    # Rounding keeps float noise from being published as a change
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in values.items()}
+
+
+class Subscription:
+    def __init__(self, symbols: List[str]):
+        self.symbols = frozenset(symbols)
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def send(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # A client that can't keep up is dropped; EventSource reconnects and gets a fresh snapshot
+            self.closed = True
+
+
+class AsyncSubscription(Subscription):
+    """A subscription drained on an event loop; send() is called from the hub's threads."""
+
+    def __init__(self, symbols: List[str], loop: asyncio.AbstractEventLoop):
+        self.symbols = frozenset(symbols)
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+        self._loop = loop
+
+    def send(self, message: str):
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop has shut down
+            self.closed = True
+
+    def _put(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.closed = True
+
+
+class StreamHub:
+    def __init__(self, score_symbols=None):
+        self._score_symbols = score_symbols
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._market = {}
+        self._scores = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, symbols: List[str], loop: asyncio.AbstractEventLoop = None) -> Subscription:
+        """Register a subscriber and queue its snapshot; pass `loop` to consume it with aevents()."""
+        sub = Subscription(symbols) if loop is None else AsyncSubscription(symbols, loop)
+        with self._lock:
+            self._subscribers.add(sub)
+            if self._market:
+                sub.send(format_event('market', self._market))
+            for symbol in sub.symbols:
+                if symbol in self._scores:
+                    sub.send(format_event('score', {symbol: self._scores[symbol]}))
+            new_symbols = not sub.symbols.issubset(self._scores)
+        if new_symbols:
+            # Score newly watched tickers now instead of at the next cycle
+            self._wake.set()
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def watched_symbols(self) -> List[str]:
+        with self._lock:
+            return sorted(set().union(*(sub.symbols for sub in self._subscribers)))
+
+    def publish_market(self, quotes: List[Dict]):
+        """Listener for the market refresher: broadcast changed index fields."""
+        delta = {}
+        with self._lock:
+            for quote in quotes:
+                symbol = quote['symbol']
+                changed = diff_fields(self._market.get(symbol), quote)
+                if changed:
+                    delta[symbol] = changed
+                    self._market[symbol] = dict(quote)
+            if not delta:
+                return
+            message = format_event('market', delta)
+            for sub in list(self._subscribers):
+                sub.send(message)
+
+    def publish_scores(self, scores: Dict[str, Dict]):
+        """Broadcast changed score fields, each symbol only to subscribers watching it."""
+        with self._lock:
+            for symbol, values in scores.items():
+                values = _rounded({k: values[k] for k in WATCHLIST_FIELDS if k in values})
+                changed = diff_fields(self._scores.get(symbol), values)
+                if not changed:
+                    continue
+                self._scores[symbol] = values
+                message = format_event('score', {symbol: changed})
+                for sub in list(self._subscribers):
+                    if symbol in sub.symbols:
+                        sub.send(message)
+
+    def _run(self):
+        while True:
+            symbols = self.watched_symbols()
+            if symbols and self._score_symbols is not None:
+                try:
+                    self.publish_scores(self._score_symbols(symbols))
+                except Exception as e:
+                    logger.warning("Error refreshing watchlist scores: %s", e)
+            self._wake.wait(WATCHLIST_REFRESH_INTERVAL)
+            self._wake.clear()
+
+    def ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stream-hub', daemon=True)
+                self._thread.start()
+
+    def events(self, sub: Subscription):
+        """SSE text stream for one subscriber; ends when the client falls too far behind."""
+        try:
+            while not sub.closed:
+                try:
+                    yield sub.queue.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+        finally:
+            self.unsubscribe(sub)
+
+    async def aevents(self, sub: AsyncSubscription):
+        """events() for an AsyncSubscription."""
+        try:
+            while not sub.closed:
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+        finally:
+            self.unsubscribe(sub)
+
+
+def batch_scores(symbols: List[str]) -> Dict[str, Dict]:
+    """Scores for every watched ticker, MAX_BATCH_TICKERS at a time."""
+    scores = {}
+    for i in range(0, len(symbols), MAX_BATCH_TICKERS):
+        batch = run_batch_analysis({'tickers': symbols[i:i + MAX_BATCH_TICKERS]})
+        if 'error' in batch:
+            logger.warning("Error scoring watchlist batch: %s", batch['error'])
+            continue
+        scores.update(batch['results'])
+    return scores
+
+
+class WatchlistScorer:
+    """score_symbols for the hub: full batch analyses, with incremental live re-scores in between."""
+
+    def __init__(self, book: LiveIndicatorBook = live_book, full_scores=batch_scores, quotes=fetch_quotes):
+        self._book = book
+        self._full_scores = full_scores
+        self._quotes = quotes
+        self._base = {}       # ticker -> its last full batch result
+        self._scored_at = 0.0
+
+    def __call__(self, tickers: List[str]) -> Dict[str, Dict]:
+        now = time.time()
+        stale = now - self._scored_at >= FULL_RESCORE_INTERVAL
+        self._base = {t: result for t, result in self._base.items() if t in tickers}
+        full = tickers if stale else [t for t in tickers if t not in self._base]
+
+        scores = {}
+        if full:
+            scores = self._full_scores(full)
+            self._base.update(scores)
+            if stale:
+                self._scored_at = now
+            # Restart the live state from the bars the batch just brought up to date
+            self._book.seed(list(dict.fromkeys(r['ticker'] for r in scores.values())))
+            self._book.retain([r['ticker'] for r in self._base.values()])
+
+        live = [t for t in tickers if t in self._base and t not in scores]
+        if live:
+            scores.update(self.live_scores(live))
+        return scores
+
+    def live_scores(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Scores from the latest quotes, O(1) per symbol on top of the last full result."""
+        symbols = {t: self._base[t]['ticker'] for t in tickers}
+        quotes = self._quotes(list(dict.fromkeys(symbols.values())))
+        for symbol, quote in quotes.items():
+            self._book.on_price(symbol, quote['price'], quote['date'])
+        live = self._book.scores(list(dict.fromkeys(symbols.values())))
+
+        out = {}
+        for t, symbol in symbols.items():
+            if symbol not in live:
+                continue
+            base, current = self._base[t], live[symbol]
+            previous_close = (quotes.get(symbol) or {}).get('previousClose')
+            out[t] = {
+                **base,
+                'currentPrice': current['currentPrice'],
+                'priceChange': ((current['currentPrice'] - previous_close) / previous_close * 100
+                                if previous_close else base['priceChange']),
+                'technicalScore': current['technicalScore'],
+                'finalScore': compute_composite_score(base['sentimentScore'], current['technicalScore'],
+                                                      base['fundamentalScore'], DEFAULT_WEIGHTS),
+                'suggestedThreshold': float(round(current['suggestedThreshold'], 2)),
+            }
+        return out
+
+
+stream_hub = StreamHub(score_symbols=WatchlistScorer())
+market_refresher.add_listener(stream_hub.publish_market)
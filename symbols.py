@@ -0,0 +1,208 @@
+"""
+Symbol resolution without a failed upstream round trip.
+
+Users type bare NSE tickers ("TCS") or company names ("Infosys"); Yahoo
+needs "TCS.NS". The resolver answers from a local index before any fetch:
+a seed table of common listings, every symbol already in the price store,
+and whatever it has learned from earlier resolutions (persisted as JSON in
+DATA_DIR). It also supplies the company name used for news queries.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import metrics
+from cache import DATA_DIR, atomic_write
+from lazy import lazy_import
+from price_store import price_store
+from ratelimit import upstream_call
+
+yahooquery = lazy_import('yahooquery')
+logger = logging.getLogger(__name__)
+
+NSE_SUFFIX = '.NS'
+NAME_LOOKUP_CHUNK = 100   # symbols per yahooquery price request
+
+# Common listings: symbol -> company name (as used in news searches)
+KNOWN_SYMBOLS = {
+    'RELIANCE.NS': 'Reliance Industries',
+    'TCS.NS': 'Tata Consultancy Services',
+    'HDFCBANK.NS': 'HDFC Bank',
+    'ICICIBANK.NS': 'ICICI Bank',
+    'INFY.NS': 'Infosys',
+    'HINDUNILVR.NS': 'Hindustan Unilever',
+    'ITC.NS': 'ITC',
+    'SBIN.NS': 'State Bank of India',
+    'BHARTIARTL.NS': 'Bharti Airtel',
+    'KOTAKBANK.NS': 'Kotak Mahindra Bank',
+    'LT.NS': 'Larsen & Toubro',
+    'AXISBANK.NS': 'Axis Bank',
+    'BAJFINANCE.NS': 'Bajaj Finance',
+    'ASIANPAINT.NS': 'Asian Paints',
+    'MARUTI.NS': 'Maruti Suzuki',
+    'HCLTECH.NS': 'HCL Technologies',
+    'WIPRO.NS': 'Wipro',
+    'SUNPHARMA.NS': 'Sun Pharmaceutical',
+    'TITAN.NS': 'Titan Company',
+    'ULTRACEMCO.NS': 'UltraTech Cement',
+    'TATAMOTORS.NS': 'Tata Motors',
+    'TATASTEEL.NS': 'Tata Steel',
+    'NTPC.NS': 'NTPC',
+    'POWERGRID.NS': 'Power Grid Corporation',
+    'ONGC.NS': 'ONGC',
+    'ADANIENT.NS': 'Adani Enterprises',
+    'ADANIPORTS.NS': 'Adani Ports',
+    'TECHM.NS': 'Tech Mahindra',
+    'M&M.NS': 'Mahindra & Mahindra',
+    'NESTLEIND.NS': 'Nestle India',
+    'AAPL': 'Apple',
+    'MSFT': 'Microsoft',
+    'GOOGL': 'Alphabet',
+    'AMZN': 'Amazon',
+    'META': 'Meta Platforms',
+    'NVDA': 'Nvidia',
+    'TSLA': 'Tesla',
+}
+
+# Corporate suffixes dropped from names so they work as search queries
+_NAME_SUFFIX_RE = re.compile(
+    r'[\s,.]+(limited|ltd|inc|incorporated|corp|corporation|plc|co)\.?$', re.IGNORECASE)
+
+
+def clean_company_name(name: str) -> str:
+    name = (name or '').strip()
+    while True:
+        shorter = _NAME_SUFFIX_RE.sub('', name)
+        if shorter == name:
+            return name
+        name = shorter
+
+
+def retry_as_nse(resolved: Dict[str, str], data: Any, fetch: Callable[[List[str]], Any],
+                 has_data: Callable[[Any, str], bool]) -> Optional[Any]:
+    """
+    The .NS retry shared by every endpoint. Bare symbols in `resolved` (input
+    ticker -> symbol) that `data` has nothing for are fetched again as NSE
+    listings, with one fetch() call for all of them, and each ticker whose
+    listing has data is re-pointed to it in place. Returns what fetch()
+    returned, or None when no symbol needed a retry.
+    """
+    def bare(symbol):
+        return '.' not in symbol and not symbol.startswith('^')
+
+    retry = [s + NSE_SUFFIX for s in dict.fromkeys(resolved.values()) if bare(s) and not has_data(data, s)]
+    if not retry:
+        return None
+    logger.debug("No data for %s, retrying with the %s suffix", retry, NSE_SUFFIX)
+    alt = fetch(retry)
+    for ticker, symbol in resolved.items():
+        if bare(symbol) and has_data(alt, symbol + NSE_SUFFIX):
+            resolved[ticker] = symbol + NSE_SUFFIX
+    return alt
+
+
+class SymbolResolver:
+    def __init__(self, path: str, seed: Dict[str, str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._aliases = {}   # user input (upper case) -> symbol
+        self._names = {}     # symbol -> company name
+        # Only what was learned is persisted; the seed table always comes from code
+        self._learned = {'aliases': {}, 'names': {}}
+        self._name_lookups = ThreadPoolExecutor(max_workers=1, thread_name_prefix='symbol-names')
+        self._pending_names = set()
+        for symbol, name in (seed or {}).items():
+            self._add(symbol, name)
+        self._load()
+
+    def _add(self, symbol: str, name: str = None):
+        self._aliases[symbol] = symbol
+        if symbol.endswith(NSE_SUFFIX):
+            self._aliases[symbol[:-len(NSE_SUFFIX)]] = symbol
+        if name:
+            self._names[symbol] = name
+            self._aliases[name.upper()] = symbol
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._learned = {'aliases': data.get('aliases', {}), 'names': data.get('names', {})}
+        self._aliases.update(self._learned['aliases'])
+        for symbol, name in self._learned['names'].items():
+            self._add(symbol, name)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write(self.path, lambda f: json.dump(self._learned, f), mode='w')
+
+    def resolve(self, ticker: str) -> str:
+        """Best known Yahoo symbol for a ticker or company name; the input itself if unknown."""
+        key = ticker.strip().upper()
+        with self._lock:
+            symbol = self._aliases.get(key)
+        if symbol:
+            return symbol
+        if '.' in key or key.startswith('^'):
+            return key
+        # Already stored locally as an NSE listing: no need to try the bare symbol first
+        if price_store.load(key) is None and price_store.load(key + NSE_SUFFIX) is not None:
+            return key + NSE_SUFFIX
+        return key
+
+    def learn(self, ticker: str, symbol: str):
+        """Record that `ticker` resolved to `symbol` (with data), and look its name up in the background."""
+        self.learn_many({ticker: symbol})
+
+    def learn_many(self, resolutions: Dict[str, str]):
+        """learn() for many tickers at once: one save and one batched name lookup."""
+        with self._lock:
+            changed = False
+            for ticker, symbol in resolutions.items():
+                key = ticker.strip().upper()
+                if self._aliases.get(key) != symbol or self._aliases.get(symbol) != symbol:
+                    self._aliases[key] = self._learned['aliases'][key] = symbol
+                    self._aliases[symbol] = self._learned['aliases'][symbol] = symbol
+                    changed = True
+            if changed:
+                self._save()
+            unnamed = [s for s in dict.fromkeys(resolutions.values())
+                       if s not in self._names and s not in self._pending_names]
+            self._pending_names.update(unnamed)
+        for i in range(0, len(unnamed), NAME_LOOKUP_CHUNK):
+            self._name_lookups.submit(self._lookup_names, unnamed[i:i + NAME_LOOKUP_CHUNK])
+
+    def _lookup_names(self, symbols: List[str]):
+        try:
+            with upstream_call(metrics.YAHOO_HOST):
+                prices = yahooquery.Ticker(symbols).price
+            prices = prices if isinstance(prices, dict) else {}
+        except Exception as e:
+            logger.info("Company name lookup failed for %s: %s", symbols, e)
+            prices = {}
+        names = {}
+        for symbol in symbols:
+            price = prices.get(symbol)
+            if isinstance(price, dict) and (price.get('longName') or price.get('shortName')):
+                names[symbol] = clean_company_name(price.get('longName') or price.get('shortName'))
+        with self._lock:
+            # A failed lookup stays pending, so it isn't retried on every request
+            for symbol, name in names.items():
+                self._pending_names.discard(symbol)
+                self._learned['names'][symbol] = name
+                self._add(symbol, name)
+            if names:
+                self._save()
+
+    def company_name(self, symbol: str) -> Optional[str]:
+        with self._lock:
+            return self._names.get(symbol)
+
+
+symbol_resolver = SymbolResolver(os.path.join(DATA_DIR, 'symbols.json'), seed=KNOWN_SYMBOLS)
@@ -0,0 +1,123 @@
+"""
+Vectorized technical indicators over a wide (date x symbol) close matrix.
+
+Produces the same SMA50 / SMA200 / Momentum30 / Volatility30 values as
+smart_invest_logic.compute_technicals, and the same scores as
+technical_score_for_latest / calculate_smart_threshold, but for every column
+of the frame at once using cumulative sums instead of per-symbol rolling
+passes.
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# (window, min_periods) pairs, matching compute_technicals
+SMA_FAST = (50, 10)
+SMA_SLOW = (200, 50)
+VOLATILITY = (30, 10)
+MOMENTUM_LAG = 30
+
+
+def align_to_latest(values: np.ndarray) -> np.ndarray:
+    """
+    Move each column's NaNs to the top, keeping the order of its valid values.
+    Rolling windows over the result match rolling over each column with
+    dropna(), and the last row holds every symbol's latest close even when
+    exchanges have different holidays.
+    """
+    order = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0)
+
+
+def _window_sums(values: np.ndarray, window: int):
+    """Rolling sum and count of non-NaN values along axis 0."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([zeros, np.cumsum(filled, axis=0)])
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    lagged = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    return csum[1:] - csum[lagged], ccount[1:] - ccount[lagged]
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    sums, counts = _window_sums(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts >= min_periods, sums / counts, np.nan)
+
+
+def rolling_std(values: np.ndarray, window: int, min_periods: int) -> np.ndarray:
+    """Sample (ddof=1) rolling standard deviation."""
+    # Centre each column first so the sum-of-squares difference doesn't lose precision
+    with np.errstate(invalid='ignore'):
+        centre = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else 0.0
+    centred = values - centre
+    sums, counts = _window_sums(centred, window)
+    sq_sums, _ = _window_sums(centred ** 2, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var = (sq_sums - sums ** 2 / counts) / (counts - 1)
+    var = np.maximum(var, 0.0)
+    return np.where((counts >= min_periods) & (counts > 1), np.sqrt(var), np.nan)
+
+
+def momentum(values: np.ndarray, lag: int = MOMENTUM_LAG) -> np.ndarray:
+    out = np.full(values.shape, np.nan)
+    if len(values) > lag:
+        out[lag:] = values[lag:] - values[:-lag]
+    return out
+
+
+def compute_indicators(close: np.ndarray) -> Dict[str, np.ndarray]:
+    """Indicator matrices for an already aligned close matrix (see align_to_latest)."""
+    return {
+        'Close': close,
+        'SMA50': rolling_mean(close, *SMA_FAST),
+        'SMA200': rolling_mean(close, *SMA_SLOW),
+        'Momentum30': momentum(close),
+        'Volatility30': rolling_std(close, *VOLATILITY),
+    }
+
+
+def technical_score(close, sma50, sma200, mom, vol) -> np.ndarray:
+    """Element-wise version of technical_score_for_latest; accepts scalars or arrays of any shape."""
+    close, sma50, sma200, mom, vol = (np.asarray(a, dtype=float) for a in (close, sma50, sma200, mom, vol))
+    score = np.full(np.broadcast(close, sma50, sma200, mom, vol).shape, 0.5)
+    has_trend = ~np.isnan(sma50) & ~np.isnan(sma200)
+    score += np.where(has_trend, np.where(sma50 > sma200, 0.2, -0.1), 0.0)
+    score += np.where(~np.isnan(mom), np.where(mom > 0, 0.15, -0.1), 0.0)
+    has_vol = ~np.isnan(vol) & ~np.isnan(close)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        score -= np.where(has_vol, np.minimum(0.2, vol / (close + 1e-9)), 0.0)
+    return np.clip(score, 0.0, 1.0)
+
+
+def smart_threshold(close, vol, base_threshold: float = 0.6) -> np.ndarray:
+    """Element-wise version of calculate_smart_threshold."""
+    close, vol = np.asarray(close, dtype=float), np.asarray(vol, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vol_pct = vol / close
+    return np.select(
+        [close == 0, vol_pct > 0.02, vol_pct > 0.01],
+        [base_threshold, 0.70, 0.65],
+        default=0.55
+    )
+
+
+def technical_snapshot(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Latest indicators, technical score and suggested threshold for every
+    column of a date x symbol close frame (as returned by fetch_price_data).
+    Symbols without any price are left out.
+    """
+    if prices is None or prices.empty:
+        return pd.DataFrame(columns=['Close', 'SMA50', 'SMA200', 'Momentum30', 'Volatility30',
+                                     'technicalScore', 'suggestedThreshold'])
+    close = align_to_latest(prices.to_numpy(dtype=float))
+    latest = {name: values[-1] for name, values in compute_indicators(close).items()}
+    snapshot = pd.DataFrame(latest, index=prices.columns)
+    snapshot['technicalScore'] = technical_score(
+        latest['Close'], latest['SMA50'], latest['SMA200'], latest['Momentum30'], latest['Volatility30']
+    )
+    snapshot['suggestedThreshold'] = smart_threshold(latest['Close'], latest['Volatility30'])
+    return snapshot[snapshot['Close'].notna()]
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# The modules live at the repository root, and write their stores under DATA_DIR on import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SMART_INVEST_DATA_DIR', tempfile.mkdtemp(prefix='smart-invest-tests-'))
+
+import pytest
+
+import replay
+
+
+@pytest.fixture(scope='session')
+def feed_stub():
+    stub = replay.install()
+    yield stub
+    stub.close()
@@ -0,0 +1,78 @@
+import re
+
+import pandas as pd
+import pytest
+from bs4 import BeautifulSoup
+
+from articles import serialize_articles
+
+
+def baseline_article(row):
+    """
+    The per-row BeautifulSoup cleaning serialize_articles replaced (title,
+    summary, content, url). serialize_articles also collapses whitespace
+    runs (including &nbsp;), so the baseline's text is compared collapsed.
+    """
+    def strip_html(x):
+        return BeautifulSoup(str(x or ''), 'html.parser').get_text().strip()
+
+    summary_raw = row.get('description') or row.get('summary') or ''
+    url_candidate = None
+    desc_soup = BeautifulSoup(str(summary_raw or ''), 'html.parser')
+    a_tag = desc_soup.find('a', href=True)
+    if a_tag and a_tag.get('href'):
+        url_candidate = a_tag.get('href')
+        a_tag.decompose()
+    for at in desc_soup.find_all('a'):
+        at.decompose()
+    summary = re.sub(r'https?://\S+', '', desc_soup.get_text().strip()).strip()
+    title = strip_html(row.get('title') or row.get('headline') or '')
+    content = strip_html(row.get('content') or '')
+    return {field: ' '.join(value.split()) or None if isinstance(value, str) else value for field, value in {
+        'title': title or None,
+        'summary': summary or None,
+        'content': content or None,
+        'url': row.get('url') or url_candidate or row.get('link') or None,
+    }.items()}
+
+
+ROWS = [
+    {   # Google News RSS item: the anchor wraps the headline, the source follows in a <font>
+        'title': 'Tata Consultancy Services &amp; Infosys rally - Example Wire',
+        'description': '<a href="https://news.google.com/rss/articles/CBMiX?oc=5" target="_blank">'
+                       'Tata Consultancy Services &amp; Infosys rally</a>&nbsp;&nbsp;'
+                       '<font color="#6f6f6f">Example Wire</font>',
+        'link': 'https://news.google.com/rss/articles/CBMiX?oc=5&hl=en-IN',
+    },
+    {   # Entities, tags and raw URLs mixed into the text
+        'title': '<b>Sensex</b> jumps 500 pts &#8212; Nifty at &quot;record&quot;',
+        'description': 'Markets rose on Tuesday &amp; closed higher. Read more at https://example.com/story?id=1 '
+                       '<a href="https://example.com/a">first</a> and <a href="https://example.com/b">second</a> '
+                       'links, see http://example.org/x',
+        'content': '<p>Full story:&nbsp;markets <i>surged</i>.</p>',
+    },
+    {   # NewsAPI style: an explicit url wins over the description's href
+        'title': 'Reliance Q2 results',
+        'description': 'Profit up 12% <a href="https://example.com/in-text">details</a>',
+        'url': 'https://example.com/reliance-q2',
+        'content': 'Reliance Industries reported... [+1200 chars]',
+    },
+    {   # Nothing left after cleaning
+        'title': '',
+        'description': '<a href="https://example.com/only-link">https://example.com/only-link</a>',
+    },
+]
+
+
+@pytest.mark.parametrize('row', ROWS)
+def test_matches_the_beautifulsoup_baseline(row):
+    serialized = serialize_articles(pd.DataFrame([row]))[0]
+    expected = baseline_article(row)
+    for field in ('title', 'summary', 'content', 'url'):
+        assert serialized[field] == expected[field], field
+
+
+def test_one_frame_matches_row_by_row():
+    serialized = serialize_articles(pd.DataFrame(ROWS))
+    assert [{k: a[k] for k in ('title', 'summary', 'content', 'url')} for a in serialized] == \
+        [baseline_article(row) for row in ROWS]
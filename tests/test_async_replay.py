@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('httpx')
+
+from http_client import async_http
+from news_feeds import fetch_news, fetch_news_async
+from smart_invest_logic import fetch_news_for_ticker, fetch_news_for_ticker_async, run_investment_analysis
+
+
+def run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            # The client belongs to this test's event loop
+            await async_http.aclose()
+    return asyncio.run(main())
+
+
+def test_async_news_feeds_are_served_by_the_stub(feed_stub):
+    articles = run(fetch_news_async('world', limit=15))
+    assert len(articles) == 15
+    assert [a['title'] for a in articles] == [a['title'] for a in fetch_news('world', limit=15)]
+
+
+def test_async_ticker_news_matches_sync(feed_stub):
+    async_df = run(fetch_news_for_ticker_async('WIPRO.NS', company_name='Wipro', max_articles=10))
+    sync_df = fetch_news_for_ticker('WIPRO.NS', company_name='Wipro', max_articles=10)
+    assert not async_df.empty
+    assert list(async_df['title']) == list(sync_df['title'])
+
+
+def test_async_analysis_matches_sync(feed_stub):
+    from smart_invest_logic import run_investment_analysis_async
+    for concurrent in (True, False):
+        params = {'ticker': 'HCLTECH', 'maxNews': 10, 'concurrent': concurrent}
+        result = run(run_investment_analysis_async(params))
+        expected = run_investment_analysis(params)
+        assert 'error' not in result
+        assert result['ticker'] == expected['ticker'] == 'HCLTECH.NS'
+        for key in ('finalScore', 'sentimentScore', 'technicalScore', 'fundamentalScore'):
+            assert result[key] == pytest.approx(expected[key])
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+import backtest
+
+# Only the technical score counts, so the signal is technicalScore >= suggestedThreshold
+TECHNICAL_ONLY = {'sentiment': 0.0, 'technical': 1.0, 'fundamental': 0.0}
+
+
+def matrices(close, tech, threshold=0.5, fundamental=0.5):
+    close = np.asarray(close, dtype=float)
+    return {
+        'close': close,
+        'technicalScore': np.asarray(tech, dtype=float),
+        'suggestedThreshold': np.full(close.shape, threshold),
+        'fundamentalScore': np.full(close.shape[1], fundamental),
+    }
+
+
+def test_equity_curve_matches_hand_computation():
+    # A: held on days 0-2 (earning days 1-3), B: held on day 1 only (earning day 2)
+    data = matrices(close=[[100, 50], [110, 50], [99, 55], [99, 55]],
+                    tech=[[0.9, 0.1], [0.9, 0.9], [0.9, 0.1], [0.1, 0.1]])
+    stats = backtest.simulate(data, TECHNICAL_ONLY, cost_bps=0)
+    daily = [0.10, 0.5 * (99 / 110 - 1) + 0.5 * (55 / 50 - 1), 0.0]
+    assert stats['totalReturn'] == pytest.approx(np.prod(np.add(1, daily)) - 1)
+    assert stats['turnover'] == pytest.approx(1.0 + 1.0 + 1.0)   # buy A; move half to B; move it back
+    assert stats['exposure'] == pytest.approx(1.0)
+    assert stats['maxDrawdown'] == pytest.approx(0.0)
+
+    with_costs = backtest.simulate(data, TECHNICAL_ONLY, cost_bps=100)
+    costed = [daily[0] - 0.01, daily[1] - 0.01, daily[2] - 0.01]
+    assert with_costs['totalReturn'] == pytest.approx(np.prod(np.add(1, costed)) - 1)
+
+
+def test_missing_days_carry_the_position():
+    full = matrices(close=[[100, 50], [101, 51], [102, 52], [103, 53], [104, 54]],
+                    tech=[[0.9, 0.9]] * 5)
+    gapped = {k: v.copy() for k, v in full.items()}
+    # B has no bar on days 2 and 3 (e.g. an exchange holiday): flat price, unchanged signal
+    gapped['close'][2:4, 1] = np.nan
+    gapped['technicalScore'][2:4, 1] = np.nan
+
+    stats = backtest.simulate(gapped, TECHNICAL_ONLY, cost_bps=0)
+    assert stats['turnover'] == pytest.approx(1.0)   # only the initial buy
+    a = [101 / 100, 102 / 101, 103 / 102, 104 / 103]
+    b = [51 / 50, 1.0, 1.0, 54 / 51]
+    expected = np.prod([1 + 0.5 * (x - 1) + 0.5 * (y - 1) for x, y in zip(a, b)]) - 1
+    assert stats['totalReturn'] == pytest.approx(expected)
+
+
+def test_sweep_in_process_matches_pooled(monkeypatch):
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (120, 3)), axis=0))
+    data = matrices(close, rng.uniform(0.3, 0.9, (120, 3)), threshold=0.6,
+                    fundamental=0.7)
+    grid = backtest.weight_grid(0.25, [0.0, 0.05])
+    assert len(grid) >= backtest.PROCESS_GRID_THRESHOLD
+
+    pooled = backtest.sweep(data, grid)
+    monkeypatch.setattr(backtest, 'PROCESS_GRID_THRESHOLD', len(grid) + 1)
+    in_process = backtest.sweep(data, grid)
+    assert pooled == in_process
@@ -0,0 +1,15 @@
+from cache import Cache, MemoryBackend
+
+
+def test_uncounted_peeks_leave_the_stats_alone():
+    cache = Cache(MemoryBackend(maxsize=16))
+    assert cache.get('news', 'TCS|10|rss', count=False) is None
+    cache.set('news', 'TCS|10|rss', ['headline'])
+    assert cache.get('news', 'TCS|10|rss', count=False) == ['headline']
+    assert cache.stats().get('news', {}).get('miss', 0) == 0
+    assert cache.stats().get('news', {}).get('hit', 0) == 0
+
+    assert cache.get('news', 'INFY|10|rss') is None
+    assert cache.get('news', 'TCS|10|rss') == ['headline']
+    assert cache.stats()['news']['miss'] == 1
+    assert cache.stats()['news']['hit'] == 1
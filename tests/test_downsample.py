@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from downsample import lttb_indices
+
+
+@pytest.mark.parametrize('n, max_points', [(1000, 100), (250, 3), (10, 9), (5000, 777)])
+def test_lttb_keeps_the_ends_and_returns_max_points_in_order(n, max_points):
+    rng = np.random.default_rng(n)
+    y = np.cumsum(rng.normal(0, 1, n))
+    y[rng.choice(n, n // 20, replace=False)] = np.nan
+    keep = lttb_indices(np.arange(n), y, max_points)
+    assert len(keep) == max_points
+    assert keep[0] == 0 and keep[-1] == n - 1
+    assert (np.diff(keep) > 0).all()
+
+
+@pytest.mark.parametrize('n, max_points', [(50, 50), (50, 500), (1, 10), (0, 10), (50, 2)])
+def test_lttb_returns_everything_when_there_is_nothing_to_drop(n, max_points):
+    keep = lttb_indices(np.arange(n), np.arange(n, dtype=float), max_points)
+    np.testing.assert_array_equal(keep, np.arange(n))
+
+
+def test_lttb_keeps_the_peak():
+    y = np.zeros(1000)
+    y[437] = 50.0
+    assert 437 in lttb_indices(np.arange(1000), y, 20)
+
+
+def test_history_columns_are_downsampled(feed_stub):
+    from api import app
+    client = app.test_client()
+    full = client.get('/history?ticker=TCS.NS&period=5y&format=columns').get_json()
+    body = client.get('/history?ticker=TCS.NS&period=5y&format=columns&maxPoints=200').get_json()
+    assert body['count'] == 200
+    columns = body['columns']
+    assert set(columns) == {'date', 'close', 'volume', 'sma50', 'sma200'}
+    assert all(len(v) == 200 for v in columns.values())
+    assert columns['date'][0] == full['columns']['date'][0]
+    assert columns['date'][-1] == full['columns']['date'][-1]
+    assert columns['date'] == sorted(columns['date'])
+
+    # Kept points carry the full series' values, SMAs included
+    by_date = {d: i for i, d in enumerate(full['columns']['date'])}
+    for j in (0, 57, 199):
+        i = by_date[columns['date'][j]]
+        for field in ('close', 'sma50', 'sma200', 'volume'):
+            assert columns[field][j] == full['columns'][field][i]
+
+    rows = client.get('/history?ticker=TCS.NS&period=1mo&maxPoints=500').get_json()
+    assert rows['count'] == len(rows['history']) == full_count(client, '1mo')
+
+
+def full_count(client, period):
+    return client.get(f'/history?ticker=TCS.NS&period={period}&format=columns').get_json()['count']
@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+import encoding
+
+URL = '/history?ticker=TCS.NS&period=1y&format=columns'
+
+
+@pytest.fixture
+def client(feed_stub):
+    from api import app
+    return app.test_client()
+
+
+def test_matching_etag_gets_an_empty_304(client):
+    first = client.get(URL)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+
+    again = client.get(URL, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+    # The tag is of the uncompressed payload, so it still matches when gzip is accepted
+    assert client.get(URL, headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'}).status_code == 304
+    assert client.get(URL, headers={'If-None-Match': 'W/"stale"'}).status_code == 200
+
+
+def test_body_is_sent_in_the_accepted_encoding(client, monkeypatch):
+    plain = client.get(URL)
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.data) >= encoding.MIN_COMPRESS_SIZE
+    assert 'Accept-Encoding' in plain.headers['Vary']
+
+    gzipped = client.get(URL, headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.data) == plain.data
+
+    # br is only chosen when brotli is installed
+    monkeypatch.setattr(encoding, 'brotli', None)
+    fallback = client.get(URL, headers={'Accept-Encoding': 'br, gzip'})
+    assert fallback.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(fallback.data) == plain.data
+
+
+def test_brotli_when_installed(client):
+    brotli = pytest.importorskip('brotli')
+    plain = client.get(URL)
+    compressed = client.get(URL, headers={'Accept-Encoding': 'gzip, br'})
+    assert compressed.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(compressed.data) == plain.data
+
+
+def test_small_bodies_are_not_compressed():
+    body, coding = encoding.compress_body(b'{}', 'gzip, br')
+    assert (body, coding) == (b'{}', None)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import history
+
+
+@pytest.fixture
+def daily():
+    """Three weeks of daily bars, Wednesday 2026-09-30 to Monday 2026-10-19, with a holiday on Friday 10-02."""
+    dates = np.array(['2026-09-30', '2026-10-01', '2026-10-05', '2026-10-06', '2026-10-07',
+                      '2026-10-08', '2026-10-09', '2026-10-12', '2026-10-16', '2026-10-19'], dtype='datetime64[D]')
+    close = np.array([10.0, 12.0, 11.0, 15.0, 9.0, 13.0, 14.0, 20.0, 18.0, 19.0])
+    return {
+        'date': dates,
+        'close': close,
+        'volume': np.arange(1.0, 11.0) * 100,
+        'sma50': close + 0.5,
+        'sma200': close - 0.5,
+    }
+
+
+def test_weekly_buckets(daily):
+    weekly = history.resample(daily, '1wk')
+    # Monday-based weeks: Wed-Thu | Mon-Fri | Mon, Fri | Mon
+    assert list(weekly['date'].astype(str)) == ['2026-10-01', '2026-10-09', '2026-10-16', '2026-10-19']
+    assert list(weekly['open']) == [10.0, 11.0, 20.0, 19.0]
+    assert list(weekly['high']) == [12.0, 15.0, 20.0, 19.0]
+    assert list(weekly['low']) == [10.0, 9.0, 18.0, 19.0]
+    assert list(weekly['close']) == [12.0, 14.0, 18.0, 19.0]
+    assert list(weekly['volume']) == [300.0, 2500.0, 1700.0, 1000.0]
+    # SMAs are the bucket's last daily value, not re-averaged
+    assert list(weekly['sma50']) == [12.5, 14.5, 18.5, 19.5]
+
+
+def test_monthly_buckets(daily):
+    monthly = history.resample(daily, '1mo')
+    assert list(monthly['date'].astype(str)) == ['2026-09-30', '2026-10-19']
+    assert list(monthly['open']) == [10.0, 12.0]
+    assert list(monthly['high']) == [10.0, 20.0]
+    assert list(monthly['low']) == [10.0, 9.0]
+    assert list(monthly['close']) == [10.0, 19.0]
+    assert list(monthly['volume']) == [100.0, 5400.0]
+
+
+def test_daily_is_unchanged_and_period_slice_views(daily, monkeypatch):
+    assert history.resample(daily, '1d') is daily
+    monkeypatch.setattr(history, 'period_start', lambda period: pd.Timestamp('2026-10-07'))
+    sliced = history.period_slice(daily, '1mo')
+    assert list(sliced['date'].astype(str))[:2] == ['2026-10-07', '2026-10-08']
+    assert all(len(v) == 6 for v in sliced.values())
+    assert np.shares_memory(sliced['close'], daily['close'])
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def task():
+    """A job kind that blocks until released and counts its runs."""
+    release = threading.Event()
+    runs = []
+
+    def run(params):
+        runs.append(params)
+        release.wait(5)
+        return {'ticker': params['ticker'].strip().upper()}
+
+    run.release, run.runs = release, runs
+    return run
+
+
+@pytest.fixture
+def queue(task):
+    return jobs.JobQueue(workers=2, kinds={'analyze': task, 'failing': lambda params: {'error': 'boom'}})
+
+
+def test_equivalent_submits_share_one_execution(queue, task):
+    first, coalesced = queue.submit('analyze', {'ticker': 'tcs ', 'async': True})
+    second, coalesced_again = queue.submit('analyze', {'ticker': 'TCS'})
+    other, _ = queue.submit('analyze', {'ticker': 'INFY'})
+    assert (coalesced, coalesced_again) == (False, True)
+    assert second is first and other is not first
+
+    task.release.set()
+    assert first.done.wait(5) and other.done.wait(5)
+    assert len(task.runs) == 2
+    assert first.to_dict()['result'] == {'ticker': 'TCS'}
+    assert first.status == 'done'
+
+    # Finished jobs no longer coalesce: a new submit runs again
+    third, coalesced = queue.submit('analyze', {'ticker': 'TCS'})
+    assert not coalesced and third is not first
+    assert third.done.wait(5)
+    assert len(task.runs) == 3
+
+
+def test_done_callbacks_see_the_result(queue, task):
+    job, _ = queue.submit('analyze', {'ticker': 'WIPRO'})
+    seen = []
+    job.add_done_callback(lambda j: seen.append(('early', j.status, j.result)))
+    assert seen == []
+
+    task.release.set()
+    assert job.done.wait(5)
+    job.add_done_callback(lambda j: seen.append(('late', j.status, j.result)))
+    assert seen == [('early', 'done', {'ticker': 'WIPRO'}), ('late', 'done', {'ticker': 'WIPRO'})]
+
+    failed, _ = queue.submit('failing', {})
+    assert failed.done.wait(5)
+    assert failed.status == 'failed'
+
+
+def test_finished_jobs_are_evicted_after_retention(queue, task, monkeypatch):
+    task.release.set()
+    job, _ = queue.submit('analyze', {'ticker': 'TCS'})
+    assert job.done.wait(5)
+    assert queue.get(job.id) is job
+
+    monkeypatch.setattr(jobs, 'JOB_RETENTION', -1)
+    assert queue.get(job.id) is None
+
+
+def test_running_jobs_are_never_evicted(queue, task, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_RETENTION', -1)
+    job, _ = queue.submit('analyze', {'ticker': 'TCS'})
+    assert queue.get(job.id) is job
+    task.release.set()
+    assert job.done.wait(5)
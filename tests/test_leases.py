@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+import ratelimit
+from cache import LeaseTable
+
+
+@pytest.fixture
+def table(tmp_path):
+    return LeaseTable(str(tmp_path / 'leases.sqlite'))
+
+
+def test_acquire_many_gives_each_key_to_one_owner(table):
+    assert table.acquire_many(['a', 'b'], 'one') == ['a', 'b']
+    assert table.acquire_many(['b', 'c'], 'two') == ['c']
+    table.release('b', 'one')
+    assert table.acquire('b', 'two')
+    # Expired leases can be taken over
+    assert table.acquire('d', 'one', ttl=-1)
+    assert table.acquire('d', 'two')
+
+
+def test_run_once_runs_each_item_once_across_threads(table):
+    done, runs, lock = set(), [], threading.Lock()
+    start = threading.Barrier(2)
+
+    def work(batch):
+        with lock:
+            runs.append(list(batch))
+        time.sleep(0.2)
+        with lock:
+            done.update(batch)
+
+    def worker():
+        start.wait()
+        # Each thread uses its own connection, like separate processes would
+        table.run_once('prices', ['TCS.NS', 'INFY.NS'],
+                       todo=lambda pending: [s for s in pending if s not in done], work=work)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(s for batch in runs for s in batch) == ['INFY.NS', 'TCS.NS']
+    assert done == {'TCS.NS', 'INFY.NS'}
+
+
+def test_token_bucket_spends_the_burst_then_spaces_callers(tmp_path):
+    limiter = ratelimit.TokenBucketLimiter(str(tmp_path / 'rl.sqlite'), rates={'host': (10.0, 3)})
+    waits = [limiter.reserve('host') for _ in range(3)]
+    assert waits == [0.0, 0.0, 0.0]
+    # Each reservation past the burst waits one more interval than the last
+    assert limiter.reserve('host') == pytest.approx(0.1, abs=0.02)
+    assert limiter.reserve('host') == pytest.approx(0.2, abs=0.02)
+    with pytest.raises(ratelimit.RateLimitExceeded):
+        limiter.reserve('host', max_wait=0.05)
+    assert limiter.reserve('other') == 0.0   # unlimited host
+
+
+def test_token_bucket_is_shared_between_threads(tmp_path):
+    limiter = ratelimit.TokenBucketLimiter(str(tmp_path / 'rl.sqlite'), rates={'host': (1.0, 4)})
+    waits = []
+    threads = [threading.Thread(target=lambda: waits.append(limiter.reserve('host', max_wait=60))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(round(w) for w in waits) == [0, 0, 0, 0, 1, 2, 3, 4]
+
+
+def test_busy_database_raises_the_busy_error(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'rl.sqlite')
+    limiter = ratelimit.TokenBucketLimiter(path, rates={'host': (10.0, 3)})
+    limiter._conn().execute('PRAGMA busy_timeout = 50')
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        with pytest.raises(sqlite3.OperationalError, match='locked'):
+            limiter.reserve('host')
+    finally:
+        other.execute('ROLLBACK')
+    assert limiter.reserve('host') == 0.0
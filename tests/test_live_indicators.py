@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import live_indicators
+import replay
+from live_indicators import IncrementalIndicators
+from smart_invest_logic import calculate_smart_threshold, compute_technicals, technical_score_for_latest
+
+INDICATORS = ['Close', 'SMA50', 'SMA200', 'Momentum30', 'Volatility30']
+
+
+@pytest.fixture(scope='module')
+def closes():
+    series = replay.synthetic_history('RELIANCE.NS')['close'].droplevel('symbol')
+    series.index = pd.to_datetime(series.index)
+    return series.iloc[-600:]
+
+
+def assert_matches_batch(state, closes):
+    expected = compute_technicals(closes).iloc[-1]
+    latest = state.latest()
+    for column in INDICATORS:
+        assert latest[column] == pytest.approx(expected[column], rel=1e-9, nan_ok=True)
+
+
+def test_seeded_state_matches_compute_technicals(closes):
+    state = IncrementalIndicators.from_history(closes)
+    assert_matches_batch(state, closes)
+    df = compute_technicals(closes)
+    assert state.technical_score() == pytest.approx(technical_score_for_latest(df), abs=1e-12)
+    assert state.smart_threshold() == calculate_smart_threshold(df)
+    assert state.last_date == closes.index[-1]
+
+
+def test_welford_volatility_tracks_batch_std(closes):
+    state = IncrementalIndicators.from_history(closes.iloc[:250])
+    for i in range(250, len(closes)):
+        state.push(closes.iat[i], closes.index[i])
+        window = closes.iloc[i - 29:i + 1]
+        assert state.latest()['Volatility30'] == pytest.approx(window.std(), rel=1e-9)
+
+
+def test_welford_volatility_during_warm_up(closes):
+    # Below min_periods the std is NaN; from then on it covers every bar seen so far
+    state = IncrementalIndicators()
+    for i, value in enumerate(closes.iloc[:40]):
+        state.push(value)
+        expected = closes.iloc[:i + 1].rolling(30, min_periods=10).std().iat[-1]
+        assert state.latest()['Volatility30'] == pytest.approx(expected, rel=1e-9, nan_ok=True)
+
+
+def test_ticks_revise_the_forming_bar(closes):
+    state = IncrementalIndicators.from_history(closes.iloc[:-1])
+    day = closes.index[-1]
+    for price in (closes.iat[-1] * 1.02, closes.iat[-1] * 0.97, closes.iat[-1]):
+        state.on_price(price, day)
+        revised = pd.concat([closes.iloc[:-1], pd.Series([price], index=[day])])
+        assert_matches_batch(state, revised)
+
+
+def test_resync_keeps_matching_batch(monkeypatch, closes):
+    monkeypatch.setattr(live_indicators, 'RESYNC_EVERY', 7)
+    state = IncrementalIndicators.from_history(closes.iloc[:300])
+    for i in range(300, 340):
+        state.push(closes.iat[i], closes.index[i])
+    assert_matches_batch(state, closes.iloc[:340])
+
+
+def test_scoring_functions_read_the_state_directly(closes):
+    state = IncrementalIndicators.from_history(closes.iloc[:-1])
+    state.on_price(closes.iat[-1] * 1.01, closes.index[-1])
+    revised = pd.concat([closes.iloc[:-1], pd.Series([closes.iat[-1] * 1.01], index=closes.index[-1:])])
+    df = compute_technicals(revised)
+    for source in (state, state.latest()):
+        assert technical_score_for_latest(source) == pytest.approx(technical_score_for_latest(df), abs=1e-12)
+        assert calculate_smart_threshold(source) == calculate_smart_threshold(df)
+    assert technical_score_for_latest(IncrementalIndicators()) == 0.5
+    assert calculate_smart_threshold(IncrementalIndicators()) == 0.6
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import price_store as ps
+
+
+def bars(dates, closes):
+    out = np.empty(len(dates), dtype=ps.BAR_DTYPE)
+    out['date'] = np.array(dates, dtype='datetime64[D]')
+    out['close'] = closes
+    out['volume'] = 1000.0
+    return out
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ps.PriceStore(str(tmp_path / 'prices'))
+    calls = []
+
+    def download(symbols, period=None, start=None):
+        calls.append((list(symbols), period, start))
+        return store.replies.pop(0)
+
+    store.replies, store.calls = [], calls
+    monkeypatch.setattr(store, '_download', download)
+    return store
+
+
+def seed(store, symbol='TCS.NS', checked_at=0):
+    dates = ['2026-10-12', '2026-10-13', '2026-10-14', '2026-10-15']
+    store._write(symbol, bars(dates, [100.0, 101.0, 102.0, 103.0]), {'covered_from': 'max', 'checked_at': checked_at})
+
+
+def test_overlapping_tail_replaces_the_last_bar_and_appends(store):
+    seed(store)
+    # The stored last bar was intraday; upstream now has its final close plus two new days
+    store.replies.append({'TCS.NS': bars(['2026-10-15', '2026-10-16', '2026-10-19'], [104.5, 105.0, 106.0])})
+    store.sync(['TCS.NS'], 'max')
+
+    assert store.calls == [(['TCS.NS'], None, '2026-10-15')]
+    stored = store.load('TCS.NS')
+    assert list(stored['date'].astype(str)) == ['2026-10-12', '2026-10-13', '2026-10-14', '2026-10-15',
+                                                '2026-10-16', '2026-10-19']
+    assert list(stored['close']) == [100.0, 101.0, 102.0, 104.5, 105.0, 106.0]
+    assert store._meta('TCS.NS')['checked_at'] > 0
+
+    # Checked just now: no second request within MIN_SYNC_INTERVAL
+    store.sync(['TCS.NS'], 'max')
+    assert len(store.calls) == 1
+
+
+def test_failed_tail_fetch_is_retried(store):
+    seed(store)
+    store.replies.extend([None, {'TCS.NS': bars(['2026-10-16'], [105.0])}])
+    store.sync(['TCS.NS'], 'max')
+    assert store._meta('TCS.NS')['checked_at'] == 0
+    assert len(store.load('TCS.NS')) == 4
+
+    store.sync(['TCS.NS'], 'max')
+    assert len(store.calls) == 2
+    assert store.load('TCS.NS')['close'][-1] == 105.0
+
+
+def test_symbols_without_data_get_a_short_negative_entry(store, monkeypatch):
+    store.replies.append({})
+    store.sync(['TCS'], '1y')
+    store.sync(['TCS'], '1y')
+    assert len(store.calls) == 1
+    assert store.load('TCS') is None
+
+    # Asked again once the entry expires
+    monkeypatch.setattr(ps, 'MISSING_TTL', 0)
+    store.replies.append({})
+    store.sync(['TCS'], '1y')
+    assert len(store.calls) == 2
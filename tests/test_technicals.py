@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import replay
+import technicals
+from backtest import score_history
+from smart_invest_logic import calculate_smart_threshold, compute_technicals, technical_score_for_latest
+
+SYMBOLS = ['TCS.NS', 'INFY.NS', 'AAPL', 'MSFT']
+INDICATORS = ['Close', 'SMA50', 'SMA200', 'Momentum30', 'Volatility30']
+
+
+@pytest.fixture(scope='module')
+def prices():
+    """Two years of replayed closes (date x symbol), each symbol missing its own scattered days."""
+    frame = pd.concat({s: replay.synthetic_history(s)['close'].droplevel('symbol') for s in SYMBOLS}, axis=1)
+    frame.index = pd.to_datetime(frame.index)
+    frame = frame.iloc[-500:].copy()
+    rng = np.random.default_rng(0)
+    for symbol in SYMBOLS[::2]:
+        frame.loc[frame.index[rng.choice(len(frame), 20, replace=False)], symbol] = np.nan
+    return frame
+
+
+def test_technical_snapshot_matches_compute_technicals(prices):
+    snapshot = technicals.technical_snapshot(prices)
+    for symbol in SYMBOLS:
+        df = compute_technicals(prices[symbol].dropna())
+        expected = df.iloc[-1]
+        for column in INDICATORS:
+            assert snapshot.at[symbol, column] == pytest.approx(expected[column], rel=1e-9)
+        assert snapshot.at[symbol, 'technicalScore'] == pytest.approx(technical_score_for_latest(df), abs=1e-12)
+        assert snapshot.at[symbol, 'suggestedThreshold'] == calculate_smart_threshold(df)
+
+
+def test_technical_snapshot_short_history():
+    # Fewer bars than any min_periods: indicators are NaN, and the score falls back the same way
+    close = pd.Series([100.0, 101.0, 99.5], index=pd.bdate_range('2026-01-05', periods=3))
+    snapshot = technicals.technical_snapshot(close.to_frame('TCS.NS'))
+    df = compute_technicals(close)
+    assert np.isnan(snapshot.at['TCS.NS', 'SMA50'])
+    assert snapshot.at['TCS.NS', 'technicalScore'] == pytest.approx(technical_score_for_latest(df))
+
+
+def test_score_history_matches_compute_technicals_on_every_row(prices):
+    history = score_history(prices)
+    for j, symbol in enumerate(SYMBOLS):
+        present = prices[symbol].notna().to_numpy()
+        df = compute_technicals(prices[symbol].dropna())
+        expected_score = technicals.technical_score(*(df[c].to_numpy() for c in INDICATORS))
+        expected_threshold = technicals.smart_threshold(df['Close'].to_numpy(), df['Volatility30'].to_numpy())
+        np.testing.assert_allclose(history['technicalScore'][present, j], expected_score, atol=1e-12)
+        np.testing.assert_array_equal(history['suggestedThreshold'][present, j], expected_threshold)
+        # Missing days stay missing, on their original rows
+        assert np.isnan(history['technicalScore'][~present, j]).all()
+        # Each row agrees with scoring the history up to that day on its own
+        for k in (9, 49, 199, len(df) - 1):
+            assert history['technicalScore'][present, j][k] == pytest.approx(
+                technical_score_for_latest(compute_technicals(df['Close'].iloc[:k + 1])), abs=1e-12)
@@ -0,0 +1,67 @@
+"""
+Background warm-up after the server starts listening.
+
+Heavy imports (yahooquery, bs4) and the VADER analyzer are deferred until
+first use so a worker binds its port quickly. warm_up() pays those costs
+ahead of the first request instead, and also starts the market refresher
+and brings the stored prices of the well-known symbols up to date.
+
+    start_warm_up(port)   # from the dev server, before app.run()
+
+With gunicorn, call start_warm_up() from a post_worker_init hook.
+"""
+import importlib
+import logging
+import socket
+import threading
+import time
+
+PORT_WAIT_TIMEOUT = 30  # seconds
+DEFERRED_MODULES = ('yahooquery', 'bs4')
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """Load deferred modules and prime shared state; each step is best effort."""
+    import sentiment
+    from market_data import market_refresher
+    from price_store import price_store
+    from symbols import KNOWN_SYMBOLS
+
+    steps = [
+        ('imports', lambda: [importlib.import_module(m) for m in DEFERRED_MODULES]),
+        ('sentiment analyzer', sentiment.get_analyzer),
+        ('market data', market_refresher.ensure_started),
+        ('known symbol prices', lambda: price_store.sync(list(KNOWN_SYMBOLS), period='1y')),
+    ]
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            step()
+            logger.info("Warm-up %s took %.2fs", name, time.perf_counter() - start)
+        except Exception as e:
+            logger.warning("Warm-up %s failed: %s", name, e)
+
+
+def _wait_for_port(port: int, timeout: float = PORT_WAIT_TIMEOUT) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_warm_up(port: int = None) -> threading.Thread:
+    """Run warm_up() in a daemon thread, after `port` accepts connections when one is given."""
+    def run():
+        if port is not None and not _wait_for_port(port):
+            logger.warning("Port %s not accepting connections after %ss; warming up anyway", port, PORT_WAIT_TIMEOUT)
+        warm_up()
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread